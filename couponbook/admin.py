@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.db import models
 
 from .models import (Coupon, CouponBook, CouponTemplate, FavoriteCoupon,
-                     LegalDistrict, Place, Receipt, RewardsInfo, Stamp)
+                     GeocodeCache, LegalDistrict, Place, Receipt, RewardsInfo,
+                     Stamp)
 
 
 # CouponBook 모델을 Django 관리자 페이지에 등록
@@ -45,6 +46,8 @@ class CouponTemplateAdmin(admin.ModelAdmin):
         "id",
         "valid_until",
         "is_on",
+        "first_n_persons",
+        "issued_count",
         "created_at",
     )
     list_filter = ("is_on",)
@@ -85,4 +88,8 @@ class LegalDistrictAdmin(admin.ModelAdmin):
 class PlaceAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "address_district", "address_rest", "tel")
     search_fields = ("id", "name", "address_district", "tel")
-    
\ No newline at end of file
+    
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ("keyword", "lat", "lng", "updated_at")
+    search_fields = ("keyword",)
@@ -0,0 +1,215 @@
+"""
+외부 AI(OpenAI) 호출을 요청 스레드 밖의 작은 스레드 풀에서 실행하는 함수들입니다.
+
+- 동시에 진행 중인 AI 호출 수를 프로세스마다 settings.AI_MAX_CONCURRENCY개로 제한합니다.
+  자리가 나지 않으면 settings.AI_QUEUE_TIMEOUT초만 기다린 뒤 AIBusyError가 발생합니다.
+- 요청 스레드는 settings.AI_CALL_TIMEOUT초까지만 기다리고, 넘으면 AITimeoutError가 발생합니다.
+  응답을 기다리지 않게 된 호출도 끝날 때까지 자리를 차지하므로, 느린 호출이 쌓여도 동시 호출 수는 늘어나지 않습니다.
+- 응답을 스트림으로 받는 호출(stream_ai)은 스트림이 열릴 때까지만 기다리고, 스트림을 다 읽거나 닫을 때까지 자리를 차지합니다.
+
+gunicorn을 gthread 워커로 실행하면, AI 호출이 몰려도 워커의 나머지 스레드는 쿠폰, 스탬프 요청을 계속 처리할 수 있습니다.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from threading import BoundedSemaphore, Lock
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from openai import OpenAI
+
+
+# OpenAI 클라이언트 자체의 시간 제한은 AI_CALL_TIMEOUT보다 조금 길게 둡니다.
+# 요청 스레드가 먼저 기다리기를 그만두고(AITimeoutError), 자리를 차지하던 호출도 곧 끝나서 자리를 돌려줍니다.
+CLIENT_TIMEOUT_MARGIN = 1.0
+
+
+def get_client_timeout() -> float:
+    """
+    OpenAI 클라이언트에 설정할 시간 제한(초)입니다.
+    """
+    return settings.AI_CALL_TIMEOUT + CLIENT_TIMEOUT_MARGIN
+
+
+@lru_cache(maxsize=8)
+def _make_openai_client(api_key: str, base_url: str | None, timeout: float) -> OpenAI:
+    return OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+
+
+def get_openai_client(api_key: str) -> OpenAI:
+    """
+    API 키에 해당하는 OpenAI 클라이언트를 반환합니다. API 주소는 settings.OPENAI_BASE_URL을 사용합니다.
+
+    클라이언트는 여러 스레드에서 함께 쓸 수 있으므로 프로세스에서 재사용합니다.
+    요청마다 새로 만들지 않아서 HTTP 연결(TLS 포함)을 다시 맺지 않아도 되고, 첫 응답까지의 시간이 줄어듭니다.
+    요청 스레드는 call_ai가 AI_CALL_TIMEOUT초까지만 기다리므로, 재시도하지 않습니다.
+    """
+    return _make_openai_client(api_key, settings.OPENAI_BASE_URL, get_client_timeout())
+
+
+class AIOffloadError(Exception):
+    """
+    AI 호출을 실행하지 못했거나 제시간에 끝나지 않았을 때 발생하는 예외입니다.
+    """
+
+
+class AIBusyError(AIOffloadError):
+    """
+    동시에 진행 중인 AI 호출이 너무 많아서 새 호출을 실행할 수 없을 때 발생하는 예외입니다.
+    """
+
+
+class AITimeoutError(AIOffloadError):
+    """
+    AI 호출이 settings.AI_CALL_TIMEOUT초 안에 끝나지 않았을 때 발생하는 예외입니다.
+    """
+
+
+class AILimiter:
+    """
+    AI 호출을 실행하는 스레드 풀과 동시 호출 수 제한을 묶은 객체입니다.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = BoundedSemaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='ai-call')
+
+    def run(self, func, *args, **kwargs):
+        """
+        func(*args, **kwargs)를 스레드 풀에서 실행하고 결과를 반환합니다. func에서 발생한 예외는 그대로 다시 발생합니다.
+        """
+        if not self.semaphore.acquire(timeout=settings.AI_QUEUE_TIMEOUT):
+            raise AIBusyError("AI 요청이 많아 지금은 처리할 수 없습니다. 잠시 후 다시 시도해주세요.")
+
+        try:
+            future = self.executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        future.add_done_callback(lambda _: self.semaphore.release())
+
+        try:
+            return future.result(timeout=settings.AI_CALL_TIMEOUT)
+        except FutureTimeoutError:
+            raise AITimeoutError("AI 응답이 너무 늦어 요청을 중단했습니다. 잠시 후 다시 시도해주세요.")
+
+    def stream(self, func, *args, **kwargs) -> 'AIStream':
+        """
+        스트림을 여는 func(*args, **kwargs)를 스레드 풀에서 실행하고, 열린 스트림을 AIStream으로 감싸서 반환합니다.
+
+        스트림이 열릴 때까지만 AI_CALL_TIMEOUT초 기다립니다. 그 뒤의 조각들은 요청 스레드에서 읽으며,
+        조각 사이의 대기 시간은 OpenAI 클라이언트의 시간 제한(get_client_timeout)을 따릅니다.
+        자리는 스트림을 끝까지 읽거나 닫을 때까지 차지합니다.
+        """
+        if not self.semaphore.acquire(timeout=settings.AI_QUEUE_TIMEOUT):
+            raise AIBusyError("AI 요청이 많아 지금은 처리할 수 없습니다. 잠시 후 다시 시도해주세요.")
+
+        try:
+            future = self.executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+        try:
+            return AIStream(future.result(timeout=settings.AI_CALL_TIMEOUT), self.semaphore.release)
+        except FutureTimeoutError:
+            # 늦게라도 열린 스트림은 바로 닫고 자리를 돌려줍니다.
+            future.add_done_callback(lambda done: AIStream.discard(done, self.semaphore.release))
+            raise AITimeoutError("AI 응답이 너무 늦어 요청을 중단했습니다. 잠시 후 다시 시도해주세요.")
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+
+class AIStream:
+    """
+    AI 응답 스트림을 감싸서, 끝까지 읽거나 닫으면(또는 가비지 컬렉션되면) 한 번만 자리를 돌려주는 이터레이터입니다.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._release = release
+        self._closed = False
+
+    @classmethod
+    def discard(cls, future, release):
+        """
+        시간이 초과된 뒤에 끝난 future의 스트림을 닫고 자리를 돌려줍니다.
+        """
+        if future.exception() is None:
+            cls(future.result(), release).close()
+        else:
+            release()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._stream, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self._release()
+
+    def __del__(self):
+        self.close()
+
+
+_limiter: AILimiter | None = None
+_limiter_lock = Lock()
+
+
+def get_limiter() -> AILimiter:
+    """
+    현재 프로세스의 AILimiter를 반환합니다. 처음 호출할 때 만듭니다.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AILimiter(settings.AI_MAX_CONCURRENCY)
+        return _limiter
+
+
+@receiver(setting_changed)
+def reset_limiter(setting: str, **kwargs):
+    """
+    AI_MAX_CONCURRENCY 설정이 바뀌면(테스트의 override_settings 등) 다음 호출에서 AILimiter를 새로 만듭니다.
+    """
+    global _limiter
+    if setting == 'AI_MAX_CONCURRENCY':
+        with _limiter_lock:
+            _limiter = None
+
+
+def call_ai(func, *args, **kwargs):
+    """
+    외부 AI 호출 func(*args, **kwargs)를 동시 호출 수 제한과 시간 제한 안에서 실행하고 결과를 반환합니다.
+
+    자리가 없으면 AIBusyError, 시간 안에 끝나지 않으면 AITimeoutError가 발생합니다.
+    func는 DB에 접근하지 않는 네트워크 호출이어야 합니다. (DB 연결은 요청 스레드에서만 사용합니다.)
+    """
+    return get_limiter().run(func, *args, **kwargs)
+
+
+def stream_ai(func, *args, **kwargs) -> AIStream:
+    """
+    응답을 스트림으로 받는 외부 AI 호출 func(*args, **kwargs)를 call_ai와 같은 제한 안에서 열고, 스트림을 반환합니다.
+
+    자리가 없거나 스트림이 AI_CALL_TIMEOUT초 안에 열리지 않으면 바로 AIBusyError, AITimeoutError가 발생합니다.
+    반환된 스트림은 끝까지 읽거나 close()해서 자리를 돌려줘야 합니다.
+    """
+    return get_limiter().stream(func, *args, **kwargs)
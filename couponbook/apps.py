@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CouponbookConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'couponbook'
+
+    def ready(self):
+        # 시그널 핸들러를 등록
+        from . import signals
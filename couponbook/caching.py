@@ -0,0 +1,134 @@
+"""
+Django 캐시 프레임워크(settings.CACHES)를 이용한 응답 캐시와 조건부 요청(ETag/304) 관련 함수들입니다.
+
+캐시된 값을 직접 지우는 대신, 데이터가 바뀌면 버전 번호를 올려서 이전 버전의 캐시 키가 더 이상 쓰이지 않게 합니다.
+이전 버전의 캐시는 유효 기간이 지나면 자연스럽게 사라집니다.
+
+버전 번호는 모든 워커가 함께 쓰는 캐시(Redis)에 있어야 합니다. 워커마다 따로인 캐시(locmem)라면 데이터를 바꾼 워커만
+버전 번호가 올라가고, 다른 워커는 이전 데이터로 계속 응답합니다. 그래서 버전 번호로 무효화하는 캐시는
+settings.VERSIONED_CACHE가 켜져 있을 때만 사용합니다. (is_versioned_cache_enabled 참고)
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.http import parse_etags
+
+CATALOGUE_VERSION_KEY = 'couponbook:catalogue:version'
+# 큐레이션 추천 후보(쿠폰 템플릿, 가게, 리워드 정보)의 버전 번호 캐시 키
+CURATION_CANDIDATES_VERSION_KEY = 'couponbook:curation:candidates:version'
+
+
+def get_couponbook_version_key(couponbook_id: int) -> str:
+    """
+    쿠폰북의 버전 번호 캐시 키입니다. 쿠폰북의 쿠폰, 스탬프, 즐겨찾기가 바뀌면 버전 번호가 올라갑니다.
+    """
+    return f'couponbook:couponbook:{couponbook_id}:version'
+
+
+def get_coupon_template_version_key(coupon_template_id: int) -> str:
+    """
+    쿠폰 템플릿의 버전 번호 캐시 키입니다. 쿠폰 템플릿이나 그 리워드 정보, 가게가 바뀌면 버전 번호가 올라갑니다.
+    """
+    return f'couponbook:coupon-template:{coupon_template_id}:version'
+
+
+def get_user_context_version_key(user_id: int) -> str:
+    """
+    유저의 AI 어시스턴트 컨텍스트 버전 번호 캐시 키입니다. 유저의 쿠폰, 스탬프, 자주 가는 지역이 바뀌면 버전 번호가 올라갑니다.
+    """
+    return f'couponbook:user:{user_id}:context:version'
+
+
+def is_versioned_cache_enabled() -> bool:
+    """
+    버전 번호로 무효화하는 캐시(ETag/304 응답 등)를 사용해도 되는지 반환합니다.
+    """
+    return settings.VERSIONED_CACHE
+
+
+def get_version(key: str) -> int:
+    """
+    캐시에 저장된 버전 번호를 반환합니다. 없으면 새로 만듭니다.
+
+    캐시가 비워진 뒤에도 이전 버전 번호와 겹치지 않도록 현재 시각(밀리초)을 초기값으로 사용합니다.
+    """
+    return cache.get_or_set(key, lambda: int(time.time() * 1000), timeout=None)
+
+
+def get_versions(keys) -> list[int]:
+    """
+    여러 버전 번호를 캐시 조회 한 번으로 반환합니다. 없는 버전 번호는 get_version처럼 새로 만듭니다.
+    """
+    keys = list(keys)
+    versions = cache.get_many(keys)
+    missing = {key: int(time.time() * 1000) for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_version(key: str):
+    """
+    버전 번호를 올립니다. 캐시에 버전 번호가 없으면 새로 만듭니다.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def bump_version_on_commit(key: str):
+    """
+    버전 번호를 지금 올리고, 진행 중인 트랜잭션이 있다면 커밋 후에 한 번 더 올립니다.
+
+    커밋 전에 다른 요청이 이전 데이터로 새 버전의 캐시를 채우더라도, 커밋 후에 다시 무효화됩니다.
+    """
+    bump_version(key)
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: bump_version(key))
+
+
+def get_catalogue_cache_key(request, *parts) -> str:
+    """
+    쿠폰 템플릿 목록 응답의 캐시 키를 만듭니다.
+
+    현재 카탈로그 버전과 요청 URL(호스트와 쿼리스트링 포함), 그리고 parts로 받은 추가 구분값이 같으면 같은 키가 됩니다.
+    """
+    raw = '|'.join([request.build_absolute_uri(), *map(str, parts)])
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'couponbook:catalogue:{get_version(CATALOGUE_VERSION_KEY)}:{digest}'
+
+
+def make_etag(data) -> str:
+    """
+    응답 데이터로 ETag(큰따옴표 포함)를 만듭니다.
+    """
+    raw = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, ensure_ascii=False)
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def make_version_etag(*parts) -> str:
+    """
+    응답 내용을 결정하는 버전 번호 등의 값들로 ETag(큰따옴표 포함)를 만듭니다. 응답 데이터 없이도 계산할 수 있습니다.
+    """
+    raw = '|'.join(map(str, parts))
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def etag_matches(request, etag: str) -> bool:
+    """
+    요청의 If-None-Match 헤더가 etag와 일치하는지 반환합니다.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags
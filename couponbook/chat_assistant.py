@@ -5,11 +5,61 @@
 
 from decouple import config
 from openai import OpenAI
-from accounts.models import User
+from accounts.models import FavoriteLocation, User
+from couponbook.ai_offload import (AIOffloadError, call_ai, get_openai_client,
+                                   stream_ai)
+from couponbook.caching import (CURATION_CANDIDATES_VERSION_KEY, get_version,
+                                get_user_context_version_key,
+                                is_versioned_cache_enabled)
+from couponbook.chat_budget import build_budgeted_messages, count_message_tokens
+from couponbook.chat_intents import answer_locally
+from couponbook.chat_response_cache import (get_cached_response,
+                                            is_cacheable_question,
+                                            set_cached_response)
 from couponbook.models import Coupon, CouponTemplate, Place
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.timezone import now
-from django.db.models import Q, Count
-import json
+from django.db.models import Q
+from typing import Iterator
+
+# 시스템 프롬프트
+SYSTEM_PROMPT = """
+당신은 '쿠폰북' 앱의 친절한 AI 어시스턴트입니다.
+
+**역할:**
+1. 사용자의 쿠폰 사용을 돕습니다
+2. 보유한 쿠폰 정보를 알려줍니다
+3. 주변 가게와 이용 가능한 쿠폰을 추천합니다
+4. 앱 사용법을 안내합니다
+5. 친근하고 자연스럽게 대화합니다
+
+**답변 규칙:**
+- 반말로 친근하게 대화하세요
+- 이모지를 적절히 사용하세요
+- 간결하고 명확하게 답변하세요
+- 사용자 데이터를 기반으로 개인화된 답변을 제공하세요
+- 정보가 없으면 솔직하게 "모르겠어", "정보가 없어" 라고 답하세요
+
+**쿠폰북 앱 기능:**
+- 가게 쿠폰 저장하기
+- 방문 시 영수증 번호로 스탬프 적립
+- 스탬프 다 모으면 리워드 받기
+- 즐겨찾기로 자주 가는 가게 관리
+- AI 추천으로 새로운 가게 발견
+"""
+
+# AI 어시스턴트를 사용할 수 없을 때(OPENAI_API_KEY 미설정)의 안내 메시지
+UNAVAILABLE_MESSAGE = "죄송합니다. AI 어시스턴트 기능이 현재 사용 불가능합니다. 관리자에게 문의해주세요."
+
+
+def get_user_context_cache_key(user_id: int) -> str:
+    """
+    사용자 컨텍스트의 캐시 키입니다. 사용자 컨텍스트 버전이나 추천 후보(쿠폰 템플릿, 가게, 리워드 정보) 버전이 바뀌면 키도 바뀝니다.
+    """
+    user_version = get_version(get_user_context_version_key(user_id))
+    candidates_version = get_version(CURATION_CANDIDATES_VERSION_KEY)
+    return f'couponbook:chat-context:{user_id}:{user_version}:{candidates_version}'
 
 
 class CouponbookAssistant:
@@ -24,73 +74,32 @@ class CouponbookAssistant:
         self.user = user
         self.api_key = openai_api_key or config("OPENAI_API_KEY", default="")
         self.client: OpenAI | None = None
+        # 마지막 요청의 토큰 지표 (chat_budget.build_budgeted_messages의 지표 + OpenAI가 알려준 사용량)
+        self.token_usage: dict = {}
+        # 마지막 요청을 OpenAI 없이 답했다면 그 의도 이름 (chat_intents 참고)
+        self.intent: str | None = None
+        # 마지막 요청을 응답 캐시(chat_response_cache)에 있던 답변으로 답했는지 여부
+        self.cached = False
         
         if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
+            self.client = get_openai_client(self.api_key)
 
     def _get_user_context(self) -> dict:
         """
         사용자의 쿠폰북 정보를 수집하여 AI에게 제공할 컨텍스트를 생성합니다.
-        """
-        try:
-            # 사용자의 쿠폰 목록
-            coupons = Coupon.objects.filter(
-                couponbook__user=self.user
-            ).select_related('original_template__place').annotate(
-                stamp_count=Count('stamps')
-            )
-
-            user_coupons = []
-            for coupon in coupons:
-                template = coupon.original_template
-                place = template.place
-                user_coupons.append({
-                    "가게명": place.name,
-                    "주소": f"{place.address_district.province} {place.address_district.city} {place.address_district.district}",
-                    "쿠폰명": template.name,
-                    "현재_스탬프": coupon.stamp_count,
-                    "필요_스탬프": template.reward_info.amount,
-                    "리워드": template.reward,
-                    "태그": place.tags if hasattr(place, 'tags') else []
-                })
-
-            # 사용자 선호 지역
-            favorite_locations = []
-            if hasattr(self.user, 'favorite_locations'):
-                for loc in self.user.favorite_locations.all():
-                    favorite_locations.append({
-                        "광역시도": loc.province,
-                        "시군구": loc.city,
-                        "법정동": loc.district
-                    })
-
-            # 주변 이용 가능한 쿠폰 템플릿 (최대 10개)
-            available_templates = CouponTemplate.objects.filter(
-                Q(valid_until=None) | Q(valid_until__gte=now()),
-                is_on=True
-            ).exclude(
-                coupons__couponbook__user=self.user
-            ).select_related('place__address_district')[:10]
-
-            nearby_templates = []
-            for template in available_templates:
-                place = template.place
-                nearby_templates.append({
-                    "가게명": place.name,
-                    "주소": f"{place.address_district.province} {place.address_district.city} {place.address_district.district}",
-                    "쿠폰명": template.name,
-                    "필요_스탬프": template.reward_info.amount,
-                    "리워드": template.reward,
-                    "태그": place.tags if hasattr(place, 'tags') else []
-                })
 
-            return {
-                "사용자명": self.user.username,
-                "보유_쿠폰": user_coupons,
-                "선호_지역": favorite_locations,
-                "주변_이용가능_쿠폰": nearby_templates[:5]  # 5개만 제공
-            }
+        컨텍스트는 사용자 컨텍스트 버전과 추천 후보 버전이 들어간 키로 캐시하므로, 같은 대화의 이어지는 질문에서는 쿼리가 없습니다.
+        사용자의 쿠폰, 스탬프, 자주 가는 지역이나 쿠폰 템플릿이 바뀌면 키가 바뀌어서 다시 만듭니다.
+        버전 번호를 워커끼리 함께 쓰지 않는 캐시라면(settings.VERSIONED_CACHE가 꺼져 있으면) 캐시하지 않고 매번 만듭니다.
+        """
+        cache_key = get_user_context_cache_key(self.user.id) if is_versioned_cache_enabled() else None
+        if cache_key:
+            user_context = cache.get(cache_key)
+            if user_context is not None:
+                return user_context
 
+        try:
+            user_context = self._build_user_context()
         except Exception as e:
             print(f"컨텍스트 생성 오류: {e}")
             return {
@@ -100,6 +109,128 @@ class CouponbookAssistant:
                 "주변_이용가능_쿠폰": []
             }
 
+        if cache_key:
+            cache.set(cache_key, user_context, settings.CHAT_CONTEXT_CACHE_TTL)
+        return user_context
+
+    def _build_user_context(self) -> dict:
+        """
+        DB에서 사용자 컨텍스트를 만듭니다. 보유 쿠폰, 자주 가는 지역, 주변 이용 가능 쿠폰을 각각 쿼리 1번으로 가져옵니다.
+        """
+        # 사용자의 쿠폰 목록
+        coupons = Coupon.objects.filter(couponbook__user=self.user).order_by('id').values_list(
+            'original_template__place__name',
+            'original_template__place__address_district__province',
+            'original_template__place__address_district__city',
+            'original_template__place__address_district__district',
+            'stamp_count',
+            'original_template__reward_info__amount',
+            'original_template__reward_info__reward',
+            'original_template__place__tags',
+        )
+        user_coupons = []
+        for name, province, city, district, stamp_count, amount, reward, tags in coupons:
+            user_coupons.append({
+                "가게명": name,
+                "주소": f"{province} {city} {district}",
+                "현재_스탬프": stamp_count,
+                "필요_스탬프": amount,
+                "리워드": reward,
+                "태그": tags or ""
+            })
+
+        # 사용자 선호 지역
+        favorite_locations = []
+        for province, city, district in FavoriteLocation.objects.filter(user=self.user).values_list(
+                'province', 'city', 'district'):
+            favorite_locations.append({
+                "광역시도": province,
+                "시군구": city,
+                "법정동": district
+            })
+
+        # 주변 이용 가능한 쿠폰 템플릿 (5개만 제공)
+        available_templates = CouponTemplate.objects.filter(
+            Q(valid_until=None) | Q(valid_until__gte=now()),
+            is_on=True
+        ).exclude(
+            coupons__couponbook__user=self.user
+        ).order_by('id').values_list(
+            'place__name',
+            'place__address_district__province',
+            'place__address_district__city',
+            'place__address_district__district',
+            'reward_info__amount',
+            'reward_info__reward',
+            'place__tags',
+        )[:5]
+        nearby_templates = []
+        for name, province, city, district, amount, reward, tags in available_templates:
+            nearby_templates.append({
+                "가게명": name,
+                "주소": f"{province} {city} {district}",
+                "필요_스탬프": amount,
+                "리워드": reward,
+                "태그": tags or ""
+            })
+
+        return {
+            "사용자명": self.user.username,
+            "보유_쿠폰": user_coupons,
+            "선호_지역": favorite_locations,
+            "주변_이용가능_쿠폰": nearby_templates
+        }
+
+    def _build_messages(self, user_message: str, conversation_history: list = None) -> tuple[list[dict], dict]:
+        """
+        시스템 프롬프트, 대화 히스토리, 사용자 컨텍스트와 질문으로 OpenAI에 보낼 메시지 목록을 만들고, (메시지 목록, 사용자 컨텍스트)를 반환합니다.
+
+        메시지 목록은 settings.CHAT_INPUT_TOKEN_BUDGET 안으로 줄이고(chat_budget 참고), 토큰 지표를 self.token_usage에 저장합니다.
+        """
+        user_context = self._get_user_context()
+        messages, self.token_usage = build_budgeted_messages(
+            SYSTEM_PROMPT, user_context, conversation_history, user_message)
+        return messages, user_context
+
+    def _build_generic_messages(self, user_message: str) -> list[dict]:
+        """
+        사용자 정보 없이 시스템 프롬프트와 질문만으로 메시지 목록을 만듭니다.
+
+        일반 질문(chat_response_cache.is_cacheable_question)에 사용하며, 이 메시지로 받은 답변은 다른 사용자에게 보여줘도 됩니다.
+        """
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_message},
+        ]
+        self.token_usage = {
+            "estimated_input_tokens": count_message_tokens(messages),
+            "input_token_budget": settings.CHAT_INPUT_TOKEN_BUDGET,
+        }
+        return messages
+
+    def _add_usage(self, usage):
+        """
+        OpenAI 응답의 토큰 사용량을 self.token_usage에 더합니다.
+        """
+        if usage is not None:
+            self.token_usage.update({
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+            })
+
+    def _answer_locally(self, user_message: str) -> str | None:
+        """
+        OpenAI 없이 답할 수 있는 질문이면 답변을 반환하고, self.intent에 의도 이름을 저장합니다. 아니면 None을 반환합니다.
+        """
+        self.intent, self.token_usage, self.cached = None, {}, False
+        local = answer_locally(user_message, self._get_user_context)
+        if local is None:
+            return None
+
+        self.intent, response = local
+        return response
+
     def chat(self, user_message: str, conversation_history: list = None) -> dict:
         """
         사용자 메시지를 받아 AI 어시스턴트의 응답을 생성합니다.
@@ -111,72 +242,55 @@ class CouponbookAssistant:
         Returns:
             {
                 "response": "AI 응답 메시지",
-                "context_used": True/False  # 사용자 데이터를 사용했는지 여부
+                "context_used": True/False,  # 사용자 데이터를 사용했는지 여부
+                "token_usage": {...},  # 입력 토큰 어림값, 요약/제외한 히스토리 수, OpenAI 토큰 사용량
+                "intent": "coupon_count" 또는 None,  # OpenAI 없이 답한 경우 그 의도 이름
+                "cached": True/False  # 일반 질문을 응답 캐시에 있던 답변으로 답했는지 여부
             }
         """
+
+        # 자주 하는 질문은 OpenAI 없이 바로 답변
+        local_response = self._answer_locally(user_message)
+        if local_response is not None:
+            return {
+                "response": local_response,
+                "context_used": True,
+                "token_usage": self.token_usage,
+                "intent": self.intent,
+                "cached": False,
+            }
+
+        # 개인 정보와 상관없는 일반 질문은 다른 사용자가 먼저 물어본 답변을 재사용
+        cacheable = is_cacheable_question(user_message, conversation_history)
+        if cacheable:
+            cached_response = get_cached_response(user_message)
+            if cached_response is not None:
+                self.cached = True
+                return {
+                    "response": cached_response,
+                    "context_used": False,
+                    "token_usage": self.token_usage,
+                    "intent": None,
+                    "cached": True,
+                }
         
         # OpenAI 클라이언트가 없으면 fallback 메시지
         if not self.client:
             return {
-                "response": "죄송합니다. AI 어시스턴트 기능이 현재 사용 불가능합니다. 관리자에게 문의해주세요.",
+                "response": UNAVAILABLE_MESSAGE,
                 "context_used": False,
                 "error": "OPENAI_API_KEY not configured"
             }
 
         try:
-            # 사용자 컨텍스트 수집
-            user_context = self._get_user_context()
-            context_json = json.dumps(user_context, ensure_ascii=False, indent=2)
-
-            # 시스템 프롬프트
-            system_prompt = """
-당신은 '쿠폰북' 앱의 친절한 AI 어시스턴트입니다.
-
-**역할:**
-1. 사용자의 쿠폰 사용을 돕습니다
-2. 보유한 쿠폰 정보를 알려줍니다
-3. 주변 가게와 이용 가능한 쿠폰을 추천합니다
-4. 앱 사용법을 안내합니다
-5. 친근하고 자연스럽게 대화합니다
-
-**답변 규칙:**
-- 반말로 친근하게 대화하세요
-- 이모지를 적절히 사용하세요
-- 간결하고 명확하게 답변하세요
-- 사용자 데이터를 기반으로 개인화된 답변을 제공하세요
-- 정보가 없으면 솔직하게 "모르겠어", "정보가 없어" 라고 답하세요
-
-**쿠폰북 앱 기능:**
-- 가게 쿠폰 저장하기
-- 방문 시 영수증 번호로 스탬프 적립
-- 스탬프 다 모으면 리워드 받기
-- 즐겨찾기로 자주 가는 가게 관리
-- AI 추천으로 새로운 가게 발견
-"""
-
-            # 메시지 구성
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-
-            # 대화 히스토리 추가 (있으면)
-            if conversation_history:
-                messages.extend(conversation_history)
+            if cacheable:
+                messages, user_context = self._build_generic_messages(user_message), {}
+            else:
+                messages, user_context = self._build_messages(user_message, conversation_history)
 
-            # 사용자 컨텍스트와 질문 추가
-            user_content = f"""
-[사용자 정보]
-{context_json}
-
-[사용자 질문]
-{user_message}
-
-위 정보를 참고하여 사용자의 질문에 답변해주세요.
-"""
-            messages.append({"role": "user", "content": user_content})
-
-            # OpenAI API 호출
-            response = self.client.chat.completions.create(
+            # OpenAI API 호출 (동시 호출 수, 시간 제한 안에서 실행)
+            response = call_ai(
+                self.client.chat.completions.create,
                 model="gpt-4o-mini",
                 messages=messages,
                 temperature=0.7,
@@ -184,13 +298,23 @@ class CouponbookAssistant:
             )
 
             ai_response = response.choices[0].message.content
+            self._add_usage(getattr(response, 'usage', None))
+            if cacheable and ai_response:
+                set_cached_response(user_message, ai_response)
 
             return {
                 "response": ai_response,
-                "context_used": True,
+                "context_used": not cacheable,
+                "token_usage": self.token_usage,
+                "intent": None,
+                "cached": False,
                 "user_context": user_context  # 디버깅용 (프로덕션에서는 제거 가능)
             }
 
+        except AIOffloadError:
+            # 요청이 몰렸거나 시간이 초과된 경우는 뷰에서 503/504로 응답합니다.
+            raise
+
         except Exception as e:
             # 오류 발생 시 안전한 fallback
             return {
@@ -199,6 +323,61 @@ class CouponbookAssistant:
                 "error": str(e)
             }
 
+    def chat_stream(self, user_message: str, conversation_history: list = None) -> tuple[Iterator[str], bool]:
+        """
+        chat과 같은 질문을 스트리밍으로 보내고, (응답 텍스트 조각 이터레이터, 사용자 데이터 사용 여부)를 반환합니다.
+
+        조각은 OpenAI가 토큰을 생성하는 대로 나옵니다.
+        AI 호출 자리가 없거나 스트림이 제때 열리지 않으면, 조각을 읽기 전에 바로 AIBusyError, AITimeoutError가 발생합니다.
+        OpenAI 클라이언트가 없으면 안내 메시지 하나만 나옵니다. 토큰 지표는 조각을 다 읽은 뒤 self.token_usage에 있습니다.
+        OpenAI 없이 답할 수 있는 질문이나 응답 캐시에 있는 일반 질문이면 답변 전체가 조각 하나로 나옵니다.
+        일반 질문의 답변은 조각을 끝까지 읽으면 응답 캐시에 넣습니다.
+        """
+        local_response = self._answer_locally(user_message)
+        if local_response is not None:
+            return iter([local_response]), True
+
+        cacheable = is_cacheable_question(user_message, conversation_history)
+        if cacheable:
+            cached_response = get_cached_response(user_message)
+            if cached_response is not None:
+                self.cached = True
+                return iter([cached_response]), False
+
+        if not self.client:
+            return iter([UNAVAILABLE_MESSAGE]), False
+
+        if cacheable:
+            messages = self._build_generic_messages(user_message)
+        else:
+            messages, _ = self._build_messages(user_message, conversation_history)
+        stream = stream_ai(
+            self.client.chat.completions.create,
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500,
+            stream=True,
+            # 마지막 조각으로 토큰 사용량을 받습니다.
+            stream_options={"include_usage": True},
+        )
+
+        def contents():
+            pieces = []
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        pieces.append(chunk.choices[0].delta.content)
+                        yield pieces[-1]
+                    self._add_usage(getattr(chunk, 'usage', None))
+            finally:
+                stream.close()
+            # 도중에 끊긴 답변은 캐시하지 않습니다.
+            if cacheable and pieces:
+                set_cached_response(user_message, ''.join(pieces))
+
+        return contents(), not cacheable
+
     def get_quick_suggestions(self) -> list[str]:
         """
         사용자가 물어볼 만한 질문 예시를 생성합니다.
@@ -0,0 +1,201 @@
+"""
+AI 어시스턴트에 보내는 메시지를 토큰 예산 안으로 줄이는 함수들입니다.
+
+- 클라이언트가 보낸 대화 히스토리는 role이 user/assistant이고 내용이 문자열인 메시지만 쓰고,
+  예전 질문에 붙어 있던 [사용자 정보] 블록은 지워서 사용자 정보가 마지막 질문에 한 번만 들어가게 합니다.
+- 최근 settings.CHAT_HISTORY_KEEP_TURNS개의 턴(사용자 질문과 그에 대한 답변)은 그대로 두고,
+  그 이전 턴들은 추가 AI 호출 없이 질문과 답변 첫 문장만 남긴 요약 하나로 합칩니다.
+- 전체 입력이 settings.CHAT_INPUT_TOKEN_BUDGET을 넘으면 오래된 턴부터 요약으로 옮기고,
+  그래도 넘으면 요약을 빼고, 마지막으로 사용자 정보의 목록들을 뒤에서부터 줄입니다.
+
+토큰 수는 couponbook.curation.prompt.estimate_tokens로 어림합니다.
+"""
+
+import json
+import re
+
+from django.conf import settings
+
+from couponbook.curation.prompt import estimate_tokens
+
+# 메시지 하나마다 role 등으로 붙는 토큰 수(어림값)
+MESSAGE_OVERHEAD_TOKENS = 4
+# 요약에 넣는 질문, 답변의 최대 글자 수
+SUMMARY_TEXT_LENGTH = 80
+
+CONTEXT_BLOCK = re.compile(r'\[사용자 정보\].*?\[사용자 질문\]\s*(.*?)\s*(위 정보를 참고하여[^\n]*)?\s*$', re.DOTALL)
+
+
+def format_user_content(context_json: str, user_message: str) -> str:
+    """
+    사용자 정보(JSON)와 질문으로 마지막 사용자 메시지의 내용을 만듭니다.
+    """
+    return f"""
+[사용자 정보]
+{context_json}
+
+[사용자 질문]
+{user_message}
+
+위 정보를 참고하여 사용자의 질문에 답변해주세요.
+"""
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    """
+    메시지 목록의 토큰 수를 어림합니다.
+    """
+    return sum(estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def clean_history(conversation_history) -> list[dict]:
+    """
+    클라이언트가 보낸 대화 히스토리에서 쓸 수 있는 메시지만 골라냅니다.
+
+    role이 user/assistant가 아니거나 내용이 문자열이 아닌 메시지는 버리고(시스템 프롬프트 덮어쓰기 방지),
+    사용자 메시지에 [사용자 정보] 블록이 있으면 질문만 남깁니다.
+    """
+    if not isinstance(conversation_history, list):
+        return []
+
+    messages = []
+    for message in conversation_history:
+        if not isinstance(message, dict):
+            continue
+        role, content = message.get('role'), message.get('content')
+        if role not in ('user', 'assistant') or not isinstance(content, str) or not content.strip():
+            continue
+        if role == 'user':
+            match = CONTEXT_BLOCK.search(content)
+            if match:
+                content = match.group(1)
+        messages.append({'role': role, 'content': content.strip()})
+    return messages
+
+
+def split_recent_turns(messages: list[dict], keep_turns: int) -> int:
+    """
+    최근 keep_turns개의 턴이 시작하는 위치를 반환합니다. 턴은 사용자 메시지로 시작합니다.
+    """
+    if keep_turns <= 0:
+        return len(messages)
+    user_indexes = [i for i, message in enumerate(messages) if message['role'] == 'user']
+    if len(user_indexes) <= keep_turns:
+        return 0
+    return user_indexes[-keep_turns]
+
+
+def shorten(text: str, length: int = SUMMARY_TEXT_LENGTH) -> str:
+    """
+    공백을 정리하고 length글자로 자릅니다.
+    """
+    text = ' '.join(text.split())
+    return text if len(text) <= length else text[:length - 1] + '…'
+
+
+def summarize_turns(messages: list[dict], token_budget: int) -> tuple[str | None, int]:
+    """
+    오래된 메시지들을 요약 문자열 하나로 만들고, (요약, 요약에 넣지 못하고 버린 메시지 수)를 반환합니다.
+
+    사용자 질문은 그대로, 답변은 첫 문장만 짧게 남깁니다. 요약이 token_budget을 넘으면 오래된 줄부터 뺍니다.
+    """
+    lines = []
+    for message in messages:
+        if message['role'] == 'user':
+            lines.append(f"- 사용자: {shorten(message['content'])}")
+        else:
+            first_sentence = re.split(r'(?<=[.!?])\s', message['content'], maxsplit=1)[0]
+            lines.append(f"  답변: {shorten(first_sentence)}")
+
+    header = "[이전 대화 요약]"
+    kept, total = [], estimate_tokens(header)
+    for line in reversed(lines):
+        line_tokens = estimate_tokens(line) + 1
+        if total + line_tokens > token_budget:
+            break
+        kept.append(line)
+        total += line_tokens
+
+    if not kept:
+        return None, len(messages)
+    return '\n'.join([header, *reversed(kept)]), len(lines) - len(kept)
+
+
+def trim_context(user_context: dict, n_items: int) -> dict:
+    """
+    사용자 정보의 목록들에서 가장 긴 목록의 마지막 항목부터 n_items개를 뺀 사본을 반환합니다.
+    """
+    user_context = {key: list(value) if isinstance(value, list) else value for key, value in user_context.items()}
+    for _ in range(n_items):
+        lists = [value for value in user_context.values() if isinstance(value, list) and value]
+        if not lists:
+            break
+        max(lists, key=len).pop()
+    return user_context
+
+
+def build_budgeted_messages(system_prompt: str, user_context: dict, conversation_history,
+                            user_message: str) -> tuple[list[dict], dict]:
+    """
+    시스템 프롬프트, 사용자 정보, 대화 히스토리, 질문으로 토큰 예산 안의 메시지 목록을 만들고, (메시지 목록, 토큰 지표)를 반환합니다.
+
+    토큰 지표: estimated_input_tokens, input_token_budget, history_messages(그대로 넣은 메시지 수),
+    summarized_messages(요약한 메시지 수), dropped_messages(버린 메시지 수), trimmed_context_items(사용자 정보에서 뺀 항목 수)
+    """
+    budget = settings.CHAT_INPUT_TOKEN_BUDGET
+    history = clean_history(conversation_history)
+    n_invalid = (len(conversation_history) if isinstance(conversation_history, list) else 0) - len(history)
+
+    system_message = {'role': 'system', 'content': system_prompt}
+    start = split_recent_turns(history, settings.CHAT_HISTORY_KEEP_TURNS)
+
+    def user_message_for(context: dict) -> dict:
+        context_json = json.dumps(context, ensure_ascii=False, separators=(',', ':'))
+        return {'role': 'user', 'content': format_user_content(context_json, user_message)}
+
+    def assemble(start: int, use_summary: bool, context: dict):
+        summary, n_dropped = summarize_turns(history[:start], settings.CHAT_SUMMARY_TOKEN_BUDGET) \
+            if use_summary and start else (None, start)
+        messages = [system_message]
+        if summary:
+            messages.append({'role': 'system', 'content': summary})
+        messages.extend(history[start:])
+        messages.append(user_message_for(context))
+        return messages, n_dropped
+
+    # 1. 오래된 턴부터 요약으로 옮기기
+    turn_starts = sorted({start, *(i for i, m in enumerate(history) if m['role'] == 'user' and i > start), len(history)})
+    for start in turn_starts:
+        messages, n_dropped = assemble(start, True, user_context)
+        if count_message_tokens(messages) <= budget:
+            break
+
+    # 2. 요약 빼기
+    use_summary = True
+    if count_message_tokens(messages) > budget and start:
+        use_summary = False
+        messages, n_dropped = assemble(start, False, user_context)
+
+    # 3. 사용자 정보 줄이기: 예산 안에 들어오는 가장 적은 항목 수를 이분 탐색으로 찾습니다.
+    n_trimmed = 0
+    if count_message_tokens(messages) > budget:
+        low, high = 1, sum(len(value) for value in user_context.values() if isinstance(value, list))
+        while low < high:
+            middle = (low + high) // 2
+            candidate, _ = assemble(start, use_summary, trim_context(user_context, middle))
+            if count_message_tokens(candidate) <= budget:
+                high = middle
+            else:
+                low = middle + 1
+        n_trimmed = high
+        messages, n_dropped = assemble(start, use_summary, trim_context(user_context, n_trimmed))
+
+    metrics = {
+        'estimated_input_tokens': count_message_tokens(messages),
+        'input_token_budget': budget,
+        'history_messages': len(history) - start,
+        'summarized_messages': start - n_dropped,
+        'dropped_messages': n_dropped + n_invalid,
+        'trimmed_context_items': n_trimmed,
+    }
+    return messages, metrics
@@ -0,0 +1,203 @@
+"""
+AI 어시스턴트에 자주 들어오는 질문(추천 질문 목록의 질문들)을 OpenAI 호출 없이 바로 답하는 의도 분류기입니다.
+
+질문을 정규화(공백, 문장 부호 제거)한 뒤
+1. 의도마다 정해 둔 정규식 규칙으로 먼저 분류하고, (사용법 질문은 사용, 적립 같은 동사로 끝나는 질문만)
+2. 규칙에 맞지 않으면 의도별 예시 질문들과 글자 2-gram 유사도(Dice 계수)를 비교해서
+   settings.CHAT_INTENT_MIN_SIMILARITY 이상인 의도로 분류합니다.
+
+분류된 질문은 캐시된 사용자 컨텍스트나 DB 조회로 정해진 형식의 답변을 만듭니다.
+분류되지 않거나 답변을 만들 수 없는 질문(예: 법정동이 아닌 "냉장고에 뭐 있어?", 정해진 답변이 설명하지 않는 "쿠폰 어떻게 삭제해?")은
+None을 반환하고, OpenAI가 답합니다.
+"""
+
+import re
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
+
+from couponbook.models import CouponTemplate, LegalDistrict
+
+# 답변에 보여줄 쿠폰, 가게의 최대 개수
+MAX_LISTED_ITEMS = 5
+
+NON_WORD = re.compile(r'[^\w]+')
+
+# 정해진 답변이 설명하지 않는 동작(취소, 삭제, 환불, 선물 등). 이런 동작을 묻는 질문은 분류하지 않고 OpenAI가 답합니다.
+OTHER_ACTIONS = re.compile(r'취소|삭제|지우|지워|환불|선물|양도|보내|해지')
+
+
+def normalize_question(text: str) -> str:
+    """
+    분류용으로 질문을 정규화합니다. 공백과 문장 부호를 모두 지우고 소문자로 바꿉니다.
+    """
+    return NON_WORD.sub('', text).lower()
+
+
+def get_bigrams(text: str) -> set[str]:
+    """
+    정규화된 문자열의 글자 2-gram 집합을 반환합니다. 한 글자짜리 문자열은 그 글자 하나를 반환합니다.
+    """
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def get_similarity(a: set[str], b: set[str]) -> float:
+    """
+    두 2-gram 집합의 Dice 계수(0~1)를 반환합니다.
+    """
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+# ------------------------------- 답변 만들기 -------------------------------
+def format_coupon(coupon: dict) -> str:
+    return f"- {coupon['가게명']}: 스탬프 {coupon['현재_스탬프']}/{coupon['필요_스탬프']}개 ({coupon['리워드']})"
+
+
+def answer_coupon_count(match, get_user_context) -> str:
+    coupons = get_user_context()['보유_쿠폰']
+    if not coupons:
+        return "아직 저장한 쿠폰이 없어! 🙂 마음에 드는 가게의 쿠폰을 저장하고 스탬프를 모아봐."
+
+    lines = [f"지금 {len(coupons)}개의 쿠폰을 가지고 있어! 🎟️"]
+    lines.extend(format_coupon(coupon) for coupon in coupons[:MAX_LISTED_ITEMS])
+    if len(coupons) > MAX_LISTED_ITEMS:
+        lines.append(f"외 {len(coupons) - MAX_LISTED_ITEMS}개")
+    return '\n'.join(lines)
+
+
+def answer_top_stamps(match, get_user_context) -> str:
+    coupons = [coupon for coupon in get_user_context()['보유_쿠폰'] if coupon['현재_스탬프']]
+    if not coupons:
+        return "아직 스탬프를 모은 쿠폰이 없어! 가게에 방문해서 영수증 번호로 첫 스탬프를 받아봐 ✨"
+
+    coupons.sort(key=lambda coupon: coupon['현재_스탬프'], reverse=True)
+    lines = ["스탬프를 가장 많이 모은 쿠폰들이야! 🏆"]
+    for coupon in coupons[:3]:
+        remaining = (coupon['필요_스탬프'] or 0) - coupon['현재_스탬프']
+        suffix = f" - {remaining}개만 더 모으면 돼!" if remaining > 0 else " - 리워드를 받을 수 있어! 🎉"
+        lines.append(format_coupon(coupon) + suffix)
+    return '\n'.join(lines)
+
+
+def answer_area(match, get_user_context) -> str | None:
+    area = match.group('area')
+    if not LegalDistrict.objects.filter(Q(district=area) | Q(city=area)).exists():
+        # 지역 이름이 아니면 OpenAI가 답합니다.
+        return None
+
+    templates = CouponTemplate.objects.filter(
+        Q(place__address_district__district=area) | Q(place__address_district__city=area),
+        Q(valid_until=None) | Q(valid_until__gte=now()),
+        is_on=True,
+    ).order_by('id').values_list('place__name', 'reward_info__amount', 'reward_info__reward')[:MAX_LISTED_ITEMS]
+    if not templates:
+        return f"{area}에는 아직 쿠폰을 주는 가게가 없어 😢 다른 지역도 물어봐!"
+
+    lines = [f"{area}에서 쿠폰을 받을 수 있는 가게들이야! 📍"]
+    for name, amount, reward in templates:
+        lines.append(f"- {name}: 스탬프 {amount}개 모으면 {reward}" if reward else f"- {name}")
+    return '\n'.join(lines)
+
+
+HOW_TO_USE_ANSWER = """쿠폰은 이렇게 사용하면 돼! 📝
+1. 마음에 드는 가게의 쿠폰을 저장해
+2. 가게에 방문해서 결제하고, 영수증 번호로 스탬프를 적립해
+3. 스탬프를 다 모으면 리워드를 받을 수 있어 🎁"""
+
+FAVORITE_ANSWER = """즐겨찾기는 자주 가는 가게의 쿠폰을 모아 보는 기능이야! ⭐
+쿠폰을 즐겨찾기에 추가하면 쿠폰북에서 먼저 찾아볼 수 있어."""
+
+
+# -------------------------------- 의도 목록 --------------------------------
+# (의도 이름, 정규화된 질문에 쓰는 규칙, 유사도 비교용 예시 질문, 답변 함수)
+# 답변 함수는 (규칙의 match 또는 None, 사용자 컨텍스트를 반환하는 함수)를 받아 답변이나 None을 반환합니다.
+INTENTS = [
+    (
+        'coupon_count',
+        re.compile(r'(내|내가가진|나의|보유한?)쿠폰(이|은|들)?(몇|개수|보여|목록|뭐(야|있|가있)|알려)'),
+        ["내 쿠폰 몇 개야?", "내가 가진 쿠폰 보여줘", "보유 쿠폰 알려줘", "내 쿠폰 목록 보여줘"],
+        answer_coupon_count,
+    ),
+    (
+        'top_stamps',
+        re.compile(r'스탬프(가장|제일)?많이(모은|모인|쌓인)|리워드(받기)?(가장|제일)?가까운'),
+        ["스탬프 많이 모은 쿠폰 알려줘", "스탬프 제일 많은 쿠폰 뭐야?", "리워드 곧 받을 수 있는 쿠폰 있어?"],
+        answer_top_stamps,
+    ),
+    (
+        'area',
+        re.compile(r'^(?P<area>[가-힣\d]+?[동구시군읍면가리])(에는|에|쪽에는|쪽에)(뭐|뭐가|어떤|무슨).*있'),
+        [],
+        answer_area,
+    ),
+    (
+        'how_to_use',
+        re.compile(r'(쿠폰|스탬프)(은|는|을|를)?(어떻게|어케)(사용|써|쓰|적립|모으|모아)\w{0,5}$'
+                   r'|(쿠폰|스탬프)적립은?(어떻게|어케)(해|하)\w{0,4}$|(쿠폰|스탬프)(사용법|사용방법|적립방법)'),
+        ["이 쿠폰 어떻게 사용해?", "스탬프 적립은 어떻게 해?", "쿠폰 사용법 알려줘"],
+        lambda match, get_user_context: HOW_TO_USE_ANSWER,
+    ),
+    (
+        'favorite',
+        re.compile(r'즐겨찾기(는|가|란|이)?(뭐|무엇)|즐겨찾기(는|를|은)?(어떻게|어케)(사용|써|쓰|추가|등록)\w{0,5}$'),
+        ["즐겨찾기는 뭐야?", "즐겨찾기 어떻게 써?"],
+        lambda match, get_user_context: FAVORITE_ANSWER,
+    ),
+]
+
+# 예시 질문들의 2-gram 집합 (의도 이름, 2-gram 집합)
+EXAMPLE_INDEX = [
+    (name, get_bigrams(normalize_question(example)))
+    for name, _, examples, _ in INTENTS
+    for example in examples
+]
+
+
+def classify_intent(user_message: str):
+    """
+    질문의 의도를 분류하고 (의도 이름, 규칙의 match 또는 None)을 반환합니다. 분류되지 않으면 None을 반환합니다.
+    """
+    question = normalize_question(user_message)
+    if OTHER_ACTIONS.search(question):
+        return None
+
+    for name, rule, _, _ in INTENTS:
+        match = rule.search(question)
+        if match:
+            return name, match
+
+    bigrams = get_bigrams(question)
+    best_name, best_similarity = None, 0.0
+    for name, example_bigrams in EXAMPLE_INDEX:
+        similarity = get_similarity(bigrams, example_bigrams)
+        if similarity > best_similarity:
+            best_name, best_similarity = name, similarity
+    if best_similarity >= settings.CHAT_INTENT_MIN_SIMILARITY:
+        return best_name, None
+    return None
+
+
+def answer_locally(user_message: str, get_user_context) -> tuple[str, str] | None:
+    """
+    OpenAI 없이 답할 수 있는 질문이면 (의도 이름, 답변)을 반환하고, 아니면 None을 반환합니다.
+
+    get_user_context는 사용자 컨텍스트(CouponbookAssistant._get_user_context의 반환값)를 반환하는 함수로, 필요한 의도에서만 호출합니다.
+    """
+    if not settings.CHAT_INTENT_ROUTER:
+        return None
+
+    intent = classify_intent(user_message)
+    if intent is None:
+        return None
+
+    name, match = intent
+    answer = next(answer for intent_name, _, _, answer in INTENTS if intent_name == name)
+    response = answer(match, get_user_context)
+    if response is None:
+        return None
+    return name, response
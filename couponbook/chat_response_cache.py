@@ -0,0 +1,95 @@
+"""
+개인 정보와 상관없는 일반 질문(앱 사용법 등)에 대한 AI 어시스턴트 답변을 모든 사용자가 함께 쓰는 캐시입니다.
+
+- 대화 히스토리 없이 들어온 질문 중, 앱 기능(스탬프, 쿠폰, 리워드 등)에 대해 묻고(어떻게, 뭐야 등)
+  나, 근처, 추천 같은 개인적인 표현이 없는 질문만 캐시 대상입니다.
+- 캐시 대상 질문은 사용자 정보 없이 시스템 프롬프트와 질문만으로 OpenAI를 호출합니다.
+  그래서 캐시된 답변에는 어떤 사용자의 정보도 들어가지 않고, 다른 사용자에게 그대로 보여줘도 됩니다.
+- 캐시 키는 정규화한 질문(chat_intents.normalize_question)이고, 정규화한 질문이 정확히 같을 때만 답변을 씁니다.
+  글자가 대부분 겹쳐도 "스탬프 적립하는 방법"과 "스탬프 취소하는 방법"처럼 답이 다른 질문이 있으므로, 비슷한 질문은 찾지 않습니다.
+- 적중/실패 횟수를 캐시에 세어서 적중률을 확인할 수 있습니다. (manage.py chat_cache_stats)
+"""
+
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from couponbook.chat_intents import normalize_question
+
+# 시스템 프롬프트나 모델을 바꾸면 올려서, 이전 답변을 쓰지 않게 합니다.
+RESPONSE_CACHE_VERSION = 1
+RESPONSE_CACHE_PREFIX = f'couponbook:chat-response:v{RESPONSE_CACHE_VERSION}'
+HITS_KEY = f'{RESPONSE_CACHE_PREFIX}:hits'
+MISSES_KEY = f'{RESPONSE_CACHE_PREFIX}:misses'
+
+# 앱 기능에 대한 질문인지 (둘 다 있어야 캐시 대상)
+APP_TOPIC = re.compile(r'스탬프|쿠폰|리워드|즐겨찾기|적립|영수증|앱|사용법|회원|로그인')
+GENERIC_QUESTION = re.compile(r'어떻게|어케|뭐야|뭔가요|뭐예요|무엇|방법|왜|언제|되나|돼\?|되요|돼요|가능|차이|있어\?|있나요')
+# 사용자마다 답이 달라지는 표현 (하나라도 있으면 캐시하지 않음)
+PERSONAL_WORDS = re.compile(r'(^|\s)(내|나|난|제|저|전|우리)(가|는|의|꺼|거|한테|도)?(\s|$)|'
+                            r'근처|주변|추천|가진|보유|모은|모았|남은|몇|어디|여기|이 가게|동네|지역|위치')
+
+
+def is_cacheable_question(user_message: str, conversation_history) -> bool:
+    """
+    질문이 개인 정보와 상관없는 일반 질문이라서 답변을 모든 사용자가 함께 쓸 수 있는지 반환합니다.
+
+    대화 히스토리가 있으면 답변이 앞의 대화에 따라 달라지므로 캐시하지 않습니다.
+    """
+    if not settings.CHAT_RESPONSE_CACHE or conversation_history:
+        return False
+    return bool(APP_TOPIC.search(user_message) and GENERIC_QUESTION.search(user_message)
+                and not PERSONAL_WORDS.search(user_message))
+
+
+def get_response_cache_key(question: str) -> str:
+    """
+    정규화된 질문의 답변 캐시 키입니다.
+    """
+    digest = hashlib.md5(question.encode()).hexdigest()
+    return f'{RESPONSE_CACHE_PREFIX}:{digest}'
+
+
+def increment_counter(key: str):
+    """
+    적중/실패 횟수를 1 올립니다.
+    """
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_cached_response(user_message: str) -> str | None:
+    """
+    같은 질문(공백, 문장 부호, 대소문자 무시)의 캐시된 답변을 반환합니다. 없으면 None을 반환합니다.
+    """
+    response = cache.get(get_response_cache_key(normalize_question(user_message)))
+    increment_counter(HITS_KEY if response is not None else MISSES_KEY)
+    return response
+
+
+def set_cached_response(user_message: str, response: str):
+    """
+    질문의 답변을 settings.CHAT_RESPONSE_CACHE_TTL초 동안 캐시합니다.
+    """
+    cache.set(get_response_cache_key(normalize_question(user_message)), response, settings.CHAT_RESPONSE_CACHE_TTL)
+
+
+def get_stats() -> dict:
+    """
+    답변 캐시의 적중 횟수, 실패 횟수, 적중률(0~1)을 반환합니다.
+    """
+    hits, misses = cache.get(HITS_KEY, 0), cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': hits / total if total else 0.0}
+
+
+def reset_stats():
+    """
+    적중/실패 횟수를 0으로 되돌립니다.
+    """
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,112 @@
+"""
+유저별 쿠폰 큐레이션 결과(추천 쿠폰 템플릿 id 목록) 캐시입니다.
+
+- 유저가 쿠폰이나 스탬프를 얻으면(쿠폰북 버전 변경) 캐시를 버리고 바로 다시 큐레이션합니다.
+- 추천 후보(쿠폰 템플릿, 가게, 리워드 정보)가 바뀌었거나 CURATION_CACHE_TTL이 지났다면,
+  이전 결과를 그대로 응답하면서 백그라운드 스레드에서 다시 큐레이션합니다. (stale-while-revalidate)
+
+이전 결과에 이미 보유했거나 만료된 쿠폰 템플릿이 있더라도, 뷰에서 현재 후보 쿼리셋으로 다시 거르므로 응답에 나오지 않습니다.
+버전 번호를 워커끼리 함께 쓰지 않는 캐시라면(settings.VERSIONED_CACHE가 꺼져 있으면) 캐시하지 않고 매번 큐레이션합니다.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from couponbook.caching import (CURATION_CANDIDATES_VERSION_KEY,
+                                get_couponbook_version_key, get_version,
+                                is_versioned_cache_enabled)
+from couponbook.models import CouponBook
+
+_executor = ThreadPoolExecutor(max_workers=settings.CURATION_REFRESH_WORKERS, thread_name_prefix='curation-refresh')
+
+
+def get_curation_cache_key(user_id: int) -> str:
+    """
+    유저의 큐레이션 결과 캐시 키입니다.
+    """
+    return f'couponbook:curation:{user_id}'
+
+
+def get_versions(couponbook_id: int | None) -> tuple[int, int]:
+    """
+    유저의 쿠폰북 버전과 추천 후보 버전을 반환합니다.
+    """
+    return get_version(get_couponbook_version_key(couponbook_id)), get_version(CURATION_CANDIDATES_VERSION_KEY)
+
+
+def refresh_curated_ids(user, curate: Callable[[], list[int]]) -> list[int]:
+    """
+    큐레이션을 실행해서 결과를 캐시에 저장하고 반환합니다.
+
+    큐레이션 도중에 데이터가 바뀌면 다음 조회에서 다시 큐레이션하도록, 버전은 큐레이션 전에 읽어둡니다.
+    """
+    couponbook_id = CouponBook.objects.filter(user=user).values_list('id', flat=True).first()
+    versions = get_versions(couponbook_id)
+    ids = curate()
+    cache.set(get_curation_cache_key(user.id), {
+        'ids': ids,
+        'couponbook_id': couponbook_id,
+        'versions': versions,
+        'created_at': time.time(),
+    }, settings.CURATION_CACHE_STALE_TTL)
+    return ids
+
+
+def schedule_refresh(user, curate: Callable[[], list[int]]):
+    """
+    큐레이션 결과를 백그라운드 스레드에서 새로 만듭니다. 이미 새로 만드는 중이면 아무것도 하지 않습니다.
+
+    settings.CURATION_REFRESH_IN_BACKGROUND가 꺼져 있으면 현재 스레드에서 바로 실행합니다.
+    """
+    lock_key = f'{get_curation_cache_key(user.id)}:refreshing'
+    if not cache.add(lock_key, 1, settings.CURATION_REFRESH_TIMEOUT):
+        return
+
+    in_background = settings.CURATION_REFRESH_IN_BACKGROUND
+
+    def run():
+        try:
+            refresh_curated_ids(user, curate)
+        except Exception as e:
+            # 새로 만들지 못해도 이전 결과를 계속 응답하고, 다음 조회에서 다시 시도합니다.
+            print(f"큐레이션 결과를 새로 만들지 못했습니다: {e}")
+        finally:
+            cache.delete(lock_key)
+            if in_background:
+                # 백그라운드 스레드가 연 DB 연결을 닫습니다.
+                connections.close_all()
+
+    if in_background:
+        _executor.submit(run)
+    else:
+        run()
+
+
+def get_curated_ids(user, curate: Callable[[], list[int]]) -> list[int]:
+    """
+    유저의 큐레이션 결과를 캐시에서 가져옵니다. curate는 큐레이션을 실행해서 추천 쿠폰 템플릿 id 목록을 반환하는 함수입니다.
+
+    - 캐시가 없거나 유저의 쿠폰북이 바뀌었으면: 바로 큐레이션해서 반환
+    - 추천 후보가 바뀌었거나 CURATION_CACHE_TTL이 지났으면: 이전 결과를 반환하고 백그라운드에서 새로 만듦
+    - 그 외: 이전 결과를 그대로 반환
+    """
+    if not is_versioned_cache_enabled():
+        return curate()
+
+    entry = cache.get(get_curation_cache_key(user.id))
+    if entry is None:
+        return refresh_curated_ids(user, curate)
+
+    couponbook_version, candidates_version = get_versions(entry['couponbook_id'])
+    if couponbook_version != entry['versions'][0]:
+        return refresh_curated_ids(user, curate)
+
+    is_expired = time.time() - entry['created_at'] >= settings.CURATION_CACHE_TTL
+    if candidates_version != entry['versions'][1] or is_expired:
+        schedule_refresh(user, curate)
+    return entry['ids']
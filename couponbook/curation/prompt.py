@@ -0,0 +1,109 @@
+"""
+AI 큐레이터가 OpenAI에 보내는 입력(JSON)을 작게 만드는 함수들입니다.
+
+- 후보는 로컬 추천 엔진이 고른 상위 후보들만 넣습니다. (AICurator.curate 참고)
+- 행마다 키를 반복하지 않도록, 열 이름 목록(columns)과 값 목록의 목록(rows)으로 인코딩합니다.
+- 입력이 토큰 예산을 넘으면 추천 순위가 낮은 후보부터(최소 n개는 남김), 그다음 오래된 이용 내역부터 뺍니다.
+"""
+
+from json import dumps
+from math import ceil
+
+from couponbook.models import CouponTemplate
+
+HISTORY_COLUMNS = ('place', 'address', 'tags', 'stamps', 'max_stamps', 'last_stamped_at')
+CANDIDATE_COLUMNS = ('id', 'place', 'district', 'tags', 'reward', 'reward_stamps', 'remaining')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    토크나이저 없이 문자열의 토큰 수를 어림합니다.
+
+    영문, 숫자, 기호는 4글자에 1토큰, 한글 등 그 외의 글자는 1글자에 1토큰으로 넉넉하게 셉니다.
+    """
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return ceil(ascii_chars / 4) + len(text) - ascii_chars
+
+
+def dumps_compact(data) -> str:
+    """
+    공백 없는 JSON 문자열로 바꿉니다.
+    """
+    return dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def encode_history(history: list[dict]) -> list[list]:
+    """
+    UserStatistics.make_history의 결과를 HISTORY_COLUMNS 순서의 행 목록으로 바꿉니다. 최근에 스탬프를 적립한 쿠폰이 앞에 옵니다.
+
+    스탬프 적립 히스토리 전체 대신 적립 수와 마지막 적립 시각만 넣습니다.
+    """
+    rows = []
+    for coupon in history:
+        data = coupon['data']
+        place_info = data['place_info']
+        stamp_history = data['stamp_history']
+        last_stamped_at = stamp_history[-1]['created_at'] if stamp_history else None
+        rows.append([place_info['name'], place_info['address'], place_info['tags'],
+                     data['current_stamps'], data['max_stamps'], last_stamped_at])
+    rows.sort(key=lambda row: row[-1] or '', reverse=True)
+    return rows
+
+
+def encode_candidates(candidate_ids: list[int]) -> list[list]:
+    """
+    후보 쿠폰 템플릿들을 CANDIDATE_COLUMNS 순서의 행 목록으로 바꿉니다. 행은 candidate_ids의 순서를 따릅니다. (쿼리 1번)
+
+    남은 선착순 인원 수(remaining)는 인원 제한이 없으면 null입니다.
+    """
+    rows = CouponTemplate.objects.filter(id__in=candidate_ids).values_list(
+        'id', 'place__name', 'place__address_district__district', 'place__tags',
+        'reward_info__reward', 'reward_info__amount', 'first_n_persons', 'issued_count')
+    rows_by_id = {}
+    for *row, first_n_persons, issued_count in rows:
+        remaining = max(0, first_n_persons - issued_count) if first_n_persons else None
+        rows_by_id[row[0]] = [*row, remaining]
+    return [rows_by_id[i] for i in candidate_ids if i in rows_by_id]
+
+
+def build_prompt_input(history_rows: list[list], candidate_rows: list[list], token_budget: int,
+                       min_candidates: int) -> tuple[str, dict]:
+    """
+    이용 내역과 후보 행 목록으로 입력 JSON 문자열을 만들고, (입력 JSON, 크기 지표)를 반환합니다.
+
+    입력이 token_budget(어림한 토큰 수)을 넘으면 후보를 min_candidates개까지 뒤에서부터 빼고,
+    그래도 넘으면 이용 내역을 뒤에서부터 뺍니다. 행마다 토큰 수를 한 번만 어림하므로 행 수에 비례하는 시간이 걸립니다.
+
+    크기 지표: chars, estimated_tokens, token_budget, candidates, dropped_candidates, history, dropped_history
+    """
+    def make_input(history, candidates) -> dict:
+        return {
+            'user_statistics': {'columns': HISTORY_COLUMNS, 'rows': history},
+            'coupon_templates': {'columns': CANDIDATE_COLUMNS, 'rows': candidates},
+        }
+
+    # 행 하나마다 행 JSON과 구분자(쉼표) 하나만큼의 토큰이 늘어납니다.
+    base_tokens = estimate_tokens(dumps_compact(make_input([], [])))
+    history_tokens = [estimate_tokens(dumps_compact(row)) + 1 for row in history_rows]
+    candidate_tokens = [estimate_tokens(dumps_compact(row)) + 1 for row in candidate_rows]
+
+    total = base_tokens + sum(history_tokens) + sum(candidate_tokens)
+    n_candidates, n_history = len(candidate_rows), len(history_rows)
+    while total > token_budget and n_candidates > min_candidates:
+        n_candidates -= 1
+        total -= candidate_tokens[n_candidates]
+    while total > token_budget and n_history > 0:
+        n_history -= 1
+        total -= history_tokens[n_history]
+
+    prompt_input = dumps_compact(make_input(history_rows[:n_history], candidate_rows[:n_candidates]))
+    metrics = {
+        'chars': len(prompt_input),
+        'estimated_tokens': estimate_tokens(prompt_input),
+        'token_budget': token_budget,
+        'candidates': n_candidates,
+        'dropped_candidates': len(candidate_rows) - n_candidates,
+        'history': n_history,
+        'dropped_history': len(history_rows) - n_history,
+    }
+    return prompt_input, metrics
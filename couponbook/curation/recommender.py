@@ -0,0 +1,171 @@
+"""
+외부 API 없이 로컬에서 쿠폰 템플릿을 추천하는 추천 엔진입니다. AICurator의 기본 큐레이션 방식입니다.
+
+후보 쿠폰 템플릿들을 쿼리 하나로 열(column) 단위로 가져온 뒤, 아래의 특징들을 열마다 한 번에 계산하고 가중합으로 점수를 매깁니다.
+- tag: 유저가 쿠폰을 모은 가게들의 태그와 겹치는 정도
+- district: 자주 가는 지역(FavoriteLocation), 쿠폰을 모은 가게들의 지역과 같은지
+- distance: 기준 위치(없으면 쿠폰을 모은 가게들의 중심)로부터의 거리
+- remaining: 남은 선착순 자리 비율
+- reward: 리워드를 받기 위해 필요한 스탬프 수 (적을수록 높음)
+
+같은 입력에는 항상 같은 결과를 돌려주고, 점수가 같으면 id가 작은 쿠폰 템플릿이 먼저 옵니다.
+"""
+
+from decimal import Decimal
+from math import exp
+
+from accounts.models import FavoriteLocation
+from couponbook.latlng.utils import get_distance_m
+from couponbook.models import CouponTemplate, UserStatisticsSnapshot
+
+# 거리 점수가 1/e로 줄어드는 거리(m)
+DISTANCE_SCALE_M = 3000
+
+DEFAULT_WEIGHTS = {
+    'tag': 3.0,
+    'district': 2.0,
+    'distance': 1.5,
+    'remaining': 1.0,
+    'reward': 1.0,
+}
+
+# 지역 점수: 자주 가는 지역의 법정동 > 쿠폰을 모은 가게의 법정동 > 같은 시/군/구
+FAVORITE_DISTRICT_SCORE = 1.0
+VISITED_DISTRICT_SCORE = 0.6
+SAME_CITY_SCORE = 0.3
+
+CANDIDATE_COLUMNS = (
+    'id', 'place__tags',
+    'place__address_district__province', 'place__address_district__city', 'place__address_district__district',
+    'place__lat', 'place__lng', 'first_n_persons', 'issued_count', 'reward_info__amount',
+)
+
+
+def split_tags(tags: str | None) -> set[str]:
+    """
+    쉼표로 구분된 가게 태그 문자열을 정규화된 태그 집합으로 바꿉니다.
+    """
+    return {tag.strip().lower() for tag in (tags or '').split(',') if tag.strip()}
+
+
+class UserProfile:
+    """
+    추천에 쓰이는 유저의 취향 프로필입니다.
+
+    - tag_weights: 태그별 가중치 (쿠폰마다 1 + 적립한 스탬프 수)
+    - favorite_districts, visited_districts: (광역시, 시/군/구, 법정동) 집합
+    - cities: 자주 가는 지역과 쿠폰을 모은 가게의 (광역시, 시/군/구) 집합
+    - center: 쿠폰을 모은 가게들의 평균 (위도, 경도). 없으면 None
+    """
+
+    def __init__(self, tag_weights: dict[str, float], favorite_districts: set[tuple], visited_districts: set[tuple],
+                 center: tuple[float, float] | None):
+        self.tag_weights = tag_weights
+        self.favorite_districts = favorite_districts
+        self.visited_districts = visited_districts
+        self.cities = {district[:2] for district in favorite_districts | visited_districts}
+        self.center = center
+
+    @classmethod
+    def for_user(cls, user) -> 'UserProfile':
+        """
+        유저 통계 스냅샷과 자주 가는 지역으로 프로필을 만듭니다. (쿼리 3번)
+        """
+        snapshot = UserStatisticsSnapshot.get_for_user(user)
+        history = snapshot.history.values() if snapshot else []
+        stamps_by_template = {}
+        for coupon_data in history:
+            template_id = coupon_data['template_id']
+            stamps_by_template[template_id] = stamps_by_template.get(template_id, 0) + len(coupon_data['stamped_at'])
+
+        tag_weights = {}
+        visited_districts = set()
+        latlngs = []
+        rows = CouponTemplate.objects.filter(id__in=stamps_by_template).values_list(
+            'id', 'place__tags', 'place__address_district__province', 'place__address_district__city',
+            'place__address_district__district', 'place__lat', 'place__lng')
+        for template_id, tags, province, city, district, lat, lng in rows:
+            weight = 1 + stamps_by_template[template_id]
+            for tag in split_tags(tags):
+                tag_weights[tag] = tag_weights.get(tag, 0) + weight
+            visited_districts.add((province, city, district))
+            if lat is not None and lng is not None:
+                latlngs.append((float(lat), float(lng)))
+
+        favorite_districts = set(FavoriteLocation.objects.filter(user=user).values_list('province', 'city', 'district'))
+        center = None
+        if latlngs:
+            center = (sum(lat for lat, _ in latlngs) / len(latlngs), sum(lng for _, lng in latlngs) / len(latlngs))
+
+        return cls(tag_weights, favorite_districts, visited_districts, center)
+
+
+class LocalRecommender:
+    """
+    후보 쿠폰 템플릿들에 점수를 매겨서 추천 순서대로 정렬하는 로컬 추천 엔진입니다.
+    """
+
+    def __init__(self, weights: dict[str, float] | None = None):
+        """
+        특징별 가중치를 인자로 받습니다. 전달하지 않은 특징은 DEFAULT_WEIGHTS의 값을 사용합니다.
+        """
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+
+    def score(self, profile: UserProfile, coupon_templates,
+              origin: tuple[Decimal | float, Decimal | float] | None = None) -> dict[int, float]:
+        """
+        후보 쿠폰 템플릿들의 점수를 {쿠폰 템플릿 id: 점수} 딕셔너리로 반환합니다. (쿼리 1번)
+
+        origin은 거리 점수의 기준 위치(위도, 경도)이며, 없으면 프로필의 중심을 사용합니다.
+        """
+        rows = list(coupon_templates.order_by().values_list(*CANDIDATE_COLUMNS))
+        if not rows:
+            return {}
+        ids, tags, provinces, cities, districts, lats, lngs, first_n, issued, amounts = zip(*rows)
+
+        tag_total = sum(profile.tag_weights.values())
+        tag_scores = [
+            sum(profile.tag_weights.get(tag, 0) for tag in split_tags(t)) / tag_total if tag_total else 0.0
+            for t in tags
+        ]
+
+        district_scores = [
+            FAVORITE_DISTRICT_SCORE if key in profile.favorite_districts
+            else VISITED_DISTRICT_SCORE if key in profile.visited_districts
+            else SAME_CITY_SCORE if key[:2] in profile.cities
+            else 0.0
+            for key in zip(provinces, cities, districts)
+        ]
+
+        origin = origin or profile.center
+        distance_scores = [
+            exp(-get_distance_m(origin[0], origin[1], lat, lng) / DISTANCE_SCALE_M)
+            if origin and lat is not None and lng is not None else 0.0
+            for lat, lng in zip(lats, lngs)
+        ]
+
+        # 선착순 인원 제한이 없으면 남은 자리가 충분한 것으로 봅니다.
+        remaining_scores = [max(0, n - i) / n if n else 1.0 for n, i in zip(first_n, issued)]
+
+        min_amount = min((amount for amount in amounts if amount), default=0)
+        reward_scores = [min_amount / amount if amount else 0.0 for amount in amounts]
+
+        columns = {
+            'tag': tag_scores,
+            'district': district_scores,
+            'distance': distance_scores,
+            'remaining': remaining_scores,
+            'reward': reward_scores,
+        }
+        totals = [0.0] * len(ids)
+        for feature, values in columns.items():
+            weight = self.weights.get(feature, 0)
+            totals = [total + weight * value for total, value in zip(totals, values)]
+        return dict(zip(ids, totals))
+
+    def rank(self, profile: UserProfile, coupon_templates, origin=None) -> list[int]:
+        """
+        후보 쿠폰 템플릿 id들을 점수가 높은 순서(같으면 id 순서)로 정렬해서 반환합니다.
+        """
+        scores = self.score(profile, coupon_templates, origin)
+        return sorted(scores, key=lambda template_id: (-scores[template_id], template_id))
@@ -1,12 +1,15 @@
 from datetime import datetime
-from json import dumps, loads
+from json import loads
 
 from accounts.models import User
+from couponbook.ai_offload import call_ai, get_openai_client
 from couponbook.models import *
 from decouple import config
+from django.conf import settings
 from openai import OpenAI
 
-from .serializers import CouponTemplateDictSerializer
+from .prompt import build_prompt_input, encode_candidates, encode_history
+from .recommender import LocalRecommender, UserProfile
 
 
 class UserStatistics:
@@ -68,14 +71,6 @@ class UserStatistics:
         place_info['tags'] = place.tags
         return place_info
     
-    def calc_current_stamps(self, coupon: Coupon) -> int:
-        """
-        현재까지 적립된 스탬프 수를 계산합니다.
-        """
-
-        stamps = coupon.stamps
-        return stamps.count()
-    
     def calc_max_stamps(self, coupon_template: CouponTemplate) -> int:
         """
         쿠폰 완성을 위해 스탬프가 몇개 필요한지를 계산합니다.
@@ -84,86 +79,126 @@ class UserStatistics:
         reward_info: RewardsInfo = coupon_template.reward_info
         return reward_info.amount
     
-    def make_stamp_history(self, coupon: Coupon) -> list[dict]:
+    def make_stamp_history(self, stamped_at: list[str]) -> list[dict]:
         """
-        해당 쿠폰의 스탬프 적립 히스토리를 만듭니다.
+        스탬프 적립 시각(ISO 8601) 목록으로 해당 쿠폰의 스탬프 적립 히스토리를 만듭니다.
         """
 
-        stamps = coupon.stamps.order_by('created_at')
         history_list = []
-        for number, stamp in enumerate(stamps, start=1):
+        for number, created_at in enumerate(stamped_at, start=1):
             stamp_data = {}
             stamp_data['count'] = number
-            stamp_data['created_at'] = self.format_time(stamp.created_at)
+            stamp_data['created_at'] = self.format_time(datetime.fromisoformat(created_at))
             history_list.append(stamp_data)
         return history_list
     
-    def make_coupon_data(self, coupon: Coupon) -> dict:
+    def make_coupon_data(self, coupon_template: CouponTemplate, stamped_at: list[str]) -> dict:
         """
-        쿠폰의 데이터를 만들어 딕셔너리로 반환합니다.
+        쿠폰의 원본 쿠폰 템플릿과 스탬프 적립 시각 목록으로 쿠폰의 데이터를 만들어 딕셔너리로 반환합니다.
         """
 
         data = {}
-        original_template = coupon.original_template
-        data['place_info'] = self.extract_place_info(original_template.place)
-        data['max_stamps'] = self.calc_max_stamps(original_template)
-        data['current_stamps'] = self.calc_current_stamps(coupon)
-        data['stamp_history'] = self.make_stamp_history(coupon)
+        data['place_info'] = self.extract_place_info(coupon_template.place)
+        data['max_stamps'] = self.calc_max_stamps(coupon_template)
+        data['current_stamps'] = len(stamped_at)
+        data['stamp_history'] = self.make_stamp_history(stamped_at)
         return data
     
     def make_history(self) -> list[dict]:
         """
         현재 보유하고 있는 쿠폰과, 쿠폰에 연결된 가게, 스탬프 적립 기록을 만들어 반환합니다.
+
+        쿠폰과 스탬프 기록은 유저 통계 스냅샷(UserStatisticsSnapshot)에서, 가게와 리워드 정보는 쿠폰 템플릿에서 한 번에 가져오므로
+        보유한 쿠폰 수와 관계없이 쿼리 수가 일정합니다.
         """
 
-        coupons = Coupon.objects.filter(couponbook=self.own_couponbook)
+        snapshot = UserStatisticsSnapshot.get_for_user(self.user)
+        if snapshot is None:
+            print("유저의 쿠폰북이 존재하지 않습니다.")
+            return []
+
+        template_ids = {coupon_data['template_id'] for coupon_data in snapshot.history.values()}
+        coupon_templates = CouponTemplate.objects.select_related(
+            'place__address_district', 'reward_info').in_bulk(template_ids)
+
         history = []
-        for coupon in coupons:
+        for coupon_id, coupon_data in sorted(snapshot.history.items(), key=lambda item: int(item[0])):
+            coupon_template = coupon_templates.get(coupon_data['template_id'])
+            if coupon_template is None:
+                continue
             coupon_dict = {}
-            coupon_dict['id'] = coupon.id
-            coupon_dict['data'] = self.make_coupon_data(coupon)
+            coupon_dict['id'] = int(coupon_id)
+            coupon_dict['data'] = self.make_coupon_data(coupon_template, coupon_data['stamped_at'])
             history.append(coupon_dict)
         return history
 
 class AICurator:
     """
-    OpenAI를 이용하여 쿠폰 큐레이션 기능을 제공하는 큐레이터 객체입니다.
+    쿠폰 큐레이션 기능을 제공하는 큐레이터 객체입니다.
+
+    기본적으로 네트워크 호출 없이 로컬 추천 엔진(LocalRecommender)으로 추천합니다.
+    settings.CURATION_LLM_RERANK가 켜져 있고 OpenAI API 키가 있으면, 로컬 추천 상위 후보들 중에서 OpenAI가 다시 골라냅니다. (re-rank)
     """
 
-    def __init__(self, openai_api_key: str = ""):
+    def __init__(self, openai_api_key: str = "", recommender: LocalRecommender | None = None,
+                 llm_rerank: bool | None = None):
         """
         OpenAI API 키를 인자로 받습니다. 입력하지 않거나, 빈 문자열이면 .env의 OPENAI_API_KEY 값을 사용합니다.
+
+        recommender를 전달하지 않으면 기본 가중치의 LocalRecommender를 사용하고,
+        llm_rerank를 전달하지 않으면 settings.CURATION_LLM_RERANK를 따릅니다.
         """
 
+        self.recommender = recommender or LocalRecommender()
+        self.llm_rerank = settings.CURATION_LLM_RERANK if llm_rerank is None else llm_rerank
+
         # OPENAI_API_KEY를 .env에서 읽습니다. (없는 경우 빈 문자열)
         self.api_key = openai_api_key or config("OPENAI_API_KEY", default="")
         self.client: OpenAI | None = None
-        if self.api_key:
+        # 마지막으로 만든 프롬프트 입력의 크기 지표 (prompt.build_prompt_input 참고)
+        self.prompt_metrics: dict = {}
+        if self.api_key and self.llm_rerank:
             # 키가 없는 경우에도 서버가 죽지 않도록, 없는 경우에는 client를 생성하지 않습니다.
-            self.client = OpenAI(api_key=self.api_key)
+            self.client = get_openai_client(self.api_key)
 
-    def _build_prompt(self, statistics: UserStatistics, coupon_templates) -> str:
+    def _build_prompt(self, statistics: UserStatistics, candidate_ids: list[int], n: int = 3) -> str:
         """
-        유저 통계와 쿠폰 템플릿 정보를 JSON 형태의 문자열로 만들어 프롬프트에 사용합니다.
+        유저 통계와 후보 쿠폰 템플릿 정보를 열 단위로 압축한 JSON 문자열로 만들어 프롬프트에 사용합니다.
+
+        입력은 settings.CURATION_PROMPT_TOKEN_BUDGET 안으로 줄이고(후보는 최소 n개 유지), 크기 지표는 self.prompt_metrics에 남깁니다.
         """
 
-        statistics_history = statistics.make_history()
-        input_data_dict = {
-            "user_statistics": statistics_history,
-            "coupon_templates": CouponTemplateDictSerializer(coupon_templates, many=True).data,
-        }
-        return dumps(input_data_dict, ensure_ascii=False)
+        prompt_input, self.prompt_metrics = build_prompt_input(
+            encode_history(statistics.make_history()),
+            encode_candidates(candidate_ids),
+            token_budget=settings.CURATION_PROMPT_TOKEN_BUDGET,
+            min_candidates=n,
+        )
+        return prompt_input
 
-    def curate(self, statistics: UserStatistics, coupon_templates) -> list[int]:
+    def curate(self, statistics: UserStatistics, coupon_templates, n: int = 3) -> list[int]:
         """
-        쿠폰 큐레이션을 실행합니다. 큐레이션 결과로 추천하는 쿠폰의 id 리스트가 반환됩니다.
+        쿠폰 큐레이션을 실행합니다. 큐레이션 결과로 추천하는 쿠폰의 id 리스트가 추천 순서대로 반환됩니다.
         """
 
-        # OpenAI 클라이언트가 없으면(키가 없거나 설정 안 됨) 단순 fallback: 상위 3개 추천
-        if not self.client:
-            return list(coupon_templates.values_list("id", flat=True)[:3])
+        profile = UserProfile.for_user(statistics.user)
+        ranked_ids = self.recommender.rank(profile, coupon_templates)
+
+        # OpenAI 재정렬을 사용하지 않거나, 후보가 n개 이하라서 고를 필요가 없으면 로컬 추천 결과를 그대로 사용
+        if not self.client or len(ranked_ids) <= n:
+            return ranked_ids[:n]
+
+        candidate_ids = ranked_ids[:settings.CURATION_RERANK_CANDIDATES]
+        picked_ids = self.rerank(statistics, candidate_ids, n)
+        # OpenAI가 n개보다 적게 골랐다면 로컬 추천 순서대로 채움
+        return (picked_ids + [i for i in candidate_ids if i not in picked_ids])[:n]
+
+    def rerank(self, statistics: UserStatistics, candidate_ids: list[int], n: int = 3) -> list[int]:
+        """
+        로컬 추천 상위 후보들 중에서 OpenAI로 n개를 골라 반환합니다. 후보에 없는 id는 버리고, 실패하면 빈 리스트를 반환합니다.
+        """
 
-        prompt_json = self._build_prompt(statistics, coupon_templates)
+        prompt_json = self._build_prompt(statistics, candidate_ids, n)
 
         system_message = (
             "너는 개인의 취향을 분석하고, 이를 토대로 주변의 음식점을 추천해주는 비서야. "
@@ -172,15 +207,17 @@ class AICurator:
         )
         user_message = (
             "다음은 유저의 쿠폰 이용 내역과 현재 게시중인 쿠폰 템플릿 목록이야.\n"
-            "이 정보를 보고 추천할 coupon_template의 id 3개를 배열 형태로 골라줘. "
-            "만약 coupon_template이 3개 이하라면 모든 coupon_template의 id를 그대로 반환해.\n"
+            f"이 정보를 보고 추천할 coupon_template의 id {n}개를 배열 형태로 골라줘. "
+            "coupon_template은 추천 점수가 높은 순서로 정렬되어 있어.\n"
+            "각 목록은 columns(열 이름)와 rows(행마다 열 순서대로의 값)로 되어 있어.\n"
             "입력(JSON):\n"
             f"{prompt_json}\n\n"
             '출력은 예시처럼 JSON으로만: {"coupon_template_ids":[1,2,3]}'
         )
 
         try:
-            response = self.client.chat.completions.create(
+            response = call_ai(
+                self.client.chat.completions.create,
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_message},
@@ -192,8 +229,12 @@ class AICurator:
             # content가 문자열이라고 가정하고 JSON 파싱
             data = loads(content)
             ids = data.get("coupon_template_ids", [])
-            # 정수 리스트만 반환하도록 방어 코드
-            return [int(i) for i in ids][:3]
+            # 후보에 있는 정수 id만 반환하도록 방어 코드
+            picked_ids = []
+            for i in map(int, ids):
+                if i in candidate_ids and i not in picked_ids:
+                    picked_ids.append(i)
+            return picked_ids[:n]
         except Exception:
-            # OpenAI 호출 실패 시에도 서버가 500으로 터지지 않도록 안전한 fallback
-            return list(coupon_templates.values_list("id", flat=True)[:3])
+            # OpenAI 호출 실패, 요청 과다, 시간 초과 시에도 서버가 500으로 터지지 않도록, 로컬 추천 결과를 사용하게 함
+            return []
@@ -3,7 +3,8 @@ from django.db.models import CharField, Q, Value
 from django.db.models.functions import Concat
 from django.utils import timezone
 
-from .models import Coupon, CouponTemplate
+from .models import Coupon, CouponTemplate, PlaceOpenInterval
+from .search import place_search_q
 
 
 def get_queryset_with_full_addr(queryset, field_name: str=""):
@@ -33,6 +34,8 @@ class CouponFilter(filters.FilterSet):
     - name    : 가게명 부분검색
     - is_open : 현재 영업중 여부
     - is_expired : 템플릿 유효기간 만료 여부
+
+    address, name은 인덱스가 있는 Place.search_text로 후보를 먼저 좁힌 뒤, 원래 조건으로 다시 확인합니다.
     """
 
     address = filters.CharFilter(method="filter_address")
@@ -40,9 +43,7 @@ class CouponFilter(filters.FilterSet):
         field_name="original_template__place__address_district__district",
         lookup_expr="iexact",
     )
-    name = filters.CharFilter(
-        field_name="original_template__place__name", lookup_expr="icontains"
-    )
+    name = filters.CharFilter(method="filter_name")
     is_open = filters.BooleanFilter(method="filter_is_open")
     is_expired = filters.BooleanFilter(method="filter_is_expired")
 
@@ -54,7 +55,17 @@ class CouponFilter(filters.FilterSet):
         if not value:
             return queryset
         q = get_queryset_with_full_addr(queryset, 'original_template')
-        return q.filter(full_addr__icontains=value)
+        return q.filter(place_search_q(value, 'original_template__place'), full_addr__icontains=value)
+
+    def filter_name(self, queryset, name: str, value: str):
+        """
+        가게 이름을 기준으로 필터링합니다. (부분 일치)
+        """
+
+        if not value:
+            return queryset
+        return queryset.filter(place_search_q(value, 'original_template__place'),
+                               original_template__place__name__icontains=value)
 
     def filter_is_open(self, queryset, name: str, value: bool):
         """
@@ -63,11 +74,8 @@ class CouponFilter(filters.FilterSet):
 
         if value is None:
             return queryset
-        now = timezone.localtime().time()
-        cond = (
-            Q(original_template__place__opens_at__lte=now)
-            & Q(original_template__place__last_order__gt=now)
-        )
+        # 자정을 넘기는 영업까지 반영된 영업 구간 인덱스로 확인합니다.
+        cond = PlaceOpenInterval.open_at('original_template__place')
         return queryset.filter(cond) if value else queryset
 
     def filter_is_expired(self, queryset, name: str, value: bool):
@@ -96,10 +104,12 @@ class CouponTemplateFilter(filters.FilterSet):
     - tag        : 가게 태그 부분검색
     - is_open    : 현재 영업중 여부
     - already_own: (로그인시) 내가 이미 보유한/보유하지 않은 템플릿
+
+    address, name, tag는 인덱스가 있는 Place.search_text로 후보를 먼저 좁힌 뒤, 원래 조건으로 다시 확인합니다.
     """
 
-    name = filters.CharFilter(field_name="place__name", lookup_expr="icontains")
-    tag = filters.CharFilter(field_name="place__tags", lookup_expr="icontains")
+    name = filters.CharFilter(method="filter_name")
+    tag = filters.CharFilter(method="filter_tag")
     district = filters.CharFilter(
         field_name="place__address_district__district", lookup_expr="iexact"
     )
@@ -115,7 +125,25 @@ class CouponTemplateFilter(filters.FilterSet):
         if not value:
             return queryset
         q = get_queryset_with_full_addr(queryset)
-        return q.filter(full_addr__icontains=value)
+        return q.filter(place_search_q(value), full_addr__icontains=value)
+
+    def filter_name(self, queryset, name: str, value: str):
+        """
+        가게 이름을 기준으로 필터링합니다. (부분 일치)
+        """
+
+        if not value:
+            return queryset
+        return queryset.filter(place_search_q(value), place__name__icontains=value)
+
+    def filter_tag(self, queryset, name: str, value: str):
+        """
+        가게 태그를 기준으로 필터링합니다. (부분 일치)
+        """
+
+        if not value:
+            return queryset
+        return queryset.filter(place_search_q(value), place__tags__icontains=value)
 
     def filter_is_open(self, queryset, name: str, value: bool):
         """
@@ -124,8 +152,7 @@ class CouponTemplateFilter(filters.FilterSet):
         
         if value is None:
             return queryset
-        now = timezone.localtime().time()
-        cond = Q(place__opens_at__lte=now) & Q(place__last_order__gt=now)
+        cond = PlaceOpenInterval.open_at('place')
         return queryset.filter(cond) if value else queryset
 
     def filter_already_own(self, queryset, name: str, value: bool):
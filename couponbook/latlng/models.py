@@ -1,7 +1,115 @@
+import random
+import threading
 from decimal import Decimal
+from time import monotonic, perf_counter, sleep
+from typing import Callable
 
 import requests
 from decouple import config
+from requests.adapters import HTTPAdapter
+
+
+class KakaoMapAPIError(Exception):
+    """
+    카카오맵 API 호출이 실패했을 때 발생하는 예외입니다.
+    """
+
+class CircuitOpenError(KakaoMapAPIError):
+    """
+    서킷 브레이커가 열려 있어서 카카오맵 API를 호출하지 않았을 때 발생하는 예외입니다.
+    """
+
+class CircuitBreaker:
+    """
+    외부 API 호출이 연속으로 실패하면 일정 시간 동안 호출을 막는 서킷 브레이커입니다.
+
+    - closed: 정상 상태입니다. 연속 실패가 failure_threshold번 쌓이면 open 상태가 됩니다.
+    - open: reset_timeout초 동안 호출을 막습니다.
+    - half-open: reset_timeout이 지나면 시험 호출을 한 번 허용합니다. 성공하면 closed, 실패하면 다시 open 상태가 됩니다.
+
+    여러 스레드에서 함께 사용해도 안전합니다.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        """
+        현재 상태(closed, open, half-open)입니다.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._trial_in_progress or monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow_request(self) -> bool:
+        """
+        지금 호출해도 되는지를 반환합니다. half-open 상태에서는 한 번의 시험 호출만 허용합니다.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial_in_progress and monotonic() - self._opened_at >= self.reset_timeout:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        """
+        호출 성공을 기록하고 closed 상태로 되돌립니다.
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        """
+        호출 실패를 기록합니다. 연속 실패가 기준을 넘거나 시험 호출이 실패하면 open 상태가 됩니다.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                self._opened_at = monotonic()
+                self._trial_in_progress = False
+
+
+def build_session(pool_maxsize: int = 10) -> requests.Session:
+    """
+    keep-alive 커넥션을 재사용하는 requests 세션을 만듭니다.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# 한 워커 프로세스 안의 모든 클라이언트가 공유하는 커넥션 풀과 서킷 브레이커
+_session = build_session()
+_circuit_breaker = CircuitBreaker()
+
+# 카카오맵 API 호출이 끝날 때마다 호출되는 메트릭 훅
+_metrics_hook: Callable[..., None] | None = None
+
+def set_metrics_hook(hook: Callable[..., None] | None):
+    """
+    카카오맵 API 호출이 끝날 때마다(성공, 실패 모두) 호출될 메트릭 훅을 등록합니다. None을 넘기면 해제됩니다.
+
+    훅은 다음 키워드 인자로 호출됩니다.
+    - elapsed: 재시도를 포함한 전체 소요 시간(초)
+    - success: 성공 여부
+    - status_code: 마지막 응답의 상태 코드 (응답을 받지 못했다면 None)
+    - attempts: 시도 횟수 (서킷 브레이커에 막혔다면 0)
+    """
+    global _metrics_hook
+    _metrics_hook = hook
 
 
 class KakaoMapPlace:
@@ -28,12 +136,26 @@ class KakaoMapPlace:
 class KakaoMapAPIClient:
     """
     REST API를 사용해서 카카오맵 API와 통신하는 클라이언트입니다.
+
+    모듈 단위로 공유되는 세션(커넥션 풀)과 서킷 브레이커를 사용하므로, 요청마다 클라이언트를 새로 만들어도 커넥션이 재사용됩니다.
+    느린 응답이 워커를 붙잡지 않도록 연결/읽기 타임아웃을 두고, 일시적인 실패(연결 오류, 타임아웃, 429, 5xx)는 지터를 섞은 백오프로 재시도합니다.
     """
-    def __init__(self, kakao_rest_api_key=None):
+    base_url = 'https://dapi.kakao.com'
+    # (연결 타임아웃, 읽기 타임아웃) 초
+    timeout = (3.05, 5)
+    # 첫 시도 이후의 최대 재시도 횟수
+    max_retries = 2
+    # 재시도 대기 시간의 기준값(초). n번째 재시도는 0 ~ backoff * 2^n 초 사이에서 무작위로 기다립니다.
+    backoff = 0.2
+    retry_status_codes = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, kakao_rest_api_key=None, base_url: str | None = None,
+                 session: requests.Session | None = None, circuit_breaker: CircuitBreaker | None = None):
         """
         카카오 디벨로퍼스 앱의 REST API 키가 필요합니다. (확인: 앱 > 앱 설정 > 앱 > 일반)
 
         REST API 키를 전달하지 않으면, .env에 있는 KAKAO_REST_API_KEY 값을 찾습니다.
+        base_url, session, circuit_breaker는 테스트 등에서 바꿔 끼울 때만 전달하며, 전달하지 않으면 모듈 단위로 공유되는 것을 사용합니다.
         """
         if not kakao_rest_api_key:
             try:
@@ -42,6 +164,9 @@ class KakaoMapAPIClient:
                 raise Exception("REST API 키가 전달되지 않았습니다. 그러나 .env 파일에도 KAKAO_REST_API_KEY가 존재하지 않습니다.")
         
         self.kakao_rest_api_key = kakao_rest_api_key
+        self.base_url = base_url or self.base_url
+        self.session = session or _session
+        self.circuit_breaker = circuit_breaker or _circuit_breaker
     
     def generate_auth_header(self) -> dict:
         """
@@ -50,21 +175,66 @@ class KakaoMapAPIClient:
         auth_value = f'KakaoAK {self.kakao_rest_api_key}'
         header = {'Authorization': auth_value}
         return header
+
+    def request(self, path: str, params: dict) -> dict:
+        """
+        카카오맵 API에 GET 요청을 보내고 JSON 응답을 딕셔너리로 돌려줍니다.
+
+        일시적인 실패는 max_retries번까지 재시도하고, 그래도 실패하면 KakaoMapAPIError가 발생합니다.
+        서킷 브레이커가 열려 있으면 요청을 보내지 않고 바로 CircuitOpenError가 발생합니다.
+        """
+        if not self.circuit_breaker.allow_request():
+            self._report_metrics(0.0, False, None, 0)
+            raise CircuitOpenError("카카오맵 API 호출이 연속으로 실패해서 잠시 호출을 멈췄습니다.")
+
+        url = f"{self.base_url}{path}"
+        header = self.generate_auth_header()
+        started = perf_counter()
+        response, error = None, None
+
+        for attempt in range(1, self.max_retries + 2):
+            if attempt > 1:
+                sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            try:
+                response = self.session.get(url, params=params, headers=header, timeout=self.timeout)
+                error = None
+            except requests.RequestException as e:
+                response, error = None, e
+                continue
+            if response.status_code not in self.retry_status_codes:
+                break
+
+        elapsed = perf_counter() - started
+        status_code = response.status_code if response is not None else None
+
+        # 재시도로도 해결되지 않은 실패만 서킷 브레이커에 실패로 기록합니다.
+        if response is None or status_code in self.retry_status_codes:
+            self.circuit_breaker.record_failure()
+            self._report_metrics(elapsed, False, status_code, attempt)
+            raise KakaoMapAPIError(f"카카오맵 API 호출에 실패했습니다. (상태 코드: {status_code}, 오류: {error})") from error
+
+        # 4xx 등은 API 서버 자체는 정상이므로 서킷 브레이커에는 성공으로 기록합니다.
+        self.circuit_breaker.record_success()
+        self._report_metrics(elapsed, response.ok, status_code, attempt)
+        if not response.ok:
+            raise KakaoMapAPIError(f"카카오맵 API가 요청을 거절했습니다. (상태 코드: {status_code})")
+        return response.json()
+
+    def _report_metrics(self, elapsed: float, success: bool, status_code: int | None, attempts: int):
+        if _metrics_hook is not None:
+            _metrics_hook(elapsed=elapsed, success=success, status_code=status_code, attempts=attempts)
     
     def find_place_by_keyword(self, keyword: str, **kwargs) -> KakaoMapPlace | None:
         """
         장소를 검색하여 제일 먼저 나타나는 장소 정보를 바탕으로 KakaoMapPlace 인스턴스를 만들어 돌려줍니다.
 
-        검색 결과가 없으면 None이 반환됩니다.
+        검색 결과가 없으면 None이 반환됩니다. API 호출에 실패하면 KakaoMapAPIError가 발생합니다.
 
         keyword는 필수 인자이며, 나머지는 https://developers.kakao.com/docs/latest/ko/local/dev-guide#search-by-keyword 문서의 쿼리 파라미터 값을 받습니다.
         """
         payload = {'query': keyword, **kwargs}
-        header = self.generate_auth_header()
-        r = requests.get('https://dapi.kakao.com/v2/local/search/keyword', params=payload, headers=header)
-
-        documents: dict = r.json()['documents']
+        documents: dict = self.request('/v2/local/search/keyword', payload)['documents']
         if documents:
             return KakaoMapPlace(documents[0])
         
-        return None
\ No newline at end of file
+        return None
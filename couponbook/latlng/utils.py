@@ -1,7 +1,14 @@
 from decimal import Decimal
+from math import asin, cos, degrees, floor, radians, sin, sqrt
 
 from .models import KakaoMapAPIClient, KakaoMapPlace
 
+# 지구 평균 반지름(m)
+EARTH_RADIUS_M = 6_371_000
+
+# 가게 위치를 나누는 격자 한 칸의 크기(도)입니다. 위도 방향으로 약 2.2km, 서울 기준 경도 방향으로 약 1.8km 입니다.
+GRID_CELL_DEGREES = 0.02
+
 
 def get_place_latlng(place_name: str) -> tuple([Decimal, Decimal]):
     """
@@ -13,4 +20,41 @@ def get_place_latlng(place_name: str) -> tuple([Decimal, Decimal]):
     if place:
         return place.get_latlng()
     
-    print(f"장소의 검색 결과가 없습니다. ({place_name})")
\ No newline at end of file
+    print(f"장소의 검색 결과가 없습니다. ({place_name})")
+
+
+def get_grid_cell(lat: Decimal | float, lng: Decimal | float) -> str:
+    """
+    위도와 경도가 속하는 격자 칸의 이름을 "<위도 칸 번호>:<경도 칸 번호>" 형태로 반환합니다.
+    """
+    return f"{floor(float(lat) / GRID_CELL_DEGREES)}:{floor(float(lng) / GRID_CELL_DEGREES)}"
+
+
+def get_bounding_box(lat: float, lng: float, radius_m: float) -> tuple[float, float, float, float]:
+    """
+    중심점에서 반경 radius_m 미터의 원을 감싸는 사각형을 (최소 위도, 최대 위도, 최소 경도, 최대 경도)로 반환합니다.
+    """
+    d_lat = degrees(radius_m / EARTH_RADIUS_M)
+    d_lng = degrees(radius_m / (EARTH_RADIUS_M * cos(radians(lat))))
+    return lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng
+
+
+def get_grid_cells_in_box(min_lat: float, max_lat: float, min_lng: float, max_lng: float) -> list[str]:
+    """
+    사각형과 겹치는 모든 격자 칸의 이름을 반환합니다.
+    """
+    min_lat_cell, max_lat_cell = floor(min_lat / GRID_CELL_DEGREES), floor(max_lat / GRID_CELL_DEGREES)
+    min_lng_cell, max_lng_cell = floor(min_lng / GRID_CELL_DEGREES), floor(max_lng / GRID_CELL_DEGREES)
+    return [f"{lat_cell}:{lng_cell}"
+            for lat_cell in range(min_lat_cell, max_lat_cell + 1)
+            for lng_cell in range(min_lng_cell, max_lng_cell + 1)]
+
+
+def get_distance_m(lat1: Decimal | float, lng1: Decimal | float,
+                   lat2: Decimal | float, lng2: Decimal | float) -> float:
+    """
+    두 지점 사이의 거리(m)를 하버사인 공식으로 계산합니다.
+    """
+    lat1, lng1, lat2, lng2 = map(lambda v: radians(float(v)), (lat1, lng1, lat2, lng2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * asin(sqrt(a))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from couponbook.models import UserStatisticsSnapshot
+
+
+class Command(BaseCommand):
+    """
+    모든 쿠폰북의 유저 통계 스냅샷(UserStatisticsSnapshot)을 새로 만듭니다.
+
+    평소에는 쿠폰 발급/삭제와 스탬프 적립/삭제 시 자동으로 갱신되고, 스냅샷이 없는 쿠폰북은 처음 조회할 때 만들어집니다.
+    배포 직후 스냅샷을 미리 채워두거나, 관리자 페이지나 셸에서 직접 행을 고쳐서 스냅샷이 어긋났을 때 실행합니다.
+    """
+
+    help = "모든 쿠폰북의 유저 통계 스냅샷을 쿠폰과 스탬프 기록으로 새로 만듭니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="한 번에 저장할 스냅샷 수입니다.")
+
+    def handle(self, *args, **options):
+        count = UserStatisticsSnapshot.build(batch_size=options['batch_size'])
+        self.stdout.write(f"유저 통계 스냅샷 {count}개 생성 완료")
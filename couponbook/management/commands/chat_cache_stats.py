@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from couponbook.chat_response_cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    """
+    AI 어시스턴트 일반 질문 답변 캐시(chat_response_cache)의 적중 횟수, 실패 횟수, 적중률을 출력합니다.
+
+    횟수는 캐시(settings.CACHES)에 저장되므로, 여러 프로세스가 같은 캐시 서버를 쓰면 모두 합친 값입니다.
+    """
+
+    help = "AI 어시스턴트 답변 캐시의 적중률을 출력합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help="출력한 뒤 적중/실패 횟수를 0으로 되돌립니다.")
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        self.stdout.write(f"적중 {stats['hits']}회, 실패 {stats['misses']}회, 적중률 {stats['hit_rate']:.1%}")
+
+        if options['reset']:
+            reset_stats()
+            self.stdout.write("적중/실패 횟수를 초기화했습니다.")
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from couponbook.caching import (CATALOGUE_VERSION_KEY, CURATION_CANDIDATES_VERSION_KEY,
+                                bump_version_on_commit, get_coupon_template_version_key,
+                                get_couponbook_version_key, get_user_context_version_key)
+from couponbook.models import Coupon, CouponTemplate, Stamp
+
+
+class Command(BaseCommand):
+    """
+    비정규화된 카운터 컬럼을 실제 행 개수와 다시 맞춥니다.
+
+    - Coupon.stamp_count: 해당 쿠폰에 적립된 스탬프 수
+    - CouponTemplate.issued_count: 해당 템플릿으로 발급된 쿠폰 수
+
+    평소에는 적립/발급/삭제 시점에 자동으로 갱신되지만,
+    관리자 페이지나 셸에서 직접 행을 고친 경우처럼 카운터가 어긋났을 때 실행합니다.
+    """
+
+    help = "쿠폰의 stamp_count와 쿠폰 템플릿의 issued_count를 실제 개수와 맞춥니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="값을 고치지 않고 어긋난 행의 개수만 출력합니다.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        stamps = Stamp.objects.filter(coupon=OuterRef('pk')) \
+            .values('coupon').annotate(n=Count('id')).values('n')
+        issued = Coupon.objects.filter(original_template=OuterRef('pk')) \
+            .values('original_template').annotate(n=Count('id')).values('n')
+
+        targets = [
+            (Coupon, 'stamp_count', Coalesce(Subquery(stamps), 0)),
+            (CouponTemplate, 'issued_count', Coalesce(Subquery(issued), 0)),
+        ]
+
+        for model, field, actual in targets:
+            with transaction.atomic():
+                drifted = model.objects.annotate(actual=actual).filter(~Q(**{field: F('actual')}))
+                drifted_ids = list(drifted.values_list('id', flat=True))
+                if drifted_ids and not dry_run:
+                    # UPDATE 쿼리는 시그널을 보내지 않으므로, 고치기 전에 무효화할 캐시 버전 키를 모아 두었다가 직접 올림
+                    version_keys = self.get_version_keys(model, drifted_ids)
+                    model.objects.filter(id__in=drifted_ids).update(**{field: actual})
+                    for key in version_keys:
+                        bump_version_on_commit(key)
+
+            self.stdout.write(f"{model.__name__}.{field}: 어긋난 행 {len(drifted_ids)}개"
+                              + (" (dry-run)" if dry_run else " 수정 완료"))
+
+    def get_version_keys(self, model, ids: list[int]) -> list[str]:
+        """
+        카운터가 바뀌는 행들과 관련된 캐시 버전 키 목록을 반환합니다.
+
+        - Coupon.stamp_count: 쿠폰이 담긴 쿠폰북과 그 쿠폰북 사용자의 컨텍스트
+        - CouponTemplate.issued_count: 쿠폰 템플릿 상세, 쿠폰 템플릿 목록, 큐레이션 후보
+        """
+        keys = [CATALOGUE_VERSION_KEY, CURATION_CANDIDATES_VERSION_KEY]
+
+        if model is Coupon:
+            couponbooks = Coupon.objects.filter(id__in=ids) \
+                .values_list('couponbook_id', 'couponbook__user_id').distinct()
+            for couponbook_id, user_id in couponbooks:
+                keys += [get_couponbook_version_key(couponbook_id), get_user_context_version_key(user_id)]
+        else:
+            keys += [get_coupon_template_version_key(coupon_template_id) for coupon_template_id in ids]
+        return keys
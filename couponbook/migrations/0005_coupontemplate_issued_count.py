@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0004_place_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupontemplate',
+            name='issued_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='지금까지 발급된 쿠폰 수입니다. 쿠폰 발급/삭제 시 자동으로 갱신됩니다.'),
+        ),
+    ]
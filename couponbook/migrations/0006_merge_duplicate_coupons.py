@@ -0,0 +1,71 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:55
+
+import sys
+
+from django.db import migrations
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def merge_duplicate_coupons(apps, schema_editor):
+    """
+    같은 쿠폰북에 같은 쿠폰 템플릿으로 발급된 쿠폰이 여러 개 있으면, 가장 먼저 발급된 쿠폰 하나로 합칩니다.
+
+    이전에는 발급 전 중복 확인과 저장 사이에 다른 요청이 끼어들 수 있어서 중복 쿠폰이 생길 수 있었습니다.
+    나머지 쿠폰의 스탬프는 모두 남는 쿠폰으로 옮기고, 즐겨찾기는 남는 쿠폰에 없을 때만 옮긴 뒤 나머지 쿠폰을 지웁니다.
+    스탬프는 적립 근거(영수증)가 있는 기록이므로 지우지 않습니다. 합친 스탬프가 리워드 정보의 스탬프 횟수(amount)를 넘는 쿠폰은
+    직접 정리할 수 있도록 표준 출력으로 알립니다.
+    """
+    Coupon = apps.get_model('couponbook', 'Coupon')
+    FavoriteCoupon = apps.get_model('couponbook', 'FavoriteCoupon')
+    RewardsInfo = apps.get_model('couponbook', 'RewardsInfo')
+    Stamp = apps.get_model('couponbook', 'Stamp')
+
+    duplicates = Coupon.objects.values('couponbook', 'original_template') \
+        .annotate(n=Count('id'), survivor_id=Min('id')).filter(n__gt=1)
+    for duplicate in duplicates:
+        survivor_id = duplicate['survivor_id']
+        duplicate_ids = list(Coupon.objects.filter(
+            couponbook=duplicate['couponbook'],
+            original_template=duplicate['original_template'],
+        ).exclude(id=survivor_id).values_list('id', flat=True))
+
+        Stamp.objects.filter(coupon_id__in=duplicate_ids).update(coupon_id=survivor_id)
+        amount = RewardsInfo.objects.filter(coupon_template=duplicate['original_template']) \
+            .values_list('amount', flat=True).first()
+        stamp_count = Stamp.objects.filter(coupon_id=survivor_id).count()
+        if amount is not None and stamp_count > amount:
+            sys.stdout.write(f"\n  쿠폰 {survivor_id}: 합친 스탬프 {stamp_count}개가 리워드 스탬프 횟수({amount}개)를 넘습니다. "
+                             f"직접 정리해 주세요.")
+
+        if not FavoriteCoupon.objects.filter(coupon_id=survivor_id).exists():
+            favorite = FavoriteCoupon.objects.filter(coupon_id__in=duplicate_ids).order_by('id').first()
+            if favorite is not None:
+                FavoriteCoupon.objects.filter(id=favorite.id).update(coupon_id=survivor_id)
+        Coupon.objects.filter(id__in=duplicate_ids).delete()
+
+
+def fill_issued_count(apps, schema_editor):
+    """
+    기존에 발급된 쿠폰 수로 issued_count를 채웁니다.
+    """
+    Coupon = apps.get_model('couponbook', 'Coupon')
+    CouponTemplate = apps.get_model('couponbook', 'CouponTemplate')
+
+    issued = Coupon.objects.filter(original_template=OuterRef('pk')) \
+        .values('original_template').annotate(n=Count('id')).values('n')
+    CouponTemplate.objects.update(issued_count=Coalesce(Subquery(issued), 0))
+
+
+# PostgreSQL에서는 쿠폰을 지운 트랜잭션 안에서 쿠폰 테이블에 제약 조건을 추가하면 "pending trigger events" 오류가 날 수 있으므로,
+# 데이터만 바꾸는 이 마이그레이션과 유니크 제약 조건을 추가하는 다음 마이그레이션을 나눴습니다.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0005_coupontemplate_issued_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_coupons, migrations.RunPython.noop),
+        migrations.RunPython(fill_issued_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0006_merge_duplicate_coupons'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='coupon',
+            constraint=models.UniqueConstraint(fields=('couponbook', 'original_template'), name='unique_coupon_per_couponbook_and_template'),
+        ),
+    ]
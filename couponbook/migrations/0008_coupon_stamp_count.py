@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 00:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_stamp_count(apps, schema_editor):
+    """
+    기존에 적립된 스탬프 수로 stamp_count를 채웁니다.
+    """
+    Coupon = apps.get_model('couponbook', 'Coupon')
+    Stamp = apps.get_model('couponbook', 'Stamp')
+
+    stamps = Stamp.objects.filter(coupon=OuterRef('pk')) \
+        .values('coupon').annotate(n=Count('id')).values('n')
+    Coupon.objects.update(stamp_count=Coalesce(Subquery(stamps), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0007_coupon_unique_coupon_per_couponbook_and_template'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='stamp_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='현재까지 적립된 스탬프 수입니다. 스탬프 적립/삭제 시 자동으로 갱신됩니다.'),
+        ),
+        migrations.RunPython(fill_stamp_count, migrations.RunPython.noop),
+    ]
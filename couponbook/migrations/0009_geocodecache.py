@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0008_coupon_stamp_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(help_text='정규화된 검색 키워드입니다. 예) 서울특별시 동대문구 이문동 매머드커피', max_length=100, unique=True)),
+                ('lat', models.DecimalField(blank=True, decimal_places=15, help_text='검색된 장소의 위도입니다. 검색 결과가 없었다면 비어 있습니다.', max_digits=18, null=True)),
+                ('lng', models.DecimalField(blank=True, decimal_places=15, help_text='검색된 장소의 경도입니다. 검색 결과가 없었다면 비어 있습니다.', max_digits=18, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='마지막으로 카카오맵 API에서 검색한 날짜와 시간입니다.')),
+            ],
+        ),
+    ]
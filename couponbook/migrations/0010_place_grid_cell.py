@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:08
+
+from django.db import migrations, models
+
+from couponbook.latlng.utils import get_grid_cell
+
+
+def fill_grid_cell(apps, schema_editor):
+    """
+    위도와 경도가 있는 기존 가게들의 격자 칸을 채웁니다.
+    """
+    Place = apps.get_model('couponbook', 'Place')
+
+    places = list(Place.objects.filter(lat__isnull=False, lng__isnull=False))
+    for place in places:
+        place.grid_cell = get_grid_cell(place.lat, place.lng)
+    Place.objects.bulk_update(places, ['grid_cell'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0009_geocodecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='grid_cell',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='위도와 경도가 속하는 격자 칸입니다. 주변 가게 검색에 사용되며, 데이터 저장 시 자동 계산됩니다.', max_length=20, null=True),
+        ),
+        migrations.RunPython(fill_grid_cell, migrations.RunPython.noop),
+    ]
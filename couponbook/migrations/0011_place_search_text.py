@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:11
+
+from django.db import migrations, models
+
+from couponbook.search import (create_search_index, drop_search_index,
+                               normalize_search_text)
+
+
+def fill_search_text(apps, schema_editor):
+    """
+    기존 가게들의 검색용 텍스트를 채웁니다.
+    """
+    Place = apps.get_model('couponbook', 'Place')
+
+    places = list(Place.objects.select_related('address_district'))
+    for place in places:
+        legal_district = place.address_district
+        place.search_text = normalize_search_text(
+            f"{legal_district.province} {legal_district.city} {legal_district.district} "
+            f"{place.address_rest} {place.name} {place.tags or ''}"
+        )
+    Place.objects.bulk_update(places, ['search_text'], batch_size=500)
+
+
+def add_search_index(apps, schema_editor):
+    create_search_index(schema_editor)
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0010_place_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='주소, 가게 이름, 태그를 정규화해서 합친 검색용 텍스트입니다. 데이터 저장 시 자동 계산됩니다.'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
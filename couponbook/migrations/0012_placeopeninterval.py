@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from couponbook.opening_hours import build_open_intervals
+
+
+def fill_open_intervals(apps, schema_editor):
+    """
+    기존 가게들의 영업 시간으로 영업 구간을 채웁니다.
+    """
+    Place = apps.get_model('couponbook', 'Place')
+    PlaceOpenInterval = apps.get_model('couponbook', 'PlaceOpenInterval')
+
+    intervals = [
+        PlaceOpenInterval(place_id=place_id, start_minute=start, end_minute=end)
+        for place_id, opens_at, last_order in Place.objects.values_list('id', 'opens_at', 'last_order')
+        for start, end in build_open_intervals(opens_at, last_order)
+    ]
+    PlaceOpenInterval.objects.bulk_create(intervals, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0011_place_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceOpenInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_minute', models.PositiveSmallIntegerField(help_text='영업 구간의 시작(한 주의 몇 번째 분)입니다. 포함됩니다.')),
+                ('end_minute', models.PositiveSmallIntegerField(help_text='영업 구간의 끝(한 주의 몇 번째 분)입니다. 포함되지 않습니다.')),
+                ('place', models.ForeignKey(help_text='영업 구간이 속한 가게 id입니다.', on_delete=django.db.models.deletion.CASCADE, related_name='open_intervals', to='couponbook.place')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start_minute', 'end_minute'], name='place_open_interval_range_idx')],
+            },
+        ),
+        migrations.RunPython(fill_open_intervals, migrations.RunPython.noop),
+    ]
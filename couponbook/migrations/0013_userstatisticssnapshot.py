@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 01:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('couponbook', '0012_placeopeninterval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStatisticsSnapshot',
+            fields=[
+                ('couponbook', models.OneToOneField(help_text='스냅샷이 속한 쿠폰북 id입니다.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics_snapshot', serialize=False, to='couponbook.couponbook')),
+                ('history', models.JSONField(default=dict, help_text='쿠폰별 쿠폰 템플릿 id와 스탬프 적립 시각 목록입니다.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='스냅샷이 마지막으로 갱신된 날짜와 시간입니다.')),
+            ],
+        ),
+    ]
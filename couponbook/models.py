@@ -1,7 +1,18 @@
-from django.db import models
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef, Q
 from django.utils.timezone import now
 
-from .latlng.utils import get_place_latlng
+from .latlng.models import KakaoMapAPIError
+from .latlng.utils import get_grid_cell, get_place_latlng
+from .opening_hours import (build_open_intervals, get_minute_of_week,
+                            is_open_at)
+from .search import normalize_search_text
 
 # Create your models here.
 
@@ -27,39 +38,53 @@ class Coupon(models.Model):
                                           on_delete=models.CASCADE,
                                           help_text="쿠폰 발행에 사용된 쿠폰 템플릿 id입니다. 유효성 검증에 사용합니다.")
     saved_at = models.DateTimeField(auto_now_add=True, help_text="쿠폰을 등록한 날짜와 시간입니다.")
+    stamp_count = models.PositiveIntegerField(default=0, editable=False,
+                                              help_text="현재까지 적립된 스탬프 수입니다. 스탬프 적립/삭제 시 자동으로 갱신됩니다.")
 
-    def save(self, *args, **kwargs):
+    class Meta:
+        constraints = [
+            # 동시에 같은 요청이 들어와도 한 유저가 같은 쿠폰 템플릿으로 쿠폰을 두 번 발급받지 못하도록 DB에서 막습니다.
+            models.UniqueConstraint(fields=['couponbook', 'original_template'],
+                                    name='unique_coupon_per_couponbook_and_template'),
+        ]
+
+    def save(self, *args, validate=True, **kwargs):
         """
         쿠폰 등록 전 모델 단계에서 검증을 진행합니다.
 
         1. 원본 쿠폰 템플릿이 존재하는지 확인합니다.
         2. 유효 기간이 만료되지 않았는지 확인합니다.
-        3. 선착순 인원이 있다면 마감되지 않았는지 확인합니다.
-        4. 이미 해당 유저가 해당 쿠폰 템플릿으로 등록한 쿠폰이 존재하는지 확인합니다.
-        """
-
-        # 1. 원본 쿠폰 템플릿이 존재하는지 확인합니다.
-        if not CouponTemplate.objects.filter(id=self.original_template.id).exists():
-            print("원본 쿠폰 템플릿이 존재하지 않아 쿠폰이 등록되지 않았습니다.")
-            return
-
-        # 2. 유효 기간이 만료되지 않았는지 확인합니다.
-        if self.original_template.valid_until and self.original_template.valid_until < now():
-            print("쿠폰 템플릿의 유효 기간이 만료되어 쿠폰이 등록되지 않았습니다.")
-            return
-
-        # 3. 선착순 인원이 있다면 마감되지 않았는지 확인합니다.
-        if self.original_template.first_n_persons \
-        and Coupon.objects.filter(original_template=self.original_template).count() >= self.original_template.first_n_persons:
-            print("선착순 인원이 마감되어 쿠폰이 등록되지 않았습니다.")
-            return
-
-        # 4. 이미 해당 유저가 해당 쿠폰 템플릿으로 등록한 쿠폰이 존재하는지 확인합니다.
-        if Coupon.objects.filter(couponbook=self.couponbook, original_template=self.original_template).exists():
-            print("이미 해당 쿠폰 템플릿으로 등록된 쿠폰이 있어 쿠폰이 등록되지 않았습니다.")
-            return
-        
-        return super().save(*args, **kwargs)
+        3. 이미 해당 유저가 해당 쿠폰 템플릿으로 등록한 쿠폰이 존재하는지 확인합니다.
+        4. 선착순 인원이 있다면 자리를 하나 차지합니다. 마감되었다면 등록되지 않습니다.
+
+        4번의 자리 차지와 쿠폰 저장은 한 트랜잭션에서 이루어지므로, 저장에 실패하면 차지한 자리도 되돌려집니다.
+        호출하는 쪽에서 같은 트랜잭션 안에서 검증과 자리 차지를 이미 했다면 validate=False로 1~4번을 건너뜁니다. (services.issue_coupon 참고)
+        """
+
+        if validate:
+            # 1. 원본 쿠폰 템플릿이 존재하는지 확인합니다.
+            if not CouponTemplate.objects.filter(id=self.original_template.id).exists():
+                print("원본 쿠폰 템플릿이 존재하지 않아 쿠폰이 등록되지 않았습니다.")
+                return
+
+            # 2. 유효 기간이 만료되지 않았는지 확인합니다.
+            if self.original_template.valid_until and self.original_template.valid_until < now():
+                print("쿠폰 템플릿의 유효 기간이 만료되어 쿠폰이 등록되지 않았습니다.")
+                return
+
+            # 3. 이미 해당 유저가 해당 쿠폰 템플릿으로 등록한 쿠폰이 존재하는지 확인합니다.
+            if self._state.adding and \
+            Coupon.objects.filter(couponbook=self.couponbook, original_template=self.original_template).exists():
+                print("이미 해당 쿠폰 템플릿으로 등록된 쿠폰이 있어 쿠폰이 등록되지 않았습니다.")
+                return
+
+        # 4. 선착순 인원이 있다면 자리를 하나 차지합니다.
+        with transaction.atomic():
+            if validate and self._state.adding and not self.original_template.claim_slot():
+                print("선착순 인원이 마감되어 쿠폰이 등록되지 않았습니다.")
+                return
+
+            return super().save(*args, **kwargs)
 
 
 class FavoriteCoupon(models.Model):
@@ -83,6 +108,8 @@ class CouponTemplate(models.Model):
     first_n_persons = models.PositiveIntegerField(default=0, help_text="선착순 몇명까지 쿠폰이 발급한지를 의미합니다.")
     is_on = models.BooleanField(default=True, help_text="게시 중/비공개 여부를 불리언으로 나타냅니다.")
     created_at = models.DateTimeField(auto_now_add=True, help_text="점주가 쿠폰 템플릿을 등록한 날짜와 시간입니다.")
+    issued_count = models.PositiveIntegerField(default=0, editable=False,
+                                               help_text="지금까지 발급된 쿠폰 수입니다. 쿠폰 발급/삭제 시 자동으로 갱신됩니다.")
     
     # 쿠폰 템플릿이 어느 가게에 속하는지 명시적으로 연결합니다.
     place = models.ForeignKey("couponbook.Place",
@@ -93,6 +120,33 @@ class CouponTemplate(models.Model):
                               blank=False,
                               )
 
+    @property
+    def n_remaining(self) -> int | None:
+        """
+        남은 선착순 인원 수입니다. 선착순 인원 제한이 없으면 None입니다.
+        """
+        if not self.first_n_persons:
+            return None
+        return max(0, self.first_n_persons - self.issued_count)
+
+    def claim_slot(self) -> bool:
+        """
+        선착순 자리 하나를 원자적으로 차지하고, 성공 여부를 반환합니다.
+
+        `issued_count < first_n_persons` 조건을 건 UPDATE 한 번으로 자리를 차지하므로,
+        동시에 요청이 몰려도 선착순 인원을 초과해서 발급되지 않습니다. (마감되었다면 갱신되는 행이 없습니다.)
+        선착순 인원 제한이 없는 쿠폰 템플릿은 발급 수만 1 늘리고 항상 성공합니다.
+
+        쿠폰 저장과 같은 트랜잭션 안에서 호출해야 저장 실패 시 차지한 자리도 함께 되돌려집니다.
+        """
+        claimed = CouponTemplate.objects.filter(
+            Q(first_n_persons=0) | Q(issued_count__lt=F('first_n_persons')), id=self.id,
+        ).update(issued_count=F('issued_count') + 1)
+
+        if claimed:
+            self.issued_count += 1
+        return bool(claimed)
+
 class RewardsInfo(models.Model):
     """
     한 쿠폰의 리워드 정보를 나타냅니다.
@@ -119,7 +173,7 @@ class Stamp(models.Model):
     customer = models.ForeignKey("accounts.User", on_delete=models.CASCADE, help_text="스탬프를 적립받은 고객 id입니다.")
     created_at = models.DateTimeField(auto_now_add=True, help_text="스탬프가 적립된 날짜와 시간입니다.")
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, validate=True, **kwargs):
         """
         스탬프 등록 시에 모델 레벨에서 유효성 검증을 실행합니다.
 
@@ -127,30 +181,40 @@ class Stamp(models.Model):
         2) 이미 완성된 쿠폰인지?
         3) 일치하는 영수증이 존재하는지?
         4) 이미 해당되는 영수증으로 스탬프가 등록되진 않았는지?
+
+        검증을 통과하면 스탬프 저장과 쿠폰의 stamp_count 증가를 한 트랜잭션에서 처리합니다.
+        호출하는 쪽에서 쿠폰을 잠근 상태로 검증을 이미 했다면 validate=False로 1)~4)를 건너뜁니다. (services.accrue_stamp 참고)
         """
         coupon = self.coupon
 
-        # 1) 쿠폰의 기간이 만료되진 않았는지?
-        if coupon.original_template.valid_until and coupon.original_template.valid_until < now():
-            print("쿠폰의 기간이 만료되어 스탬프 인스턴스가 등록되지 않았습니다.")
-            return
+        if validate:
+            # 1) 쿠폰의 기간이 만료되진 않았는지?
+            if coupon.original_template.valid_until and coupon.original_template.valid_until < now():
+                print("쿠폰의 기간이 만료되어 스탬프 인스턴스가 등록되지 않았습니다.")
+                return
         
-        # 2) 이미 완성된 쿠폰인지?
-        if Stamp.objects.filter(coupon=coupon).count() >= coupon.original_template.reward_info.amount:
-            print("이미 완성된 쿠폰이어서 스탬프 인스턴스가 등록되지 않았습니다.")
-            return
+            # 2) 이미 완성된 쿠폰인지?
+            if coupon.stamp_count >= coupon.original_template.reward_info.amount:
+                print("이미 완성된 쿠폰이어서 스탬프 인스턴스가 등록되지 않았습니다.")
+                return
         
-        # 3) 일치하는 영수증이 존재하는지?
-        if not Receipt.objects.filter(receipt_number=self.receipt.receipt_number).exists():
-            print("일치하는 영수증이 없어서 스탬프 인스턴스가 등록되지 않았습니다.")
-            return
+            # 3) 일치하는 영수증이 존재하는지?
+            if not Receipt.objects.filter(receipt_number=self.receipt.receipt_number).exists():
+                print("일치하는 영수증이 없어서 스탬프 인스턴스가 등록되지 않았습니다.")
+                return
         
-        # 4) 이미 해당되는 영수증으로 스탬프가 등록되진 않았는지?
-        if Stamp.objects.filter(receipt=self.receipt).exists():
-            print("이미 해당되는 영수증으로 등록된 스탬프가 있어 스탬프 인스턴스가 등록되지 않았습니다.")
-            return
+            # 4) 이미 해당되는 영수증으로 스탬프가 등록되진 않았는지?
+            if Stamp.objects.filter(receipt=self.receipt).exists():
+                print("이미 해당되는 영수증으로 등록된 스탬프가 있어 스탬프 인스턴스가 등록되지 않았습니다.")
+                return
 
-        return super().save(*args, **kwargs)
+        with transaction.atomic():
+            adding = self._state.adding
+            result = super().save(*args, **kwargs)
+            if adding:
+                Coupon.objects.filter(id=coupon.id).update(stamp_count=F('stamp_count') + 1)
+                coupon.stamp_count += 1
+            return result
 
 class Receipt(models.Model):
     """
@@ -170,6 +234,108 @@ class LegalDistrict(models.Model):
     city = models.CharField(max_length=5, help_text="시, 군, 구 단위입니다. 예) 동대문구")
     district = models.CharField(max_length=7, help_text="읍, 면, 동 단위입니다. 예) 이문동")
 
+class GeocodeCache(models.Model):
+    """
+    카카오맵 API의 장소 검색 결과(위도, 경도)를 캐시하는 모델입니다.
+
+    검색 결과가 없었던 키워드도 lat, lng를 비워서 저장해두고(negative cache), 더 짧은 유효 기간 동안 다시 검색하지 않습니다.
+    유효 기간은 settings의 GEOCODE_CACHE_TTL, GEOCODE_NEGATIVE_CACHE_TTL(초)로 정합니다.
+    """
+    keyword = models.CharField(max_length=100, unique=True,
+                               help_text="정규화된 검색 키워드입니다. 예) 서울특별시 동대문구 이문동 매머드커피")
+    lat = models.DecimalField(decimal_places=15, max_digits=18, blank=True, null=True,
+                              help_text="검색된 장소의 위도입니다. 검색 결과가 없었다면 비어 있습니다.")
+    lng = models.DecimalField(decimal_places=15, max_digits=18, blank=True, null=True,
+                              help_text="검색된 장소의 경도입니다. 검색 결과가 없었다면 비어 있습니다.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="마지막으로 카카오맵 API에서 검색한 날짜와 시간입니다.")
+
+    @staticmethod
+    def normalize_keyword(keyword: str) -> str:
+        """
+        공백 차이, 대소문자 차이로 캐시가 갈리지 않도록 키워드를 정규화합니다.
+        """
+        return " ".join(keyword.split()).lower()
+
+    @property
+    def is_fresh(self) -> bool:
+        """
+        캐시가 아직 유효한지를 의미합니다. 검색 결과가 없었던 캐시는 더 짧은 유효 기간을 사용합니다.
+        """
+        ttl = settings.GEOCODE_CACHE_TTL if self.lat is not None else settings.GEOCODE_NEGATIVE_CACHE_TTL
+        return self.updated_at + timedelta(seconds=ttl) > now()
+
+    @classmethod
+    def get_latlng(cls, keyword: str) -> tuple[Decimal, Decimal] | None:
+        """
+        키워드에 해당하는 장소의 위도와 경도를 튜플로 반환합니다. 검색 결과가 없으면 None이 반환됩니다.
+
+        유효한 캐시가 있으면 카카오맵 API를 호출하지 않고, 없거나 만료되었으면 API를 호출해서 결과를 캐시에 저장합니다.
+        API 호출 자체가 실패하면 예외가 그대로 전달되며, 캐시에는 저장하지 않습니다.
+        """
+        keyword = cls.normalize_keyword(keyword)
+
+        cached = cls.objects.filter(keyword=keyword).first()
+        if cached and cached.is_fresh:
+            return (cached.lat, cached.lng) if cached.lat is not None else None
+
+        latlng = get_place_latlng(keyword)
+        lat, lng = latlng if latlng else (None, None)
+        cls.objects.update_or_create(keyword=keyword, defaults={'lat': lat, 'lng': lng})
+        return latlng
+
+    @classmethod
+    def get_cached_latlng_many(cls, keywords) -> dict[str, tuple[Decimal, Decimal] | None]:
+        """
+        여러 키워드 중 유효한 캐시가 있는 키워드만 골라 {정규화된 키워드: 위도와 경도 튜플 또는 None}으로 반환합니다.
+
+        쿼리 하나로 조회하며, 카카오맵 API는 호출하지 않습니다.
+        """
+        keywords = {cls.normalize_keyword(keyword) for keyword in keywords}
+        return {
+            cached.keyword: (cached.lat, cached.lng) if cached.lat is not None else None
+            for cached in cls.objects.filter(keyword__in=keywords)
+            if cached.is_fresh
+        }
+
+    @classmethod
+    def get_latlng_many(cls, keywords, max_workers: int = 8, batch_size: int = 500,
+                        on_progress: Callable[[int, int], None] | None = None) -> dict[str, tuple[Decimal, Decimal] | None]:
+        """
+        여러 키워드의 위도와 경도를 {정규화된 키워드: 위도와 경도 튜플 또는 None}으로 반환합니다.
+
+        캐시는 쿼리 하나로 조회하고, 캐시되지 않은 키워드만 최대 max_workers개의 스레드에서 동시에 카카오맵 API로 검색합니다.
+        스레드에서는 DB에 접근하지 않고, 검색 결과는 batch_size개씩 한꺼번에 캐시에 저장합니다.
+        API 호출에 실패한 키워드는 None으로 반환하되 캐시하지 않습니다.
+        on_progress가 있으면 검색이 하나 끝날 때마다 (끝난 개수, 검색할 전체 개수)로 호출됩니다.
+        """
+        keywords = {cls.normalize_keyword(keyword) for keyword in keywords}
+        result = cls.get_cached_latlng_many(keywords)
+        misses = sorted(keywords - result.keys())
+
+        def geocode(keyword: str) -> tuple[tuple[Decimal, Decimal] | None, bool]:
+            try:
+                return get_place_latlng(keyword), True
+            except KakaoMapAPIError as e:
+                print(f"카카오맵 검색에 실패했습니다. ({keyword}) - {e}")
+                return None, False
+
+        to_cache = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(geocode, keyword): keyword for keyword in misses}
+            for done, future in enumerate(as_completed(futures), start=1):
+                keyword = futures[future]
+                latlng, succeeded = future.result()
+                result[keyword] = latlng
+                if succeeded:
+                    lat, lng = latlng if latlng else (None, None)
+                    to_cache.append(cls(keyword=keyword, lat=lat, lng=lng))
+                if on_progress:
+                    on_progress(done, len(misses))
+
+        cls.objects.bulk_create(to_cache, batch_size=batch_size, update_conflicts=True,
+                                unique_fields=['keyword'], update_fields=['lat', 'lng', 'updated_at'])
+        return result
+
 class Place(models.Model):
     """
     가게 모델입니다.
@@ -194,20 +360,238 @@ class Place(models.Model):
     # 점주와 가게를 1:1로 연결
     owner = models.OneToOneField("accounts.User", on_delete=models.CASCADE, related_name="place",
                                                       null=True, blank=True, help_text="이 매장의 점주 사용자입니다.")
+    grid_cell = models.CharField(max_length=20, blank=True, null=True, editable=False, db_index=True,
+                                 help_text="위도와 경도가 속하는 격자 칸입니다. 주변 가게 검색에 사용되며, 데이터 저장 시 자동 계산됩니다.")
+    search_text = models.TextField(blank=True, default='', editable=False,
+                                   help_text="주소, 가게 이름, 태그를 정규화해서 합친 검색용 텍스트입니다. 데이터 저장 시 자동 계산됩니다.")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        DB에서 불러올 때의 가게 이름과 법정동, 영업 시간을 기억해두어,
+        저장 시 위도와 경도, 영업 구간을 다시 계산해야 하는지 판단할 수 있게 합니다.
+        """
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+
+        def loaded_values(*names):
+            if all(name in loaded and loaded[name] is not models.DEFERRED for name in names):
+                return tuple(loaded[name] for name in names)
+            return None
+
+        instance._geocoded_from = loaded_values('name', 'address_district_id')
+        instance._open_hours_from = loaded_values('opens_at', 'last_order')
+        return instance
+
+    def build_search_text(self) -> str:
+        """
+        주소(광역시 ~ 상세주소), 가게 이름, 태그를 정규화해서 합친 검색용 텍스트를 만듭니다.
+        """
+        legal_district = self.address_district
+        return normalize_search_text(
+            f"{legal_district.province} {legal_district.city} {legal_district.district} "
+            f"{self.address_rest} {self.name} {self.tags or ''}"
+        )
+
+    def is_open_at(self, minute_of_week: int | None = None) -> bool:
+        """
+        한 주의 minute_of_week번째 분(기본값: 현재)에 영업 중인지를 반환합니다.
+
+        여러 가게를 한꺼번에 확인할 때는 PlaceOpenInterval.get_open_place_ids를 사용하세요.
+        """
+        if minute_of_week is None:
+            minute_of_week = get_minute_of_week()
+        return is_open_at(self.opens_at, self.last_order, minute_of_week)
 
     def save(self, *args, **kwargs):
         """
-        위도와 경도 정보를 카카오맵 API를 이용해서 계산해서 저장합니다.
+        위도와 경도 정보를 카카오맵 API를 이용해서 계산해서 저장합니다. 검색용 텍스트와 영업 구간도 함께 갱신합니다.
+
+        가게 이름과 법정동이 바뀌지 않았고 위도와 경도가 이미 있다면 다시 계산하지 않습니다.
+        계산 결과는 GeocodeCache에 캐시되므로, 같은 가게를 다시 등록해도 카카오맵 API를 호출하지 않습니다.
         """
-        keyword = self.name
-        address_district = f"{self.address_district.province} {self.address_district.city} " \
-             f"{self.address_district.district}"
-        
-        latlng = get_place_latlng(f"{address_district} {keyword}")
+        already_geocoded = self.lat is not None and self.lng is not None and \
+            getattr(self, '_geocoded_from', None) == (self.name, self.address_district_id)
+
+        if not already_geocoded:
+            keyword = self.name
+            address_district = f"{self.address_district.province} {self.address_district.city} " \
+                 f"{self.address_district.district}"
+
+            latlng = GeocodeCache.get_latlng(f"{address_district} {keyword}")
 
-        if latlng:
+            if not latlng:
+                print("존재하지 않는 가게여서 등록되지 않았습니다. 실존하는 가게임에도 등록이 되지 않는다면, 카카오맵에서 검색 가능한 가게인지 확인해보세요.")
+                return
             self.lat, self.lng = latlng
-            return super().save(*args, **kwargs)
-        
-        print("존재하지 않는 가게여서 등록되지 않았습니다. 실존하는 가게임에도 등록이 되지 않는다면, 카카오맵에서 검색 가능한 가게인지 확인해보세요.")
-        return
+
+        self.grid_cell = get_grid_cell(self.lat, self.lng)
+        self.search_text = self.build_search_text()
+
+        with transaction.atomic():
+            result = super().save(*args, **kwargs)
+            # 영업 시간이 바뀌었을 때만 영업 구간을 다시 만듭니다.
+            if getattr(self, '_open_hours_from', None) != (self.opens_at, self.last_order):
+                self.open_intervals.all().delete()
+                PlaceOpenInterval.objects.bulk_create(PlaceOpenInterval.build_for(self))
+
+        self._geocoded_from = (self.name, self.address_district_id)
+        self._open_hours_from = (self.opens_at, self.last_order)
+        return result
+
+class PlaceOpenInterval(models.Model):
+    """
+    가게의 영업 구간입니다. 한 주의 몇 번째 분(월요일 00:00 = 0)인지로 [시작, 끝) 구간을 저장합니다.
+
+    가게 저장 시 영업 시작 시각과 라스트오더 시각으로 자동 계산되며, 자정을 넘기는 영업도 하나의 구간으로 표현됩니다.
+    한 가게의 구간들은 서로 겹치지 않으므로, '지금 영업 중인가'는 인덱스를 타는 범위 조건 하나로 확인할 수 있습니다.
+    """
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='open_intervals',
+                              help_text="영업 구간이 속한 가게 id입니다.")
+    start_minute = models.PositiveSmallIntegerField(help_text="영업 구간의 시작(한 주의 몇 번째 분)입니다. 포함됩니다.")
+    end_minute = models.PositiveSmallIntegerField(help_text="영업 구간의 끝(한 주의 몇 번째 분)입니다. 포함되지 않습니다.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_minute', 'end_minute'], name='place_open_interval_range_idx'),
+        ]
+
+    @classmethod
+    def build_for(cls, place: Place) -> list['PlaceOpenInterval']:
+        """
+        가게의 영업 시작 시각, 라스트오더 시각으로 저장 전의 영업 구간 인스턴스들을 만듭니다.
+        """
+        return [cls(place=place, start_minute=start, end_minute=end)
+                for start, end in build_open_intervals(place.opens_at, place.last_order)]
+
+    @classmethod
+    def open_at(cls, place_ref: str = 'place', minute_of_week: int | None = None) -> Exists:
+        """
+        가게가 minute_of_week번째 분(기본값: 현재)에 영업 중인지를 나타내는 Exists 식을 반환합니다.
+
+        place_ref는 필터링하거나 annotate할 모델에서 가게 id까지의 경로입니다. 예) 'original_template__place'
+        """
+        if minute_of_week is None:
+            minute_of_week = get_minute_of_week()
+        return Exists(cls.objects.filter(place=OuterRef(place_ref),
+                                         start_minute__lte=minute_of_week, end_minute__gt=minute_of_week))
+
+    @classmethod
+    def get_open_place_ids(cls, place_ids, minute_of_week: int | None = None) -> set[int]:
+        """
+        주어진 가게 id들 중 minute_of_week번째 분(기본값: 현재)에 영업 중인 가게 id 집합을 쿼리 하나로 반환합니다.
+        """
+        if minute_of_week is None:
+            minute_of_week = get_minute_of_week()
+        return set(cls.objects.filter(place_id__in=place_ids,
+                                      start_minute__lte=minute_of_week, end_minute__gt=minute_of_week)
+                   .values_list('place_id', flat=True))
+
+
+class UserStatisticsSnapshot(models.Model):
+    """
+    AI 큐레이션에 쓰이는 유저 통계(UserStatistics.make_history)의 재료를 쿠폰북마다 미리 모아둔 스냅샷입니다.
+
+    history는 {"쿠폰 id": {"template_id": 쿠폰 템플릿 id, "stamped_at": [스탬프 적립 시각(ISO 8601), ...]}} 형태이며,
+    쿠폰 발급/삭제와 스탬프 적립/삭제 시 시그널로 조금씩 갱신됩니다.
+    스냅샷이 아직 없는 쿠폰북은 갱신을 건너뛰고, 처음 조회할 때 build로 만듭니다.
+
+    가게 정보와 리워드 개수는 바뀔 수 있으므로 저장하지 않고, 조회할 때 쿠폰 템플릿에서 한 번에 가져옵니다.
+    """
+    couponbook = models.OneToOneField(CouponBook, primary_key=True, on_delete=models.CASCADE,
+                                      related_name='statistics_snapshot',
+                                      help_text="스냅샷이 속한 쿠폰북 id입니다.")
+    history = models.JSONField(default=dict, help_text="쿠폰별 쿠폰 템플릿 id와 스탬프 적립 시각 목록입니다.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="스냅샷이 마지막으로 갱신된 날짜와 시간입니다.")
+
+    @classmethod
+    def build(cls, couponbook_ids=None, batch_size: int = 500) -> int:
+        """
+        쿠폰북들(기본값: 전체)의 스냅샷을 쿠폰, 스탬프를 한 번씩만 조회해서 새로 만들고, 만든 스냅샷 수를 반환합니다.
+        """
+        couponbooks = CouponBook.objects.all()
+        coupons = Coupon.objects.all()
+        stamps = Stamp.objects.all()
+        if couponbook_ids is not None:
+            couponbooks = couponbooks.filter(id__in=couponbook_ids)
+            coupons = coupons.filter(couponbook_id__in=couponbook_ids)
+            stamps = stamps.filter(coupon__couponbook_id__in=couponbook_ids)
+
+        histories = {couponbook_id: {} for couponbook_id in couponbooks.values_list('id', flat=True)}
+        coupon_data = {}
+        for coupon_id, couponbook_id, template_id in coupons.values_list('id', 'couponbook_id', 'original_template_id'):
+            coupon_data[coupon_id] = {'template_id': template_id, 'stamped_at': []}
+            histories.setdefault(couponbook_id, {})[str(coupon_id)] = coupon_data[coupon_id]
+        for coupon_id, created_at in stamps.order_by('created_at', 'id').values_list('coupon_id', 'created_at'):
+            coupon_data[coupon_id]['stamped_at'].append(created_at.isoformat())
+
+        snapshots = [cls(couponbook_id=couponbook_id, history=history) for couponbook_id, history in histories.items()]
+        cls.objects.bulk_create(snapshots, batch_size=batch_size, update_conflicts=True,
+                                unique_fields=['couponbook'], update_fields=['history', 'updated_at'])
+        return len(snapshots)
+
+    @classmethod
+    def get_for_user(cls, user) -> 'UserStatisticsSnapshot | None':
+        """
+        유저의 쿠폰북 스냅샷을 가져옵니다. 없으면 새로 만들고, 유저의 쿠폰북이 없으면 None을 반환합니다.
+        """
+        snapshot = cls.objects.filter(couponbook__user=user).first()
+        if snapshot is None:
+            couponbook_id = CouponBook.objects.filter(user=user).values_list('id', flat=True).first()
+            if couponbook_id is None:
+                return None
+            cls.build([couponbook_id])
+            snapshot = cls.objects.get(couponbook_id=couponbook_id)
+        return snapshot
+
+    @classmethod
+    def update_history(cls, couponbook_id: int, update: Callable[[dict], None]):
+        """
+        쿠폰북 스냅샷의 history를 잠근 채로 update 함수로 고쳐서 저장합니다. 스냅샷이 없으면 아무것도 하지 않습니다.
+        """
+        with transaction.atomic():
+            snapshot = cls.objects.select_for_update().filter(couponbook_id=couponbook_id).first()
+            if snapshot is None:
+                return
+            update(snapshot.history)
+            snapshot.save(update_fields=['history', 'updated_at'])
+
+    @classmethod
+    def add_coupon(cls, coupon: Coupon):
+        """
+        새로 발급된 쿠폰을 스냅샷에 추가합니다.
+        """
+        cls.update_history(coupon.couponbook_id, lambda history: history.setdefault(
+            str(coupon.id), {'template_id': coupon.original_template_id, 'stamped_at': []}))
+
+    @classmethod
+    def remove_coupon(cls, coupon: Coupon):
+        """
+        삭제된 쿠폰을 스냅샷에서 뺍니다.
+        """
+        cls.update_history(coupon.couponbook_id, lambda history: history.pop(str(coupon.id), None))
+
+    @classmethod
+    def add_stamp(cls, couponbook_id: int, stamp: Stamp):
+        """
+        새로 적립된 스탬프의 적립 시각을 스냅샷에 추가합니다.
+        """
+        def update(history: dict):
+            coupon_data = history.get(str(stamp.coupon_id))
+            if coupon_data is not None:
+                coupon_data['stamped_at'].append(stamp.created_at.isoformat())
+
+        cls.update_history(couponbook_id, update)
+
+    @classmethod
+    def remove_stamp(cls, couponbook_id: int, stamp: Stamp):
+        """
+        삭제된 스탬프의 적립 시각을 스냅샷에서 뺍니다.
+        """
+        def update(history: dict):
+            coupon_data = history.get(str(stamp.coupon_id))
+            stamped_at = stamp.created_at.isoformat()
+            if coupon_data is not None and stamped_at in coupon_data['stamped_at']:
+                coupon_data['stamped_at'].remove(stamped_at)
+
+        cls.update_history(couponbook_id, update)
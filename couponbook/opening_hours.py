@@ -0,0 +1,61 @@
+"""
+가게의 영업 시간을 '한 주의 몇 번째 분(minute of week)' 구간으로 바꿔서 다루는 함수들입니다.
+
+월요일 00:00이 0분, 일요일 23:59가 10079분입니다.
+영업 시간은 요일과 관계없이 매일 같으므로, 하루의 영업 구간을 7번 펼쳐서 한 주의 구간 목록을 만듭니다.
+자정을 넘겨서 영업하는 가게(예: 18:00 ~ 02:00)는 다음 날로 이어지는 구간이 되고,
+일요일 밤에서 월요일 새벽으로 넘어가는 구간은 [시작, 10080)과 [0, 끝)으로 나눠서 모든 구간이 한 주 안에 들어가게 합니다.
+"""
+
+from datetime import datetime, time
+
+from django.utils import timezone
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def get_minute_of_day(value: time) -> int:
+    """
+    시각을 하루의 몇 번째 분인지로 바꿉니다.
+    """
+    return value.hour * 60 + value.minute
+
+
+def get_minute_of_week(value: datetime | None = None) -> int:
+    """
+    일시(기본값: 현재)를 현지 시간 기준으로 한 주의 몇 번째 분인지로 바꿉니다.
+    """
+    value = timezone.localtime(value)
+    return value.weekday() * MINUTES_PER_DAY + get_minute_of_day(value)
+
+
+def build_open_intervals(opens_at: time, last_order: time) -> list[tuple[int, int]]:
+    """
+    영업 시작 시각부터 라스트오더 시각까지를 영업 중으로 보고, 한 주의 영업 구간 [시작, 끝) 목록을 만듭니다.
+
+    라스트오더 시각이 영업 시작 시각보다 이르면 자정을 넘겨 영업하는 것으로 봅니다.
+    두 시각이 같으면 영업 구간이 없습니다.
+    """
+    start, end = get_minute_of_day(opens_at), get_minute_of_day(last_order)
+    if start == end:
+        return []
+    if end < start:
+        end += MINUTES_PER_DAY
+
+    intervals = []
+    for day in range(7):
+        day_start, day_end = day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end
+        if day_end > MINUTES_PER_WEEK:
+            intervals.append((day_start, MINUTES_PER_WEEK))
+            intervals.append((0, day_end - MINUTES_PER_WEEK))
+        else:
+            intervals.append((day_start, day_end))
+    return intervals
+
+
+def is_open_at(opens_at: time, last_order: time, minute_of_week: int) -> bool:
+    """
+    한 주의 minute_of_week번째 분에 영업 중인지를 반환합니다.
+    """
+    return any(start <= minute_of_week < end for start, end in build_open_intervals(opens_at, last_order))
@@ -0,0 +1,115 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    (정렬 기준 필드, id) 키셋을 기준으로 페이지를 나누는 커서 페이지네이션입니다.
+
+    OFFSET 없이 마지막으로 본 위치 다음부터 조회하므로, 목록이 길어져도 페이지당 조회 비용이 일정합니다.
+    뷰에 OrderingFilter가 있으면 ?ordering= 값을 정렬 기준으로 사용합니다.
+
+    커서에는 첫 번째 정렬 기준 값과 그 값 안에서의 위치(offset)만 담기므로, 정렬 기준 값이 페이지를 넘기는 사이에 바뀌면
+    항목이 빠지거나 중복됩니다. 그래서 기본 정렬(ordering)에 있는 필드와 id처럼 값이 바뀌지 않는 필드로 정렬할 때만 커서를 쓰고,
+    스탬프 개수처럼 값이 바뀌는 필드로 정렬하면 페이지 번호(?page=)로 나눕니다. (응답 형식은 같습니다.)
+    """
+
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    page_query_param = 'page'
+    # 값이 바뀔 수 있는 필드로 정렬해서 페이지 번호로 나눌 때의 현재 페이지 번호 (커서로 나눌 때는 None)
+    page_number = None
+
+    def get_ordering(self, request, queryset, view) -> tuple:
+        """
+        정렬 기준 뒤에 id를 덧붙여, 정렬 기준 값이 같은 항목들도 항상 같은 순서로 나오게 합니다.
+        """
+        ordering = super().get_ordering(request, queryset, view)
+
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            tiebreaker = '-id' if ordering[0].startswith('-') else 'id'
+            ordering = (*ordering, tiebreaker)
+        return ordering
+
+    def get_cursor_fields(self) -> set[str]:
+        """
+        커서로 나눌 수 있는 정렬 기준 필드들입니다. 기본 정렬에 있는 필드와 id입니다.
+        """
+        ordering = (self.ordering,) if isinstance(self.ordering, str) else self.ordering
+        return {'id', 'pk', *(field.lstrip('-') for field in ordering)}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        값이 바뀔 수 있는 필드로 정렬하면 커서 대신 페이지 번호로 나눕니다.
+
+        페이지 크기보다 하나 더 조회해서 다음 페이지가 있는지 확인하므로, 전체 개수를 세는 쿼리는 없습니다.
+        """
+        ordering = self.get_ordering(request, queryset, view)
+        if all(field.lstrip('-') in self.get_cursor_fields() for field in ordering):
+            self.page_number = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        try:
+            self.page_number = max(int(request.query_params.get(self.page_query_param, 1)), 1)
+        except ValueError:
+            self.page_number = 1
+
+        offset = (self.page_number - 1) * self.page_size
+        results = list(queryset.order_by(*ordering)[offset:offset + self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.has_previous = self.page_number > 1
+        return results[:self.page_size]
+
+    def get_next_link(self):
+        if self.page_number is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number is None:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [{
+            'name': self.page_query_param,
+            'required': False,
+            'in': 'query',
+            'description': '페이지 번호입니다. 스탬프 개수처럼 값이 바뀌는 필드로 정렬할 때만 사용합니다.',
+            'schema': {'type': 'integer'},
+        }]
+
+class CouponCursorPagination(KeysetCursorPagination):
+    """
+    쿠폰 목록용 페이지네이션입니다. 최근에 등록한 쿠폰부터 (saved_at, id) 순으로 보여줍니다.
+    """
+
+    ordering = ('-saved_at', '-id')
+
+class FavoriteCouponCursorPagination(KeysetCursorPagination):
+    """
+    즐겨찾기 쿠폰 목록용 페이지네이션입니다. 최근에 즐겨찾기한 쿠폰부터 (added_at, id) 순으로 보여줍니다.
+    """
+
+    ordering = ('-added_at', '-id')
+
+class CouponTemplateCursorPagination(KeysetCursorPagination):
+    """
+    쿠폰 템플릿 목록용 페이지네이션입니다. 최근에 등록된 쿠폰 템플릿부터 (created_at, id) 순으로 보여줍니다.
+    """
+
+    ordering = ('-created_at', '-id')
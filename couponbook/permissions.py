@@ -13,8 +13,10 @@ class IsMyCouponBook(BasePermission):
     def has_object_permission(self, request, view, obj: CouponBook) -> bool:
         """
         쿠폰북 인스턴스의 유저와 요청의 유저를 비교합니다.
+
+        유저 인스턴스를 추가로 조회하지 않도록 id끼리 비교합니다.
         """
-        return obj.user == request.user
+        return obj.user_id == request.user.id
 
     def has_permission(self, request, view) -> bool:
         """
@@ -35,15 +37,14 @@ class IsMyCoupon(BasePermission):
         """
         쿠폰 인스턴스에 연결된 쿠폰북의 유저와 요청의 유저를 비교합니다.
         """
-        return obj.couponbook.user == request.user
+        return obj.couponbook.user_id == request.user.id
 
     def has_permission(self, request, view) -> bool:
         """
-        Path Parameter인 coupon_id를 바탕으로 쿠폰 인스턴스를 얻어 해당 쿠폰이 있는 쿠폰북의 유저와 현재 요청의 유저를 비교합니다.
+        Path Parameter인 coupon_id에 해당하는 쿠폰이 현재 요청 유저의 쿠폰북에 있는지 쿼리 하나로 확인합니다.
         """
         coupon_id = view.kwargs['coupon_id']
-        coupon = Coupon.objects.get(id=coupon_id)
-        return self.has_object_permission(request, view, coupon)
+        return Coupon.objects.filter(id=coupon_id, couponbook__user_id=request.user.id).exists()
 
 class IsMyCouponForFavoriteAdd(IsMyCouponBook):
     """
@@ -55,14 +56,19 @@ class IsMyCouponForFavoriteAdd(IsMyCouponBook):
         쿠폰 또는 쿠폰북 인스턴스에 연결된 쿠폰북의 유저와 요청의 유저를 비교합니다.
         """
         if isinstance(obj, Coupon):
-            return obj.couponbook.user == request.user
+            return obj.couponbook.user_id == request.user.id
         else:
-            return obj.user == request.user
+            return obj.user_id == request.user.id
     
     def has_permission(self, request, view) -> bool:
+        """
+        즐겨찾기 등록(POST) 시 등록하려는 쿠폰도 본인의 쿠폰인지 확인합니다.
+
+        그 외의 요청은 함께 사용되는 IsMyCouponBook이 본인의 쿠폰북인지 확인하므로, 같은 쿠폰북을 다시 조회하지 않습니다.
+        """
         if request.method == 'POST' and super().has_permission(request, view):
             coupon_id = request.data['coupon']
-            coupon = Coupon.objects.get(id=coupon_id)
+            coupon = Coupon.objects.select_related('couponbook').get(id=coupon_id)
             
             return self.has_object_permission(request, view, coupon)
-        return super().has_permission(request, view)
+        return request.method != 'POST'
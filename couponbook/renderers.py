@@ -0,0 +1,31 @@
+"""
+SSE(Server-Sent Events) 스트리밍 응답 관련 렌더러와 함수들입니다.
+"""
+
+from json import dumps
+
+from rest_framework.renderers import BaseRenderer
+
+
+def format_event(event: str, data) -> bytes:
+    """
+    이벤트 이름과 데이터로 SSE 프레임 하나를 만듭니다. 데이터는 한 줄짜리 JSON으로 보냅니다.
+    """
+    return f"event: {event}\ndata: {dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    `Accept: text/event-stream`으로 요청했지만 스트리밍하지 않는 응답(입력 오류, 인증 실패 등)을 SSE 프레임 하나로 렌더링합니다.
+
+    오류 응답은 error 이벤트, 그 외의 응답은 message 이벤트가 됩니다.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        event = 'error' if response is not None and response.status_code >= 400 else 'message'
+        return format_event(event, data)
@@ -0,0 +1,126 @@
+"""
+가게 검색용 정규화 텍스트(Place.search_text)와 그 인덱스를 다루는 함수들입니다.
+
+- PostgreSQL: pg_trgm 확장의 GIN 인덱스를 search_text에 만들어, LIKE '%검색어%' 검색도 인덱스를 탑니다.
+- SQLite: FTS5(trigram 토크나이저) 가상 테이블을 트리거로 동기화해서 같은 역할을 합니다.
+  트리거는 테이블을 새로 만드는 마이그레이션(SQLite의 AlterField 등)에서 함께 지워지므로, 그런 마이그레이션 뒤에는 create_search_index를 다시 실행해야 합니다.
+
+두 인덱스 모두 만들 수 없는 환경에서는 search_text에 대한 일반 LIKE 검색으로 동작합니다.
+"""
+
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+PG_TRGM_INDEX = 'couponbook_place_search_text_trgm'
+SQLITE_FTS_TABLE = 'couponbook_place_fts'
+
+# trigram 인덱스는 3글자 이상의 검색어에만 쓸 수 있습니다.
+MIN_INDEXED_LENGTH = 3
+
+# DB 연결 별칭마다 SQLite FTS 인덱스가 있는지를 기억해 둡니다.
+_sqlite_fts_available: dict[str, bool] = {}
+
+
+def normalize_search_text(value: str) -> str:
+    """
+    검색용으로 문자열을 정규화합니다. 연속된 공백은 하나로 합치고 소문자로 바꿉니다.
+    """
+    return " ".join(value.split()).lower()
+
+
+def create_search_index(schema_editor):
+    """
+    DB 종류에 맞는 search_text 인덱스를 만듭니다. 마이그레이션의 RunPython에서 사용합니다.
+    """
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_TRGM_INDEX} "
+            f"ON couponbook_place USING gin (search_text gin_trgm_ops)"
+        )
+
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+                f"search_text, content='couponbook_place', content_rowid='id', tokenize='trigram')"
+            )
+        except OperationalError:
+            # FTS5나 trigram 토크나이저(SQLite 3.34+)를 지원하지 않으면 일반 LIKE 검색을 사용합니다.
+            return
+
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON couponbook_place BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON couponbook_place BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_text) "
+            f"VALUES ('delete', old.id, old.search_text); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE ON couponbook_place BEGIN "
+            f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, search_text) "
+            f"VALUES ('delete', old.id, old.search_text); "
+            f"INSERT INTO {SQLITE_FTS_TABLE}(rowid, search_text) VALUES (new.id, new.search_text); END"
+        )
+        schema_editor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+
+    _sqlite_fts_available.pop(schema_editor.connection.alias, None)
+
+
+def drop_search_index(schema_editor):
+    """
+    create_search_index로 만든 인덱스를 지웁니다.
+    """
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_TRGM_INDEX}")
+
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {SQLITE_FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}")
+
+    _sqlite_fts_available.pop(schema_editor.connection.alias, None)
+
+
+def has_sqlite_fts_index() -> bool:
+    """
+    현재 DB가 SQLite이고, FTS 가상 테이블과 동기화 트리거가 모두 있는지를 반환합니다.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+
+    if connection.alias not in _sqlite_fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+                [SQLITE_FTS_TABLE] + [f"{SQLITE_FTS_TABLE}_{suffix}" for suffix in ('ai', 'ad', 'au')],
+            )
+            _sqlite_fts_available[connection.alias] = cursor.fetchone()[0] == 4
+
+    return _sqlite_fts_available[connection.alias]
+
+
+def place_search_q(value: str, place_field: str = 'place') -> Q:
+    """
+    가게의 search_text에 검색어가 포함된 행을 고르는 Q 객체를 반환합니다.
+
+    place_field는 필터링할 모델에서 Place까지의 경로입니다. 예) 'original_template__place'
+    검색어도 search_text와 같은 방식으로 정규화합니다.
+    """
+    normalized = normalize_search_text(value)
+
+    if len(normalized) >= MIN_INDEXED_LENGTH and has_sqlite_fts_index():
+        escaped = normalized.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return Q(**{f'{place_field}__in': RawSQL(
+            f"SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE search_text LIKE %s ESCAPE '\\'",
+            [f'%{escaped}%'],
+        )})
+
+    return Q(**{f'{place_field}__search_text__contains': normalized})
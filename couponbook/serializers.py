@@ -1,5 +1,6 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.timezone import now
-from uuid import uuid4
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (OpenApiExample, extend_schema_field,
                                    extend_schema_serializer)
@@ -7,6 +8,7 @@ from rest_framework import serializers
 from rest_framework.reverse import reverse
 
 from .models import *
+from .services import CouponIssueError, StampAccrualError, accrue_stamp, issue_coupon
 
 # 시리얼라이저는 역순으로 정의되어 있습니다.
 
@@ -29,75 +31,20 @@ class StampCreateRequestSerializer(serializers.ModelSerializer):
     # 기본 PrimaryKeyRelatedField 대신 문자열 번호를 직접 처리하기 위해 CharField 사용
     receipt = serializers.CharField(write_only=True)
 
-    def validate(self, attrs) -> dict:
-        """
-        쿠폰 확인, 영수증 확인을 거쳐 스탬프 적립의 유효성을 검증합니다.
-
-        유효하지 않으면 ValidationError가 일어납니다.
-        """
-        
-        # 쿠폰 확인
-        coupon_id = self.context['coupon_id']
-        coupon = Coupon.objects.get(id=coupon_id)
-        original_template = coupon.original_template
-
-        # 1. 쿠폰이 완성된 쿠폰인지 확인합니다.
-        if hasattr(coupon, 'stamps') and \
-        (coupon.stamps.count() >= original_template.reward_info.amount):
-            raise serializers.ValidationError("쿠폰이 이미 완성되었습니다.")
-
-        # 2. 쿠폰의 유효기간이 경과하지 않았는지 확인합니다.
-        if original_template.valid_until and original_template.valid_until < now():
-            raise serializers.ValidationError("쿠폰의 유효기간이 지났습니다.")
-
-        # 영수증 확인
-        raw_value = attrs.get("receipt")
-
-        # 1. 영수증 번호가 비어있는지 / 테스트 번호인지 / 실제 등록번호인지 확인합니다.
-        if not raw_value:
-            raise serializers.ValidationError("DB에 등록되지 않은 영수증 번호입니다.")
-
-        if raw_value == "superhyunhan":
-            # MVP 단계: superhyunhan 번호는 호출할 때마다 새로운 Receipt를 생성해서
-            # 같은 번호를 여러 번 입력해도 스탬프가 계속 쌓이도록 합니다.
-            # receipt_number 필드 max_length=30 을 초과하지 않도록 uuid를 잘라냅니다.
-            max_len = Receipt._meta.get_field("receipt_number").max_length
-            base_prefix = "superhyunhan"  # 길이 12
-            # 형식: superhyunhan-<랜덤>
-            remaining = max_len - (len(base_prefix) + 1)  # 1 for hyphen
-            random_segment = uuid4().hex[:remaining]
-            receipt_number = f"{base_prefix}-{random_segment}"
-            receipt = Receipt.objects.create(
-                receipt_number=receipt_number
-            )
-        else:
-            # 그 외 번호는 실제 DB에 Receipt 가 존재해야 합니다.
-            try:
-                receipt = Receipt.objects.get(pk=raw_value)
-            except Receipt.DoesNotExist:
-                raise serializers.ValidationError("DB에 등록되지 않은 영수증 번호입니다.")
-
-        attrs["receipt"] = receipt
-
-        # 2. 영수증 번호에 해당하는 스탬프가 이미 등록되어 있는지 확인합니다.
-        # superhyunhan* 로 시작하는 테스트용 영수증은 중복 체크를 건너뛰어
-        # 같은 번호를 여러 번 입력해도 스탬프가 계속 쌓이도록 합니다.
-        if hasattr(receipt, "stamp") and not str(receipt.receipt_number).startswith(
-            "superhyunhan"
-        ):
-            raise serializers.ValidationError("이미 스탬프가 발급된 영수증 번호입니다.")
-
-        return super().validate(attrs)
-
     def create(self, validated_data) -> Stamp:
         """
-        유효성 검증을 통과한 영수증 번호를 바탕으로 쿠폰 id와 유저를 바탕으로 스탬프 인스턴스를 생성하고 돌려줍니다.
+        입력받은 영수증 번호로 쿠폰 id에 해당하는 쿠폰에 스탬프를 적립하고, 적립된 스탬프 인스턴스를 돌려줍니다.
+
+        쿠폰 확인, 영수증 확인은 쿠폰 행을 잠근 상태에서 `accrue_stamp`가 처리하며, 적립할 수 없으면 ValidationError가 일어납니다.
         """
-        receipt = validated_data.pop("receipt")
+        receipt_number = validated_data.pop("receipt")
         coupon_id = self.context["coupon_id"]
         user = self.context["request"].user
 
-        return Stamp.objects.create(receipt=receipt, coupon_id=coupon_id, customer=user)
+        try:
+            return accrue_stamp(coupon_id, receipt_number, user)
+        except StampAccrualError as e:
+            raise serializers.ValidationError(str(e))
 
     class Meta:
         model = Stamp
@@ -120,12 +67,13 @@ class StampCreateResponseSerializer(serializers.ModelSerializer):
         """
         스탬프 적립 후, 이 쿠폰의 스탬프 개수입니다.
         """
-        coupon_id = self.context['coupon_id']
-        return Coupon.objects.get(id=coupon_id).stamps.count()
+        return obj.coupon.stamp_count
     
     def get_is_completed(self, obj: Stamp) -> bool:
         """
         스탬프 적립 후, 이 쿠폰이 완성되었는지를 의미합니다.
+
+        `accrue_stamp`가 잠근 쿠폰의 스냅샷(stamp_count, 리워드 정보)을 그대로 사용하므로 추가 쿼리가 없습니다.
         """
         return self.get_current_stamps(obj) >= obj.coupon.original_template.reward_info.amount
     
@@ -194,7 +142,8 @@ class RewardsInfoDetailResponseSerializer(serializers.ModelSerializer):
                 "image_url": "(이미지 파일 URL)", 
                 "name": "매머드 커피", 
                 "lat": "37.21412582140", 
-                "lng": "127.3432032904"
+                "lng": "127.3432032904", 
+                "is_open": True
             }
         )
     ]
@@ -206,9 +155,22 @@ class PlaceListResponseSerializer(serializers.ModelSerializer):
     목록과 지도 겸용으로 설계되었습니다.
     """
 
+    is_open = serializers.SerializerMethodField()
+
+    def get_is_open(self, obj: Place) -> bool:
+        """
+        현재 영업 중인지의 여부입니다.
+
+        context에 open_place_ids가 있으면 그 집합에서 찾고, 없으면 가게의 영업 시간으로 직접 계산합니다.
+        """
+        open_place_ids = self.context.get('open_place_ids')
+        if open_place_ids is not None:
+            return obj.id in open_place_ids
+        return obj.is_open_at()
+
     class Meta:
         model = Place
-        fields = ['image_url', 'name', 'lat', 'lng']
+        fields = ['image_url', 'name', 'lat', 'lng', 'is_open']
 
 @extend_schema_serializer(
     examples=[
@@ -224,6 +186,7 @@ class PlaceListResponseSerializer(serializers.ModelSerializer):
                 "tel": "0507-1361-0962",
                 "lat": "37.21412582140",
                 "lng": "127.3432032904",
+                "is_open": True,
             },
         )
     ]
@@ -249,7 +212,7 @@ class PlaceDetailResponseSerializer(PlaceListResponseSerializer):
     class Meta(PlaceListResponseSerializer.Meta):
         fields =  [
             'image_url', 'name', 'address',
-            'opens_at', 'closes_at', 'last_order', 'tel', 'lat', 'lng'
+            'opens_at', 'closes_at', 'last_order', 'tel', 'lat', 'lng', 'is_open'
         ]
 
 # ------------------------ 쿠폰 템플릿 -------------------------
@@ -270,6 +233,7 @@ class PlaceDetailResponseSerializer(PlaceListResponseSerializer):
                     "tel": "0507-1361-0962",
                     "lat": "37.21412582140",
                     "lng": "127.3432032904",
+                    "is_open": True,
                 },
                 "reward_info": {
                     "amount": 10,
@@ -302,20 +266,36 @@ class CouponTemplateListSerializer(serializers.ModelSerializer):
             'couponbook:coupon-template-detail', kwargs={'coupon_template_id': obj.id}, request=request
         )
 
+    @staticmethod
+    def get_viewer_context(coupon_templates: list[CouponTemplate], user) -> dict:
+        """
+        목록에 포함된 쿠폰 템플릿들에 대해, 현재 유저가 보유한 쿠폰 템플릿 id 집합을
+        한 번에 계산해서 시리얼라이저 context로 넘길 딕셔너리로 반환합니다.
+
+        - owned_template_ids: 현재 유저가 이미 쿠폰을 보유한 쿠폰 템플릿 id 집합
+        """
+        template_ids = [template.id for template in coupon_templates]
+
+        owned_template_ids = set()
+        if template_ids and user is not None and getattr(user, "is_authenticated", False):
+            owned_template_ids = set(
+                Coupon.objects.filter(couponbook__user=user, original_template_id__in=template_ids)
+                .values_list('original_template_id', flat=True)
+            )
+
+        return {'owned_template_ids': owned_template_ids}
+
     def get_current_n_remaining(self, obj: CouponTemplate) -> int | None:
         """
         현재 기준 남은 선착순 인원 수입니다.
         """
-        if obj.first_n_persons and hasattr(obj, 'coupons'):
-            return max(0, obj.first_n_persons - obj.coupons.count())
-        elif obj.first_n_persons:
-            return obj.first_n_persons
-        else:
-            return None
+        return obj.n_remaining
 
     def get_already_owned(self, obj: CouponTemplate) -> bool:
         """
         이미 해당 쿠폰 템플릿으로 생성한 쿠폰을 보유하고 있는지의 여부입니다.
+
+        context에 owned_template_ids가 있으면 그 집합에서 찾고, 없으면 직접 조회합니다.
         """
         # context 에 request 가 없거나, request.user 가 없는 특수 상황(테스트 스크립트, 미들웨어 미적용 등)을
         # 안전하게 처리하기 위해 방어 코드를 추가합니다.
@@ -326,6 +306,10 @@ class CouponTemplateListSerializer(serializers.ModelSerializer):
         if not user or not getattr(user, "is_authenticated", False):
             return False
 
+        owned_template_ids = self.context.get('owned_template_ids')
+        if owned_template_ids is not None:
+            return obj.id in owned_template_ids
+
         if hasattr(obj, "coupons"):
             return obj.coupons.filter(couponbook__user=user).exists()
 
@@ -340,12 +324,26 @@ class CouponTemplateListSerializer(serializers.ModelSerializer):
         ]
 
 
+class CouponTemplateNearbyRequestSerializer(serializers.Serializer):
+    """
+    주변 쿠폰 템플릿 검색의 쿼리 파라미터를 검증하는 시리얼라이저입니다.
+    """
+
+    lat = serializers.FloatField(min_value=-90, max_value=90, help_text="검색 중심의 위도입니다.")
+    lng = serializers.FloatField(min_value=-180, max_value=180, help_text="검색 중심의 경도입니다.")
+    radius = serializers.IntegerField(min_value=1, max_value=10000, default=1000,
+                                      help_text="검색 반경(m)입니다. 최대 10km 입니다.")
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=50,
+                                     help_text="가까운 순으로 최대 몇 개까지 반환할지입니다.")
+
+
 @extend_schema_serializer(
     examples=[
         OpenApiExample(
             "예시",
             {
                 "id": 1,
+                "coupon_template_url": "http://127.0.0.1/couponbook/coupon-templates/1/",
                 "place": {
                     "image_url": "(이미지 파일 URL)",
                     "name": "매머드 커피",
@@ -356,6 +354,53 @@ class CouponTemplateListSerializer(serializers.ModelSerializer):
                     "tel": "0507-1361-0962",
                     "lat": "37.21412582140",
                     "lng": "127.3432032904",
+                    "is_open": True,
+                },
+                "reward_info": {
+                    "amount": 10,
+                    "reward": "아메리카노 1잔 무료"
+                },
+                "current_n_remaining": 30,
+                "already_owned": True,
+                "distance": 352,
+            },
+        )
+    ]
+)
+class CouponTemplateNearbySerializer(CouponTemplateListSerializer):
+    """
+    주변 쿠폰 템플릿 검색 결과에 쓰이는 시리얼라이저입니다. 검색 중심으로부터의 거리가 추가됩니다.
+    """
+
+    distance = serializers.SerializerMethodField()
+
+    def get_distance(self, obj: CouponTemplate) -> int:
+        """
+        검색 중심에서 가게까지의 거리(m)입니다. 뷰에서 계산해 둔 값을 반올림합니다.
+        """
+        return round(obj.distance)
+
+    class Meta(CouponTemplateListSerializer.Meta):
+        fields = CouponTemplateListSerializer.Meta.fields + ['distance']
+
+
+@extend_schema_serializer(
+    examples=[
+        OpenApiExample(
+            "예시",
+            {
+                "id": 1,
+                "place": {
+                    "image_url": "(이미지 파일 URL)",
+                    "name": "매머드 커피",
+                    "address": "서울 동대문구 이문동 264-223",
+                    "opens_at": "08:00",
+                    "closes_at": "21:00",
+                    "last_order": "20:30",
+                    "tel": "0507-1361-0962",
+                    "lat": "37.21412582140",
+                    "lng": "127.3432032904",
+                    "is_open": True,
                 },
                 "reward_info": {
                     "amount": 10,
@@ -394,7 +439,7 @@ class CouponTemplateCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = CouponTemplate
         # place 필드는 뷰에서 처리하므로 제외
-        exclude = ["id", "place", "created_at"]
+        exclude = ["id", "place", "created_at", "issued_count"]
 
     def create(self, validated_data):
         reward = validated_data.pop("reward_info")  # required=True 이므로 존재 보장
@@ -420,6 +465,7 @@ class CouponTemplateCreateSerializer(serializers.ModelSerializer):
                     "tel": "0507-1361-0962",
                     "lat": "37.21412582140",
                     "lng": "127.3432032904",
+                    "is_open": True,
                 },
                 "reward_info": {
                     "amount": 10,
@@ -478,7 +524,7 @@ class CouponListResponseSerializer(serializers.ModelSerializer):
         """
         original_template = obj.original_template
         place = original_template.place
-        return PlaceDetailResponseSerializer(place).data
+        return PlaceDetailResponseSerializer(place, context=self.context).data
     
     # RewardsInfoDetailResponseSerializer | None으로 설정하면 spectacular warning 떠서 None 뺐음
     def get_reward_info(self, obj: Coupon) -> RewardsInfoDetailResponseSerializer:
@@ -495,8 +541,7 @@ class CouponListResponseSerializer(serializers.ModelSerializer):
         """
         해당 쿠폰에 현재 적립되어 있는 스탬프 개수입니다.
         """
-        stamps = Stamp.objects.filter(coupon=obj)
-        return stamps.count()
+        return obj.stamp_count
     
     def get_days_remaining(self, obj: Coupon) -> int | None:
         """
@@ -515,7 +560,7 @@ class CouponListResponseSerializer(serializers.ModelSerializer):
 
         if reward_info:
             max_stamps: int = reward_info.amount
-            current_stamps: int = Stamp.objects.filter(coupon=obj).count()
+            current_stamps: int = obj.stamp_count
 
             return max_stamps == current_stamps
         return None
@@ -558,6 +603,7 @@ class CouponListResponseSerializer(serializers.ModelSerializer):
                     "tel": "0507-1361-0962",
                     "lat": "37.21412582140",
                     "lng": "127.3432032904",
+                    "is_open": True,
                 },
             },
         )
@@ -647,9 +693,8 @@ class CouponCreateRequestSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("유효기간이 만료된 쿠폰 템플릿입니다.")
         
         # 3. 선착순 인원이 있다면 마감되지 않았는지 확인합니다.
-        if hasattr(original_template, 'coupons') \
-        and original_template.first_n_persons \
-        and original_template.first_n_persons <= original_template.coupons.count():
+        # 최종 판단은 create에서 발급하면서 원자적으로 이루어지고, 여기서는 이미 마감된 경우를 빠르게 걸러냅니다.
+        if original_template.n_remaining == 0:
             raise serializers.ValidationError("이미 선착순 마감된 쿠폰 템플릿입니다.")
         
         # 4. 이미 해당 유저가 해당 쿠폰 템플릿으로 등록한 쿠폰이 존재하는지 확인합니다.
@@ -668,13 +713,16 @@ class CouponCreateRequestSerializer(serializers.ModelSerializer):
     def create(self, validated_data) -> Coupon:
         """
         원본 쿠폰 템플릿을 바탕으로 실사용 쿠폰을 생성합니다.
+
+        동시에 요청이 몰려 검증 이후에 마감되었다면 ValidationError가 일어납니다.
         """
         original_template = validated_data.pop("original_template")
         couponbook = self.context["couponbook"]
 
-        return Coupon.objects.create(
-            couponbook=couponbook, original_template=original_template
-        )
+        try:
+            return issue_coupon(couponbook, original_template)
+        except CouponIssueError as e:
+            raise serializers.ValidationError(str(e))
 
     class Meta:
         model = Coupon
@@ -698,6 +746,7 @@ class CouponCreateRequestSerializer(serializers.ModelSerializer):
                         "tel": "0507-1361-0962",
                         "lat": "37.21412582140",
                         "lng": "127.3432032904",
+                        "is_open": True,
                     },
                     "reward_info": {
                         "amount": 10,
@@ -818,10 +867,31 @@ class CouponBookDetailResponseSerializer(serializers.ModelSerializer):
     coupon_counts = serializers.SerializerMethodField()
     stamp_counts = serializers.SerializerMethodField()
 
+    @staticmethod
+    def annotate_counts(queryset, user):
+        """
+        쿠폰북 쿼리셋에 즐겨찾기 쿠폰 수(n_favorites), 쿠폰 수(n_coupons), user가 적립한 스탬프 수(n_stamps)를
+        서브쿼리로 annotate해서, 쿠폰북과 개수들을 쿼리 하나로 가져올 수 있게 합니다.
+        """
+        favorites = FavoriteCoupon.objects.filter(couponbook=OuterRef('pk')) \
+            .values('couponbook').annotate(n=Count('id')).values('n')
+        coupons = Coupon.objects.filter(couponbook=OuterRef('pk')) \
+            .values('couponbook').annotate(n=Count('id')).values('n')
+        stamps = Stamp.objects.filter(customer=user) \
+            .values('customer').annotate(n=Count('id')).values('n')
+
+        return queryset.annotate(
+            n_favorites=Coalesce(Subquery(favorites), 0),
+            n_coupons=Coalesce(Subquery(coupons), 0),
+            n_stamps=Coalesce(Subquery(stamps), 0),
+        )
+
     def get_favorite_counts(self, obj: CouponBook) -> int:
         """
         즐겨찾기한 쿠폰의 개수입니다.
         """
+        if hasattr(obj, 'n_favorites'):
+            return obj.n_favorites
         coupons = FavoriteCoupon.objects.filter(couponbook=obj)
         return coupons.count()
 
@@ -829,6 +899,8 @@ class CouponBookDetailResponseSerializer(serializers.ModelSerializer):
         """
         쿠폰북에 등록한 쿠폰의 개수입니다.
         """
+        if hasattr(obj, 'n_coupons'):
+            return obj.n_coupons
         coupons = Coupon.objects.filter(couponbook=obj)
         return coupons.count()
 
@@ -836,6 +908,8 @@ class CouponBookDetailResponseSerializer(serializers.ModelSerializer):
         """
         지금까지 적립한 스탬프의 개수입니다.
         """
+        if hasattr(obj, 'n_stamps'):
+            return obj.n_stamps
         user = self.context["request"].user
         stamps = Stamp.objects.filter(customer=user)
         return stamps.count()
@@ -0,0 +1,127 @@
+"""
+여러 모델에 걸친 쓰기 작업을 한 트랜잭션으로 처리하는 서비스 함수들입니다.
+"""
+
+from uuid import uuid4
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import now
+
+from .models import Coupon, CouponBook, CouponTemplate, Receipt, Stamp
+
+
+class CouponIssueError(Exception):
+    """
+    쿠폰을 발급할 수 없을 때 발생하는 예외입니다. 예외 메시지에 발급할 수 없는 이유가 담깁니다.
+    """
+
+
+class StampAccrualError(Exception):
+    """
+    스탬프를 적립할 수 없을 때 발생하는 예외입니다. 예외 메시지에 적립할 수 없는 이유가 담깁니다.
+    """
+
+
+def issue_coupon(couponbook: CouponBook, coupon_template: CouponTemplate) -> Coupon:
+    """
+    쿠폰 템플릿을 바탕으로 쿠폰을 발급해서 쿠폰북에 등록하고, 발급된 쿠폰을 반환합니다.
+
+    1. 쿠폰 템플릿의 유효 기간이 만료되지 않았는지 확인합니다.
+    2. 조건부 UPDATE로 선착순 자리를 하나 차지합니다. 마감되었다면 갱신되는 행이 없습니다.
+    3. 같은 트랜잭션에서 쿠폰을 INSERT 합니다. 이미 보유한 쿠폰 템플릿이면 유니크 제약 위반으로 2번까지 롤백됩니다.
+
+    COUNT 쿼리 없이 쿠폰 템플릿 행 하나만 잠깐 잠그므로, 발급 요청이 몰려도 요청당 비용이 일정하고 선착순 인원을 초과하지 않습니다.
+    발급할 수 없으면 CouponIssueError가 발생합니다.
+    """
+
+    # 1. 유효 기간이 만료되지 않았는지 확인합니다.
+    if coupon_template.valid_until and coupon_template.valid_until < now():
+        raise CouponIssueError("유효기간이 만료된 쿠폰 템플릿입니다.")
+
+    coupon = Coupon(couponbook=couponbook, original_template=coupon_template)
+    try:
+        with transaction.atomic():
+            # 2. 선착순 자리를 차지합니다.
+            if not coupon_template.claim_slot():
+                raise CouponIssueError("이미 선착순 마감된 쿠폰 템플릿입니다.")
+
+            # 3. 쿠폰을 저장합니다.
+            # Coupon.save의 검증과 자리 차지는 위에서 원자적으로 처리했으므로, 다시 실행하지 않도록 건너뜁니다.
+            coupon.save(validate=False)
+    except IntegrityError:
+        raise CouponIssueError("이미 해당 쿠폰 템플릿으로 생성한 쿠폰이 존재합니다.")
+
+    return coupon
+
+
+# MVP 단계: 이 번호로 적립하면 호출할 때마다 새로운 영수증을 만들어서, 같은 번호로 스탬프가 계속 쌓이도록 합니다.
+TEST_RECEIPT_NUMBER = "superhyunhan"
+
+
+def _create_test_receipt() -> Receipt:
+    """
+    테스트용 영수증을 새로 만듭니다. receipt_number 필드의 max_length를 넘지 않도록 uuid를 잘라 붙입니다.
+    """
+
+    max_len = Receipt._meta.get_field("receipt_number").max_length
+    # 형식: superhyunhan-<랜덤>
+    remaining = max_len - (len(TEST_RECEIPT_NUMBER) + 1)
+    return Receipt.objects.create(receipt_number=f"{TEST_RECEIPT_NUMBER}-{uuid4().hex[:remaining]}")
+
+
+def accrue_stamp(coupon_id: int, receipt_number: str, customer) -> Stamp:
+    """
+    영수증 번호를 바탕으로 쿠폰에 스탬프를 하나 적립하고, 적립된 스탬프를 반환합니다.
+
+    1. 쿠폰 행을 SELECT ... FOR UPDATE로 잠그면서 쿠폰 템플릿, 리워드 정보를 함께 가져옵니다.
+    2. 잠근 쿠폰을 기준으로 완성 여부, 유효 기간을 확인합니다.
+    3. 영수증이 등록되어 있는지, 이미 스탬프가 발급된 영수증인지를 쿼리 하나로 확인합니다.
+    4. 스탬프를 INSERT 하고 쿠폰의 stamp_count를 1 늘립니다.
+
+    같은 쿠폰에 대한 적립 요청은 1번의 잠금에서 줄을 서므로, 동시에 요청이 몰려도 리워드 개수를 넘겨서 적립되지 않습니다.
+    반환된 스탬프의 coupon에는 적립 직후의 stamp_count가 담겨 있어, 응답을 만들 때 다시 조회하지 않아도 됩니다.
+    적립할 수 없으면 StampAccrualError가 발생합니다.
+    """
+
+    if not receipt_number:
+        raise StampAccrualError("DB에 등록되지 않은 영수증 번호입니다.")
+
+    try:
+        with transaction.atomic():
+            # 1. 쿠폰 행을 잠급니다. 리워드 정보는 LEFT OUTER JOIN 이므로 쿠폰 행만 잠그도록 of를 지정합니다.
+            try:
+                coupon = Coupon.objects.select_for_update(of=('self',)) \
+                    .select_related('original_template__reward_info') \
+                    .get(id=coupon_id)
+            except Coupon.DoesNotExist:
+                raise StampAccrualError("존재하지 않는 쿠폰입니다.")
+            original_template = coupon.original_template
+
+            # 2. 완성 여부, 유효 기간을 확인합니다.
+            if coupon.stamp_count >= original_template.reward_info.amount:
+                raise StampAccrualError("쿠폰이 이미 완성되었습니다.")
+            if original_template.valid_until and original_template.valid_until < now():
+                raise StampAccrualError("쿠폰의 유효기간이 지났습니다.")
+
+            # 3. 영수증을 확인합니다.
+            if receipt_number == TEST_RECEIPT_NUMBER:
+                receipt = _create_test_receipt()
+            else:
+                receipt = Receipt.objects \
+                    .annotate(is_used=Exists(Stamp.objects.filter(receipt=OuterRef('pk')))) \
+                    .filter(pk=receipt_number).first()
+                if receipt is None:
+                    raise StampAccrualError("DB에 등록되지 않은 영수증 번호입니다.")
+                if receipt.is_used:
+                    raise StampAccrualError("이미 스탬프가 발급된 영수증 번호입니다.")
+
+            # 4. 스탬프를 저장합니다. Stamp.save가 쿠폰의 stamp_count도 함께 늘립니다.
+            # Stamp.save의 검증은 위에서 잠근 상태로 처리했으므로, 검증 쿼리를 다시 실행하지 않도록 건너뜁니다.
+            stamp = Stamp(coupon=coupon, receipt=receipt, customer=customer)
+            stamp.save(validate=False)
+    except IntegrityError:
+        # 같은 영수증으로 동시에 적립을 시도한 경우
+        raise StampAccrualError("이미 스탬프가 발급된 영수증 번호입니다.")
+
+    return stamp
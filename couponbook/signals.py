@@ -0,0 +1,199 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import FavoriteLocation
+
+from .caching import (CATALOGUE_VERSION_KEY, CURATION_CANDIDATES_VERSION_KEY,
+                      bump_version_on_commit, get_coupon_template_version_key,
+                      get_couponbook_version_key, get_user_context_version_key)
+from .models import (Coupon, CouponBook, CouponTemplate, FavoriteCoupon, Place,
+                     RewardsInfo, Stamp, UserStatisticsSnapshot)
+
+
+@receiver(post_delete, sender=Coupon)
+def release_coupon_template_slot(sender, instance: Coupon, **kwargs):
+    """
+    쿠폰이 삭제되면(post_delete), 해당 쿠폰이 차지하던 쿠폰 템플릿의 선착순 자리 하나를 되돌려 놓습니다.
+
+    쿠폰 템플릿이 함께 삭제되는 경우에도 안전하도록 인스턴스 대신 id로 UPDATE 합니다.
+    """
+    CouponTemplate.objects.filter(id=instance.original_template_id, issued_count__gt=0) \
+        .update(issued_count=F('issued_count') - 1)
+
+
+@receiver(post_delete, sender=Stamp)
+def decrease_coupon_stamp_count(sender, instance: Stamp, **kwargs):
+    """
+    스탬프가 삭제되면(post_delete), 해당 스탬프가 적립되어 있던 쿠폰의 stamp_count를 1 줄입니다.
+
+    쿠폰이 함께 삭제되는 경우에도 안전하도록 인스턴스 대신 id로 UPDATE 합니다.
+    """
+    Coupon.objects.filter(id=instance.coupon_id, stamp_count__gt=0) \
+        .update(stamp_count=F('stamp_count') - 1)
+
+
+@receiver(post_save, sender=CouponTemplate)
+@receiver(post_delete, sender=CouponTemplate)
+@receiver(post_save, sender=RewardsInfo)
+@receiver(post_delete, sender=RewardsInfo)
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_coupon_template_catalogue(sender, **kwargs):
+    """
+    쿠폰 템플릿 목록에 나오는 정보가 바뀌면, 캐시된 쿠폰 템플릿 목록 응답을 무효화합니다.
+
+    쿠폰이 발급되거나 삭제되면 남은 선착순 인원 수(current_n_remaining)가 바뀌므로 쿠폰도 포함합니다.
+    """
+    bump_version_on_commit(CATALOGUE_VERSION_KEY)
+
+
+@receiver(post_save, sender=CouponTemplate)
+@receiver(post_delete, sender=CouponTemplate)
+@receiver(post_save, sender=RewardsInfo)
+@receiver(post_delete, sender=RewardsInfo)
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def invalidate_curation_candidates(sender, **kwargs):
+    """
+    큐레이션 추천 후보가 바뀌면 후보 버전 번호를 올려서, 캐시된 큐레이션 결과를 백그라운드에서 새로 만들게 합니다.
+    """
+    bump_version_on_commit(CURATION_CANDIDATES_VERSION_KEY)
+
+
+@receiver(post_save, sender=CouponTemplate)
+@receiver(post_delete, sender=CouponTemplate)
+@receiver(post_save, sender=RewardsInfo)
+@receiver(post_delete, sender=RewardsInfo)
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+def bump_coupon_template_version(sender, instance: CouponTemplate | RewardsInfo | Place, **kwargs):
+    """
+    쿠폰 템플릿이나 그 리워드 정보, 가게가 바뀌면 해당 쿠폰 템플릿들의 버전 번호를 올려서, 그 템플릿의 쿠폰 조회 ETag가 바뀌게 합니다.
+    """
+    if isinstance(instance, CouponTemplate):
+        coupon_template_ids = [instance.id]
+    elif isinstance(instance, RewardsInfo):
+        coupon_template_ids = [instance.coupon_template_id]
+    else:
+        coupon_template_ids = CouponTemplate.objects.filter(place_id=instance.id).values_list('id', flat=True)
+    for coupon_template_id in coupon_template_ids:
+        bump_version_on_commit(get_coupon_template_version_key(coupon_template_id))
+
+
+@receiver(post_save, sender=CouponBook)
+def bump_new_couponbook_version(sender, instance: CouponBook, created: bool, **kwargs):
+    """
+    쿠폰북이 새로 만들어지면 쿠폰북과 유저 컨텍스트의 버전 번호를 올려서,
+    같은 id를 쓰던 이전 쿠폰북이나 유저의 캐시, ETag가 재사용되지 않게 합니다.
+    """
+    if created:
+        bump_version_on_commit(get_couponbook_version_key(instance.id))
+        bump_version_on_commit(get_user_context_version_key(instance.user_id))
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+@receiver(post_save, sender=FavoriteCoupon)
+@receiver(post_delete, sender=FavoriteCoupon)
+def bump_couponbook_version(sender, instance: Coupon | FavoriteCoupon, **kwargs):
+    """
+    쿠폰이나 즐겨찾기가 바뀌면 해당 쿠폰북의 버전 번호를 올려서, 쿠폰북 관련 조회의 ETag가 바뀌게 합니다.
+    """
+    bump_version_on_commit(get_couponbook_version_key(instance.couponbook_id))
+
+
+def get_stamp_couponbook_id(stamp: Stamp) -> int | None:
+    """
+    스탬프가 속한 쿠폰북 id를 반환합니다.
+
+    적립할 때는 쿠폰 인스턴스가 이미 있으므로 추가 쿼리가 없고, 쿠폰 인스턴스가 없으면 쿠폰북 id만 조회합니다.
+    쿠폰이 이미 삭제되었다면 None을 반환합니다. (이 경우는 쿠폰 쪽 시그널이 처리합니다.)
+    """
+    if Stamp.coupon.is_cached(stamp):
+        return stamp.coupon.couponbook_id
+    return Coupon.objects.filter(id=stamp.coupon_id).values_list('couponbook_id', flat=True).first()
+
+
+@receiver(post_save, sender=Stamp)
+@receiver(post_delete, sender=Stamp)
+def bump_couponbook_version_for_stamp(sender, instance: Stamp, **kwargs):
+    """
+    스탬프가 적립되거나 삭제되면 스탬프가 속한 쿠폰북의 버전 번호를 올립니다.
+    """
+    couponbook_id = get_stamp_couponbook_id(instance)
+    if couponbook_id is not None:
+        bump_version_on_commit(get_couponbook_version_key(couponbook_id))
+
+
+def get_coupon_user_id(coupon: Coupon) -> int | None:
+    """
+    쿠폰을 보유한 유저 id를 반환합니다.
+
+    발급할 때는 쿠폰북 인스턴스가 이미 있으므로 추가 쿼리가 없고, 쿠폰북 인스턴스가 없으면 유저 id만 조회합니다.
+    """
+    if Coupon.couponbook.is_cached(coupon):
+        return coupon.couponbook.user_id
+    return CouponBook.objects.filter(id=coupon.couponbook_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def bump_user_context_version_for_coupon(sender, instance: Coupon, **kwargs):
+    """
+    쿠폰이 발급되거나 삭제되면 보유한 유저의 AI 어시스턴트 컨텍스트 버전 번호를 올립니다.
+    """
+    user_id = get_coupon_user_id(instance)
+    if user_id is not None:
+        bump_version_on_commit(get_user_context_version_key(user_id))
+
+
+@receiver(post_save, sender=Stamp)
+@receiver(post_delete, sender=Stamp)
+@receiver(post_save, sender=FavoriteLocation)
+@receiver(post_delete, sender=FavoriteLocation)
+def bump_user_context_version(sender, instance: Stamp | FavoriteLocation, **kwargs):
+    """
+    스탬프가 적립되거나 삭제되면 적립받은 유저의, 자주 가는 지역이 바뀌면 해당 유저의 AI 어시스턴트 컨텍스트 버전 번호를 올립니다.
+    """
+    user_id = instance.customer_id if isinstance(instance, Stamp) else instance.user_id
+    bump_version_on_commit(get_user_context_version_key(user_id))
+
+
+@receiver(post_save, sender=Coupon)
+def add_coupon_to_statistics_snapshot(sender, instance: Coupon, created: bool, **kwargs):
+    """
+    쿠폰이 발급되면 유저 통계 스냅샷에 추가합니다.
+    """
+    if created:
+        UserStatisticsSnapshot.add_coupon(instance)
+
+
+@receiver(post_delete, sender=Coupon)
+def remove_coupon_from_statistics_snapshot(sender, instance: Coupon, **kwargs):
+    """
+    쿠폰이 삭제되면 유저 통계 스냅샷에서 뺍니다.
+    """
+    UserStatisticsSnapshot.remove_coupon(instance)
+
+
+@receiver(post_save, sender=Stamp)
+def add_stamp_to_statistics_snapshot(sender, instance: Stamp, created: bool, **kwargs):
+    """
+    스탬프가 적립되면 유저 통계 스냅샷에 적립 시각을 추가합니다.
+    """
+    couponbook_id = get_stamp_couponbook_id(instance) if created else None
+    if couponbook_id is not None:
+        UserStatisticsSnapshot.add_stamp(couponbook_id, instance)
+
+
+@receiver(post_delete, sender=Stamp)
+def remove_stamp_from_statistics_snapshot(sender, instance: Stamp, **kwargs):
+    """
+    스탬프가 삭제되면 유저 통계 스냅샷에서 적립 시각을 뺍니다.
+    """
+    couponbook_id = get_stamp_couponbook_id(instance)
+    if couponbook_id is not None:
+        UserStatisticsSnapshot.remove_stamp(couponbook_id, instance)
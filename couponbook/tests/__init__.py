@@ -1,3 +1,5 @@
 from .apitests import *
 from .modeltests import *
-from .curationtests import *
\ No newline at end of file
+from .curationtests import *
+from .concurrencytests import *
+from .latlngtests import *
@@ -0,0 +1,330 @@
+from concurrent.futures import ThreadPoolExecutor
+from random import uniform
+from time import perf_counter, sleep
+
+from accounts.models import User
+from couponbook.models import *
+from couponbook.services import (CouponIssueError, StampAccrualError,
+                                 accrue_stamp, issue_coupon)
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from .decorators import print_success_message
+from .stubllm import StubLLMServer
+
+# 동시 요청 상황을 재현하는 테스트케이스 (벤치마크 겸용)
+
+# 테이블 잠금 오류가 났을 때 재시도하는 최대 횟수
+MAX_LOCK_RETRIES = 100
+# 재시도 사이의 최대 대기 시간(초)
+MAX_RETRY_DELAY = 0.5
+
+
+def run_concurrently(func, args_list: list, max_workers: int = 32) -> list:
+    """
+    인자 목록의 각 인자로 func를 여러 스레드에서 동시에 실행하고, 결과 목록을 반환합니다.
+
+    스레드마다 DB 연결이 새로 열리므로, 실행이 끝나면 해당 스레드의 연결을 닫습니다.
+    SQLite처럼 테이블 잠금 오류가 나는 DB에서는 잠금이 풀릴 때까지 MAX_LOCK_RETRIES번까지 재시도하고,
+    그래도 실패하면(교착 상태 등) 테스트가 멈추지 않도록 오류를 그대로 발생시킵니다.
+    """
+
+    def worker(args):
+        try:
+            for attempt in range(MAX_LOCK_RETRIES):
+                try:
+                    return func(*args)
+                except OperationalError:
+                    if attempt == MAX_LOCK_RETRIES - 1:
+                        raise
+                    # 잠금을 기다리는 스레드들이 한꺼번에 다시 시도하지 않도록 대기 시간을 무작위로 늘려 갑니다.
+                    sleep(uniform(0, min(MAX_RETRY_DELAY, 0.01 * 2 ** attempt)))
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(worker, args_list))
+
+
+class CouponIssueConcurrencyTestCase(TransactionTestCase):
+    """
+    선착순 쿠폰 발급 요청이 동시에 몰렸을 때, 선착순 인원만큼만 쿠폰이 발급되는지 테스트하는 테스트 케이스입니다.
+    """
+
+    n_claims = 200
+    first_n_persons = 30
+
+    def setUp(self):
+        # 법정동 주소 생성
+        legal_district_dict = {
+            'code_in_law': '1123011000',
+            'province': '서울특별시',
+            'city': '동대문구',
+            'district': '이문동',
+        }
+        legal_district = LegalDistrict.objects.create(**legal_district_dict)
+
+        # 가게 생성
+        place_dict = {
+            'name': '한국외대 서울캠퍼스',
+            'address_district': legal_district,
+            'address_rest': '1234',
+            'image_url': 'aaa.jpg',
+            'opens_at': now().time(),
+            'closes_at': now().time(),
+            'tags': '대학교',
+            'last_order': now().time(),
+            'tel': '02-xxxx-xxxx',
+            'owner': None,
+        }
+        place = Place.objects.create(**place_dict)
+
+        # 쿠폰 템플릿 생성
+        self.coupon_template = CouponTemplate.objects.create(
+            first_n_persons=self.first_n_persons, is_on=True, place=place
+        )
+        RewardsInfo.objects.create(coupon_template=self.coupon_template, amount=5, reward='대학원 무료')
+
+        # 쿠폰을 발급받을 유저(쿠폰북) 생성
+        for i in range(self.n_claims):
+            User.objects.create(username=f'test{i}', password='1234')
+
+        return super().setUp()
+
+    @print_success_message("동시에 몰린 선착순 쿠폰 발급 요청 중 선착순 인원만큼만 발급되는지 테스트")
+    def test_concurrent_first_come_first_served_issue(self):
+        """
+        여러 스레드에서 동시에 쿠폰 발급을 시도했을 때, 정확히 선착순 인원만큼의 쿠폰만 존재하는지 테스트하는 테스트 메소드입니다.
+        """
+
+        def claim(couponbook_id: int) -> bool:
+            couponbook = CouponBook.objects.get(id=couponbook_id)
+            coupon_template = CouponTemplate.objects.get(id=self.coupon_template.id)
+            try:
+                issue_coupon(couponbook, coupon_template)
+                return True
+            except CouponIssueError:
+                return False
+
+        couponbook_ids = list(CouponBook.objects.values_list('id', flat=True))
+        # 같은 유저가 중복으로 요청하는 경우도 섞어 둡니다.
+        args_list = [(couponbook_id,) for couponbook_id in couponbook_ids + couponbook_ids[:20]]
+
+        started = perf_counter()
+        results = run_concurrently(claim, args_list)
+        elapsed = perf_counter() - started
+        print(f"선착순 발급 벤치마크: 요청 {len(args_list)}건, {elapsed:.2f}초 ({len(args_list) / elapsed:.0f} req/s)")
+
+        self.coupon_template.refresh_from_db()
+        self.assertEqual(results.count(True), self.first_n_persons)
+        self.assertEqual(Coupon.objects.filter(original_template=self.coupon_template).count(), self.first_n_persons)
+        self.assertEqual(self.coupon_template.issued_count, self.first_n_persons)
+
+    @print_success_message("쿠폰 삭제 시 선착순 자리가 되돌려지는지 테스트")
+    def test_release_slot_on_coupon_delete(self):
+        """
+        발급된 쿠폰이 삭제되면 선착순 자리가 하나 비어서 다른 유저가 발급받을 수 있는지 테스트하는 테스트 메소드입니다.
+        """
+
+        self.coupon_template.first_n_persons = 1
+        self.coupon_template.save()
+
+        couponbook1, couponbook2 = CouponBook.objects.all()[:2]
+        coupon = issue_coupon(couponbook1, self.coupon_template)
+        with self.assertRaises(CouponIssueError):
+            issue_coupon(couponbook2, self.coupon_template)
+
+        coupon.delete()
+        issue_coupon(couponbook2, self.coupon_template)
+
+        self.coupon_template.refresh_from_db()
+        self.assertEqual(self.coupon_template.issued_count, 1)
+
+
+class StampAccrualConcurrencyTestCase(TransactionTestCase):
+    """
+    한 쿠폰에 스탬프 적립 요청이 동시에 몰렸을 때, 리워드 개수를 넘겨서 적립되지 않는지 테스트하는 테스트 케이스입니다.
+    """
+
+    amount = 5
+
+    def setUp(self):
+        # 법정동 주소 생성
+        legal_district_dict = {
+            'code_in_law': '1123011000',
+            'province': '서울특별시',
+            'city': '동대문구',
+            'district': '이문동',
+        }
+        legal_district = LegalDistrict.objects.create(**legal_district_dict)
+
+        # 가게 생성
+        place_dict = {
+            'name': '한국외대 서울캠퍼스',
+            'address_district': legal_district,
+            'address_rest': '1234',
+            'image_url': 'aaa.jpg',
+            'opens_at': now().time(),
+            'closes_at': now().time(),
+            'tags': '대학교',
+            'last_order': now().time(),
+            'tel': '02-xxxx-xxxx',
+            'owner': None,
+        }
+        place = Place.objects.create(**place_dict)
+
+        # 쿠폰 템플릿, 리워드 정보 생성
+        coupon_template = CouponTemplate.objects.create(first_n_persons=10, is_on=True, place=place)
+        RewardsInfo.objects.create(coupon_template=coupon_template, amount=self.amount, reward='대학원 무료')
+
+        # 유저, 쿠폰 생성
+        self.user = User.objects.create(username='test', password='1234')
+        self.coupon = issue_coupon(CouponBook.objects.get(user=self.user), coupon_template)
+
+        return super().setUp()
+
+    def try_accrue(self, receipt_number: str) -> bool:
+        try:
+            accrue_stamp(self.coupon.id, receipt_number, self.user)
+            return True
+        except StampAccrualError:
+            return False
+
+    @print_success_message("동시에 몰린 스탬프 적립 요청 중 리워드 개수만큼만 적립되는지 테스트")
+    def test_concurrent_stamp_accrual(self):
+        """
+        서로 다른 영수증으로 여러 스레드에서 동시에 적립을 시도했을 때, 정확히 리워드 개수만큼만 스탬프가 적립되는지 테스트하는 테스트 메소드입니다.
+        """
+
+        receipt_numbers = [f'{i:08d}' for i in range(40)]
+        for receipt_number in receipt_numbers:
+            Receipt.objects.create(receipt_number=receipt_number)
+
+        results = run_concurrently(self.try_accrue, [(n,) for n in receipt_numbers])
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(results.count(True), self.amount)
+        self.assertEqual(Stamp.objects.filter(coupon=self.coupon).count(), self.amount)
+        self.assertEqual(self.coupon.stamp_count, self.amount)
+
+    @print_success_message("같은 영수증으로 동시에 적립 시 한 번만 적립되는지 테스트")
+    def test_concurrent_same_receipt(self):
+        """
+        같은 영수증 번호로 여러 스레드에서 동시에 적립을 시도했을 때, 스탬프가 하나만 적립되는지 테스트하는 테스트 메소드입니다.
+        """
+
+        Receipt.objects.create(receipt_number='00000001')
+
+        results = run_concurrently(self.try_accrue, [('00000001',)] * 10)
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(self.coupon.stamp_count, 1)
+
+    @print_success_message("스탬프 적립 1건당 쿼리 수 벤치마크")
+    def test_queries_per_stamp(self):
+        """
+        스탬프 적립 1건에 실행되는 쿼리 수와 소요 시간을 측정합니다.
+
+        쿠폰 잠금 조회, 영수증 확인, 스탬프 INSERT, stamp_count UPDATE 4개와
+        유저 통계 스냅샷 잠금 조회, UPDATE 2개를 합해 6개여야 합니다.
+        """
+
+        receipt_numbers = [f'{i:08d}' for i in range(self.amount)]
+        for receipt_number in receipt_numbers:
+            Receipt.objects.create(receipt_number=receipt_number)
+        UserStatisticsSnapshot.build()
+
+        started = perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            for receipt_number in receipt_numbers:
+                accrue_stamp(self.coupon.id, receipt_number, self.user)
+        elapsed = perf_counter() - started
+
+        # 트랜잭션 제어문(BEGIN, COMMIT 등)은 DB마다 다르게 잡히므로 제외하고 셉니다.
+        queries = [q for q in ctx.captured_queries
+                   if q['sql'].split()[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE')]
+        queries_per_stamp = len(queries) / self.amount
+        print(f"스탬프 적립 벤치마크: 적립 {self.amount}건, 건당 쿼리 {queries_per_stamp:.1f}개, "
+              f"건당 {elapsed / self.amount * 1000:.2f}ms")
+        self.assertEqual(queries_per_stamp, 6)
+
+
+class AIOffloadLoadTestCase(TransactionTestCase):
+    """
+    느린 AI 응답이 몰렸을 때 동시 AI 호출 수와 응답 시간이 제한되고, 다른 API는 계속 응답하는지 테스트하는 테스트 케이스입니다. (부하 테스트 겸용)
+
+    지연 시간을 조절할 수 있는 스텁 LLM 서버(StubLLMServer)를 띄워서 테스트합니다.
+    """
+
+    n_users = 8
+
+    def setUp(self):
+        self.server = StubLLMServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        for i in range(self.n_users):
+            User.objects.create(username=f'test{i}', password='1234')
+
+        return super().setUp()
+
+    def post_chat(self, user_id: int) -> tuple[int, float]:
+        """
+        챗봇에 질문하고 (응답 상태 코드, 걸린 시간)을 반환합니다.
+        """
+        client = APIClient()
+        client.force_authenticate(user=User.objects.get(id=user_id))
+        started = perf_counter()
+        response = client.post('/couponbook/chat/', {'message': '안녕'}, format='json')
+        return response.status_code, perf_counter() - started
+
+    @override_settings(AI_MAX_CONCURRENCY=2, AI_QUEUE_TIMEOUT=0, AI_CALL_TIMEOUT=5)
+    @print_success_message("느린 AI 응답이 몰릴 때 동시 호출 수 제한 부하 테스트")
+    def test_concurrency_limit_under_slow_llm(self):
+        """
+        느린 AI 호출이 동시에 몰려도 동시에 진행되는 호출은 AI_MAX_CONCURRENCY개 이하이고,
+        나머지는 기다리지 않고 503으로 거절되며, 그동안 쿠폰 템플릿 조회는 바로 응답하는지 테스트합니다.
+        """
+
+        self.server.latency = 1
+        user_ids = list(User.objects.values_list('id', flat=True))
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(run_concurrently, self.post_chat, [(user_id,) for user_id in user_ids])
+            sleep(0.2)
+            started = perf_counter()
+            response = APIClient().get('/couponbook/coupon-templates/')
+            catalogue_elapsed = perf_counter() - started
+            results = future.result()
+
+        statuses = [status_code for status_code, _ in results]
+        succeeded = [elapsed for status_code, elapsed in results if status_code == 200]
+        rejected = [elapsed for status_code, elapsed in results if status_code == 503]
+        print(f"AI 부하 테스트: 요청 {len(results)}건, 성공 {statuses.count(200)}건, 거절 {len(rejected)}건, "
+              f"최대 동시 호출 {self.server.max_in_flight}개, 거절 응답 최대 {max(rejected, default=0) * 1000:.0f}ms, "
+              f"AI 호출 중 쿠폰 템플릿 조회 {catalogue_elapsed * 1000:.0f}ms")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(catalogue_elapsed, self.server.latency)
+        self.assertEqual(set(statuses) - {200, 503}, set())
+        self.assertGreaterEqual(len(succeeded), 1)
+        self.assertGreaterEqual(len(rejected), 1)
+        self.assertLessEqual(self.server.max_in_flight, 2)
+        # 거절된 요청은 AI 응답을 기다리지 않음
+        self.assertLess(max(rejected), min(succeeded))
+
+    @override_settings(AI_MAX_CONCURRENCY=2, AI_QUEUE_TIMEOUT=0, AI_CALL_TIMEOUT=0.3)
+    @print_success_message("AI 응답 시간 제한 테스트")
+    def test_call_timeout(self):
+        """
+        AI 응답이 AI_CALL_TIMEOUT보다 늦으면 기다리지 않고 504로 응답하는지 테스트합니다.
+        """
+
+        self.server.latency = 2
+        status_code, elapsed = self.post_chat(User.objects.first().id)
+        self.assertEqual(status_code, 504)
+        self.assertLess(elapsed, 1)
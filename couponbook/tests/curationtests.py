@@ -1,6 +1,12 @@
-from accounts.models import User
+from decimal import Decimal
+from json import dumps
+from unittest.mock import MagicMock, patch
+
+from accounts.models import FavoriteLocation, User
 from couponbook.curation.utils import AICurator, UserStatistics
 from couponbook.models import *
+from django.core.cache import cache
+from django.test import override_settings
 from django.utils.timezone import now
 from rest_framework.test import APITestCase
 
@@ -153,3 +159,280 @@ class CuratorTestCase(APITestCase):
         self.client.post('/couponbook/couponbooks/1/coupons/', {'original_template': 1})
         r = self.client.get('/couponbook/own-couponbook/curation/')
         self.assertEqual(len(r.data), 0, "이미 보유하고 있는 쿠폰 템플릿이 추천되어 버렸습니다...")
+
+
+class UserStatisticsSnapshotTestCase(APITestCase):
+    """
+    유저 통계 스냅샷이 쿠폰 발급, 스탬프 적립 시 갱신되고, 유저 통계를 일정한 쿼리 수로 만드는지 테스트하는 테스트 케이스입니다.
+    """
+
+    def setUp(self):
+        legal_district = LegalDistrict.objects.create(
+            code_in_law='1123011000', province='서울특별시', city='동대문구', district='이문동'
+        )
+
+        self.coupon_templates = []
+        for i in range(3):
+            place_dict = {
+                'name': f'가게{i}',
+                'address_district': legal_district,
+                'address_rest': f'{i}',
+                'image_url': 'aaa.jpg',
+                'opens_at': now().time(),
+                'closes_at': now().time(),
+                'tags': '카페',
+                'last_order': now().time(),
+                'tel': '02-xxxx-xxxx',
+                'owner': None,
+            }
+            place = Place.objects.create(**place_dict)
+            coupon_template = CouponTemplate.objects.create(first_n_persons=10, is_on=True, place=place)
+            RewardsInfo.objects.create(coupon_template=coupon_template, amount=5, reward='아메리카노 1잔 무료')
+            self.coupon_templates.append(coupon_template)
+
+        for i in range(6):
+            Receipt.objects.create(receipt_number=f'{i:08d}')
+
+        self.user = User.objects.create(username='test', password='1234')
+        self.client.force_authenticate(user=self.user)
+
+        return super().setUp()
+
+    @print_success_message("유저 통계 스냅샷 갱신 및 쿼리 수 테스트")
+    def test_statistics_snapshot(self):
+        """
+        쿠폰 발급, 스탬프 적립, 쿠폰 삭제가 스냅샷에 반영되어 새로 만든 스냅샷과 같은 유저 통계가 나오고,
+        보유한 쿠폰 수와 관계없이 2번의 쿼리로 유저 통계를 만드는지 테스트하는 테스트 메소드입니다.
+        """
+
+        statistics = UserStatistics(user=self.user)
+        # 1. 처음 조회할 때 스냅샷 생성
+        self.assertEqual(statistics.make_history(), [])
+
+        # 2. 쿠폰 발급, 스탬프 적립, 쿠폰 삭제
+        coupon_ids = []
+        for coupon_template in self.coupon_templates:
+            r = self.client.post(f'/couponbook/couponbooks/{self.user.couponbook.id}/coupons/',
+                                 {'original_template': coupon_template.id})
+            self.assertEqual(r.status_code, 201)
+            coupon_ids.append(Coupon.objects.latest('id').id)
+        for i, coupon_id in enumerate([coupon_ids[0]] * 3 + [coupon_ids[1]] * 2 + [coupon_ids[2]]):
+            r = self.client.post(f'/couponbook/coupons/{coupon_id}/stamps/', {'receipt': f'{i:08d}'})
+            self.assertEqual(r.status_code, 201)
+        Coupon.objects.get(id=coupon_ids[2]).delete()
+
+        # 3. 갱신된 스냅샷의 유저 통계
+        with self.assertNumQueries(2):
+            history = statistics.make_history()
+        self.assertEqual([coupon['id'] for coupon in history], coupon_ids[:2])
+        self.assertEqual([coupon['data']['current_stamps'] for coupon in history], [3, 2])
+        self.assertEqual(history[0]['data']['stamp_history'][-1]['count'], 3)
+        self.assertEqual(history[0]['data']['place_info']['name'], '가게0')
+        self.assertEqual(history[0]['data']['max_stamps'], 5)
+
+        # 4. 새로 만든 스냅샷과 같은지 확인
+        UserStatisticsSnapshot.build()
+        self.assertEqual(statistics.make_history(), history)
+
+
+class LocalRecommenderTestCase(APITestCase):
+    """
+    로컬 추천 엔진이 유저의 취향, 지역, 남은 선착순 자리, 리워드 조건을 반영해서 추천하는지 테스트하는 테스트 케이스입니다.
+    """
+
+    def setUp(self):
+        legal_districts = [
+            LegalDistrict.objects.create(code_in_law='1123011000', province='서울특별시', city='동대문구', district='이문동'),
+            LegalDistrict.objects.create(code_in_law='1123010900', province='서울특별시', city='동대문구', district='휘경동'),
+            LegalDistrict.objects.create(code_in_law='1114011100', province='서울특별시', city='중구', district='소공동'),
+        ]
+
+        # (가게 이름, 법정동, 태그, 위도, 경도, 선착순 인원, 리워드 스탬프 수)
+        places = [
+            ('단골카페', legal_districts[0], '카페,디저트', '37.5970', '127.0590', 0, 5),
+            ('이문동카페', legal_districts[0], '카페', '37.5975', '127.0595', 10, 5),
+            ('휘경동카페', legal_districts[1], '카페', '37.5890', '127.0620', 10, 10),
+            ('휘경동분식', legal_districts[1], '분식', '37.5895', '127.0625', 10, 5),
+            ('소공동카페', legal_districts[2], '카페', '37.5640', '126.9790', 10, 5),
+        ]
+        self.coupon_templates = {}
+        for name, legal_district, tags, lat, lng, first_n_persons, amount in places:
+            place_dict = {
+                'name': name,
+                'address_district': legal_district,
+                'address_rest': '1',
+                'image_url': 'aaa.jpg',
+                'opens_at': now().time(),
+                'closes_at': now().time(),
+                'tags': tags,
+                'last_order': now().time(),
+                'tel': '02-xxxx-xxxx',
+                'owner': None,
+            }
+            with patch('couponbook.models.get_place_latlng', return_value=(Decimal(lat), Decimal(lng))):
+                place = Place.objects.create(**place_dict)
+            coupon_template = CouponTemplate.objects.create(first_n_persons=first_n_persons, is_on=True, place=place)
+            RewardsInfo.objects.create(coupon_template=coupon_template, amount=amount, reward='아메리카노 1잔 무료')
+            self.coupon_templates[name] = coupon_template
+
+        # 유저는 이문동의 카페 쿠폰을 모으고 있고, 휘경동을 자주 감
+        self.user = User.objects.create(username='test', password='1234')
+        Coupon.objects.create(couponbook=self.user.couponbook, original_template=self.coupon_templates['단골카페'])
+        FavoriteLocation.objects.create(user=self.user, province='서울특별시', city='동대문구', district='휘경동')
+        UserStatisticsSnapshot.build()
+
+        return super().setUp()
+
+    @print_success_message("로컬 추천 엔진 추천 순서 테스트")
+    def test_local_recommendation(self):
+        """
+        같은 태그, 가까운 지역의 쿠폰 템플릿이 먼저 추천되고, 결과가 항상 같은지 테스트하는 테스트 메소드입니다.
+        """
+
+        candidates = CouponTemplate.objects.exclude(coupons__couponbook__user=self.user)
+        statistics = UserStatistics(user=self.user)
+        curator = AICurator(llm_rerank=False)
+
+        # 프로필(3번) + 후보 점수 계산(1번)
+        with self.assertNumQueries(4):
+            result = curator.curate(statistics, candidates)
+
+        names = {t.id: name for name, t in self.coupon_templates.items()}
+        self.assertEqual([names[i] for i in result], ['이문동카페', '휘경동카페', '휘경동분식'])
+        self.assertEqual(curator.curate(statistics, candidates, n=4), result + [self.coupon_templates['소공동카페'].id])
+
+        # 선착순 자리가 모두 찬 쿠폰 템플릿은 뒤로 밀림
+        CouponTemplate.objects.filter(id=self.coupon_templates['이문동카페'].id).update(issued_count=10)
+        self.assertEqual([names[i] for i in curator.curate(statistics, candidates)],
+                         ['휘경동카페', '이문동카페', '휘경동분식'])
+
+    @print_success_message("OpenAI 재정렬 프롬프트 크기 제한 테스트")
+    def test_rerank_prompt_budget(self):
+        """
+        OpenAI에 넘기는 입력이 열 단위로 압축되고, 토큰 예산을 넘으면 순위가 낮은 후보부터 빠지는지 테스트하는 테스트 메소드입니다.
+        """
+
+        candidates = CouponTemplate.objects.exclude(coupons__couponbook__user=self.user)
+        statistics = UserStatistics(user=self.user)
+        names = {t.id: name for name, t in self.coupon_templates.items()}
+        curator = AICurator(openai_api_key='test', llm_rerank=True)
+        curator.client = MagicMock()
+        curator.client.chat.completions.create.return_value.choices[0].message.content = dumps(
+            {"coupon_template_ids": [self.coupon_templates['휘경동분식'].id]})
+
+        with override_settings(CURATION_PROMPT_TOKEN_BUDGET=10000):
+            result = curator.curate(statistics, candidates, n=2)
+        self.assertEqual([names[i] for i in result], ['휘경동분식', '이문동카페'])
+        self.assertEqual(curator.prompt_metrics['candidates'], 4)
+        self.assertEqual(curator.prompt_metrics['history'], 1)
+        user_message = curator.client.chat.completions.create.call_args.kwargs['messages'][1]['content']
+        self.assertIn('"columns":["id","place","district","tags","reward","reward_stamps","remaining"]', user_message)
+
+        # 예산이 부족하면 후보를 n개까지 줄이고, 그다음 이용 내역을 뺌
+        with override_settings(CURATION_PROMPT_TOKEN_BUDGET=1):
+            curator.curate(statistics, candidates, n=2)
+        self.assertEqual(curator.prompt_metrics['candidates'], 2)
+        self.assertEqual(curator.prompt_metrics['dropped_candidates'], 2)
+        self.assertEqual(curator.prompt_metrics['dropped_history'], 1)
+
+        with override_settings(CURATION_PROMPT_TOKEN_BUDGET=165):
+            curator.curate(statistics, candidates, n=2)
+        self.assertLessEqual(curator.prompt_metrics['estimated_tokens'], 165)
+        self.assertEqual(curator.prompt_metrics['dropped_candidates'], 1)
+        self.assertEqual(curator.prompt_metrics['dropped_history'], 0)
+
+
+@override_settings(CURATION_REFRESH_IN_BACKGROUND=False, VERSIONED_CACHE=True)
+class CurationCacheTestCase(APITestCase):
+    """
+    유저별 큐레이션 결과 캐시가 유저의 쿠폰 변경, 추천 후보 변경에 맞게 갱신되는지 테스트하는 테스트 케이스입니다.
+    """
+
+    def setUp(self):
+        cache.clear()
+        legal_district = LegalDistrict.objects.create(
+            code_in_law='1123011000', province='서울특별시', city='동대문구', district='이문동')
+
+        self.coupon_templates = []
+        for i in range(4):
+            place_dict = {
+                'name': f'가게{i}',
+                'address_district': legal_district,
+                'address_rest': str(i),
+                'image_url': 'aaa.jpg',
+                'opens_at': now().time(),
+                'closes_at': now().time(),
+                'tags': '카페',
+                'last_order': now().time(),
+                'tel': '02-xxxx-xxxx',
+                'owner': None,
+            }
+            with patch('couponbook.models.get_place_latlng', return_value=(Decimal('37.5970'), Decimal('127.0590'))):
+                place = Place.objects.create(**place_dict)
+            coupon_template = CouponTemplate.objects.create(is_on=True, place=place)
+            RewardsInfo.objects.create(coupon_template=coupon_template, amount=5, reward='아메리카노 1잔 무료')
+            self.coupon_templates.append(coupon_template)
+
+        self.user = User.objects.create(username='test', password='1234')
+        self.client.force_authenticate(user=self.user)
+
+        return super().setUp()
+
+    def get_curated_ids(self) -> list[int]:
+        response = self.client.get('/couponbook/own-couponbook/curation/')
+        self.assertEqual(response.status_code, 200)
+        return [coupon_template['id'] for coupon_template in response.data]
+
+    @print_success_message("큐레이션 결과 캐시 갱신 테스트")
+    def test_curation_cache(self):
+        """
+        같은 유저의 반복 조회는 캐시된 결과를 쓰고, 쿠폰이 발급되면 바로, 추천 후보가 바뀌면 다음 조회부터 새 결과를 쓰는지 테스트합니다.
+        """
+
+        with patch.object(AICurator, 'curate', autospec=True, side_effect=AICurator.curate) as curate:
+            first = self.get_curated_ids()
+            self.assertEqual(len(first), 3)
+            self.assertEqual(self.get_curated_ids(), first)
+            self.assertEqual(curate.call_count, 1, "캐시된 큐레이션 결과를 쓰지 않았습니다.")
+
+            # 추천된 쿠폰 템플릿의 쿠폰을 발급받으면 바로 다시 큐레이션
+            owned = CouponTemplate.objects.get(id=first[0])
+            Coupon.objects.create(couponbook=self.user.couponbook, original_template=owned)
+            second = self.get_curated_ids()
+            self.assertEqual(curate.call_count, 2)
+            self.assertNotIn(owned.id, second)
+
+            # 추천 후보가 바뀌면 이전 결과로 응답하고(보유하지 않은 것만) 새로 큐레이션
+            hidden = CouponTemplate.objects.get(id=second[0])
+            hidden.is_on = False
+            hidden.save()
+            self.assertEqual(self.get_curated_ids(), second[1:])
+            self.assertEqual(curate.call_count, 3)
+            self.assertNotIn(hidden.id, self.get_curated_ids())
+            self.assertEqual(curate.call_count, 3)
+
+            # 유효 기간이 지나면 다시 큐레이션
+            with override_settings(CURATION_CACHE_TTL=0):
+                self.get_curated_ids()
+            self.assertEqual(curate.call_count, 4)
+
+    @print_success_message("큐레이션 결과 추천 순위 유지 테스트")
+    def test_curation_keeps_ranking(self):
+        """
+        추천 목록이 등록순이 아니라 큐레이션 결과의 추천 순위대로 응답되는지 테스트합니다.
+        """
+
+        ranking = [self.coupon_templates[1].id, self.coupon_templates[2].id, self.coupon_templates[0].id]
+        with patch.object(AICurator, 'curate', return_value=ranking):
+            self.assertEqual(self.get_curated_ids(), ranking)
+
+    @print_success_message("버전 번호 캐시를 쓰지 않으면 큐레이션 결과를 캐시하지 않는지 테스트")
+    def test_no_curation_cache_without_versioned_cache(self):
+        """
+        settings.VERSIONED_CACHE가 꺼져 있으면(워커마다 따로인 캐시) 조회할 때마다 큐레이션하는지 테스트합니다.
+        """
+
+        with patch.object(AICurator, 'curate', autospec=True, side_effect=AICurator.curate) as curate, \
+                override_settings(VERSIONED_CACHE=False):
+            self.assertEqual(self.get_curated_ids(), self.get_curated_ids())
+        self.assertEqual(curate.call_count, 2)
@@ -0,0 +1,146 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter, sleep
+
+from couponbook.latlng.models import (CircuitBreaker, CircuitOpenError,
+                                      KakaoMapAPIClient, KakaoMapAPIError,
+                                      build_session, set_metrics_hook)
+from django.test import SimpleTestCase
+
+from .decorators import print_success_message
+
+
+class StubKakaoMapHandler(BaseHTTPRequestHandler):
+    """
+    카카오맵 키워드 검색 API를 흉내 내는 로컬 스텁 서버의 핸들러입니다.
+
+    서버의 responses 목록에서 (상태 코드, 지연 시간)을 하나씩 꺼내 응답하고, 목록이 비면 200으로 응답합니다.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.client_ports.append(self.client_address[1])
+        status, delay = self.server.responses.pop(0) if self.server.responses else (200, 0)
+        sleep(delay)
+
+        documents = [{'place_name': '서울역', 'y': '37.554648', 'x': '126.970607'}] if status == 200 else []
+        body = json.dumps({'documents': documents}).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 타임아웃으로 먼저 연결을 끊은 경우
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class KakaoMapAPIClientTestCase(SimpleTestCase):
+    """
+    로컬 스텁 서버를 상대로 카카오맵 API 클라이언트의 커넥션 재사용, 타임아웃, 재시도, 서킷 브레이커를 테스트하는 테스트 케이스입니다.
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubKakaoMapHandler)
+        self.server.daemon_threads = True
+        self.server.responses = []
+        self.server.client_ports = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.metrics = []
+        set_metrics_hook(lambda **metric: self.metrics.append(metric))
+
+        self.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        self.client = KakaoMapAPIClient('test-key',
+                                        base_url=f'http://127.0.0.1:{self.server.server_port}',
+                                        session=build_session(),
+                                        circuit_breaker=self.circuit_breaker)
+        self.client.backoff = 0.01
+
+        return super().setUp()
+
+    def tearDown(self):
+        set_metrics_hook(None)
+        self.client.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        return super().tearDown()
+
+    @print_success_message("카카오맵 API 클라이언트의 커넥션 재사용 테스트")
+    def test_keep_alive(self):
+        """
+        여러 번 검색해도 하나의 커넥션을 재사용하는지, 검색 결과와 메트릭이 제대로 나오는지 테스트하는 테스트 메소드입니다.
+        """
+
+        for _ in range(3):
+            place = self.client.find_place_by_keyword('서울특별시 중구 소공동 서울역')
+            self.assertEqual(place.place_name, '서울역')
+
+        self.assertEqual(len(set(self.server.client_ports)), 1, "커넥션이 재사용되지 않았습니다!")
+        self.assertEqual([metric['success'] for metric in self.metrics], [True] * 3)
+
+    @print_success_message("카카오맵 API 일시적 오류 시 재시도 테스트")
+    def test_retry_on_server_error(self):
+        """
+        5xx 응답은 재시도해서 결국 성공하고, 4xx 응답은 재시도하지 않는지 테스트하는 테스트 메소드입니다.
+        """
+
+        self.server.responses = [(503, 0), (500, 0)]
+        self.assertEqual(self.client.find_place_by_keyword('서울역').place_name, '서울역')
+        self.assertEqual(self.metrics[-1]['attempts'], 3)
+
+        self.server.responses = [(401, 0)]
+        with self.assertRaises(KakaoMapAPIError):
+            self.client.find_place_by_keyword('서울역')
+        self.assertEqual(self.metrics[-1]['attempts'], 1)
+        self.assertEqual(self.metrics[-1]['status_code'], 401)
+
+    @print_success_message("카카오맵 API 응답 지연 시 타임아웃 테스트")
+    def test_timeout(self):
+        """
+        응답이 읽기 타임아웃보다 늦으면 재시도 후 포기하고, 워커를 오래 붙잡지 않는지 테스트하는 테스트 메소드입니다.
+        """
+
+        self.client.timeout = (1, 0.1)
+        self.server.responses = [(200, 0.5)] * 3
+
+        started = perf_counter()
+        with self.assertRaises(KakaoMapAPIError):
+            self.client.find_place_by_keyword('서울역')
+        elapsed = perf_counter() - started
+
+        self.assertLess(elapsed, 1.0, "타임아웃이 동작하지 않았습니다!")
+        self.assertEqual(self.metrics[-1], {'elapsed': self.metrics[-1]['elapsed'], 'success': False,
+                                            'status_code': None, 'attempts': 3})
+
+    @print_success_message("카카오맵 API 연속 실패 시 서킷 브레이커 테스트")
+    def test_circuit_breaker(self):
+        """
+        연속으로 실패하면 서킷 브레이커가 열려서 스텁 서버에 요청을 보내지 않고,
+        reset_timeout이 지나면 시험 호출로 다시 닫히는지 테스트하는 테스트 메소드입니다.
+        """
+
+        self.client.max_retries = 0
+        self.server.responses = [(500, 0)] * 2
+
+        # 1. 연속 2번 실패하면 열림
+        for _ in range(2):
+            with self.assertRaises(KakaoMapAPIError):
+                self.client.find_place_by_keyword('서울역')
+        self.assertEqual(self.circuit_breaker.state, 'open')
+
+        # 2. 열린 동안에는 요청을 보내지 않음
+        n_requests = len(self.server.client_ports)
+        with self.assertRaises(CircuitOpenError):
+            self.client.find_place_by_keyword('서울역')
+        self.assertEqual(len(self.server.client_ports), n_requests)
+
+        # 3. reset_timeout이 지나면 시험 호출이 성공하고 닫힘
+        sleep(0.25)
+        self.assertEqual(self.client.find_place_by_keyword('서울역').place_name, '서울역')
+        self.assertEqual(self.circuit_breaker.state, 'closed')
@@ -1,6 +1,20 @@
+from datetime import time
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
 from accounts.models import User
+from couponbook.caching import (CATALOGUE_VERSION_KEY,
+                                CURATION_CANDIDATES_VERSION_KEY,
+                                get_coupon_template_version_key,
+                                get_couponbook_version_key,
+                                get_user_context_version_key, get_versions)
 from couponbook.latlng.utils import KakaoMapAPIClient
 from couponbook.models import *
+from django.conf import settings
+from django.core.management import call_command
 from django.test import TestCase
 from django.utils.timezone import now, timedelta
 
@@ -130,6 +144,70 @@ class CouponTestCase(TestCase):
         # 5. 영수증 - 스탬프 연동 해제 테스트
         self.assertEqual(hasattr(receipt, 'stamp'), False, "영수증과 연결된 스탬프가 남아있음!")
 
+    @print_success_message("스탬프 적립/삭제 시 쿠폰의 stamp_count 갱신 테스트")
+    def test_coupon_stamp_count(self):
+        """
+        스탬프를 적립하거나 삭제할 때 쿠폰의 stamp_count가 함께 갱신되는지 테스트하는 테스트 메소드입니다.
+        """
+
+        user, couponbook, original_template = self.test_context.values()
+        coupon = Coupon.objects.create(couponbook=couponbook, original_template=original_template)
+
+        # 1. 스탬프 3개 적립
+        stamps = []
+        for i in range(3):
+            receipt = Receipt.objects.create(receipt_number=f'00000000{i}')
+            stamps.append(Stamp.objects.create(coupon=coupon, receipt=receipt, customer=user))
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.stamp_count, 3)
+
+        # 2. 같은 영수증으로 다시 적립하면 카운터가 늘어나지 않음
+        Stamp.objects.create(coupon=coupon, receipt=stamps[0].receipt, customer=user)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.stamp_count, 3)
+
+        # 3. 스탬프 하나 삭제
+        stamps[0].delete()
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.stamp_count, 2)
+
+    @print_success_message("어긋난 카운터 보정 커맨드 테스트")
+    def test_reconcile_counters(self):
+        """
+        stamp_count, issued_count가 실제 개수와 어긋났을 때 reconcile_counters 커맨드가 이를 바로잡는지 테스트하는 테스트 메소드입니다.
+        """
+
+        user, couponbook, original_template = self.test_context.values()
+        coupon = Coupon.objects.create(couponbook=couponbook, original_template=original_template)
+        receipt = Receipt.objects.create(receipt_number='000000001')
+        Stamp.objects.create(coupon=coupon, receipt=receipt, customer=user)
+
+        # 1. 카운터를 일부러 어긋나게 만듦
+        Coupon.objects.filter(id=coupon.id).update(stamp_count=7)
+        CouponTemplate.objects.filter(id=original_template.id).update(issued_count=0)
+
+        # 2. dry-run은 값을 고치지 않음
+        call_command('reconcile_counters', '--dry-run', stdout=StringIO())
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.stamp_count, 7)
+
+        # 3. 실제 실행 시 실제 개수로 보정되고, 관련된 캐시 버전 번호가 올라감
+        version_keys = [
+            get_couponbook_version_key(couponbook.id),
+            get_user_context_version_key(user.id),
+            get_coupon_template_version_key(original_template.id),
+            CATALOGUE_VERSION_KEY,
+            CURATION_CANDIDATES_VERSION_KEY,
+        ]
+        versions = get_versions(version_keys)
+        call_command('reconcile_counters', stdout=StringIO())
+        coupon.refresh_from_db()
+        original_template.refresh_from_db()
+        self.assertEqual(coupon.stamp_count, 1)
+        self.assertEqual(original_template.issued_count, 1)
+        for key, old, new in zip(version_keys, versions, get_versions(version_keys)):
+            self.assertGreater(new, old, key)
+
 class PlaceTestCase(TestCase):
     def setUp(self):
         legal_district_1 = {
@@ -238,3 +316,162 @@ class PlaceTestCase(TestCase):
 
         # place의 예상되는 위도, 경도: place의 address_district 정보를 추가로 활용해서 검색된 값
         self.assertEqual((lat, lng), (t_lat, t_lng), f"예상된 값과 위도와 경도가 다름: ({(t_lat, t_lng)})")
+
+    @print_success_message("가게 이름과 주소가 그대로면 위도, 경도를 다시 계산하지 않는지 테스트")
+    def test_place_resave_skips_geocoding(self):
+        """
+        가게를 다시 저장할 때 이름과 법정동이 바뀌지 않았다면 카카오맵 검색을 생략하는지,
+        같은 가게를 새로 등록할 때는 캐시된 결과를 사용하는지 테스트하는 테스트 메소드입니다.
+        """
+
+        legal_district = LegalDistrict.objects.get(code_in_law='1114011100')
+        place_dict = {
+            'name': '서울역',
+            'address_district': legal_district,
+            'address_rest': '1234',
+            'image_url': 'aaa.jpg',
+            'opens_at': now().time(),
+            'closes_at': now().time(),
+            'tags': '역',
+            'last_order': now().time(),
+            'tel': '02-xxxx-xxxx',
+            'owner': None,
+        }
+
+        latlng = (Decimal('37.554648'), Decimal('126.970607'))
+        with patch('couponbook.models.get_place_latlng', return_value=latlng) as mock_geocode:
+            # 1. 최초 등록 시 한 번 검색
+            place = Place.objects.create(**place_dict)
+            self.assertEqual(mock_geocode.call_count, 1)
+
+            # 2. 이름, 법정동 외의 정보만 바꿔서 저장하면 검색하지 않음
+            place = Place.objects.get(id=place.id)
+            place.tel = '02-0000-0000'
+            place.save()
+            self.assertEqual(mock_geocode.call_count, 1)
+
+            # 3. 같은 가게를 다시 등록하면 캐시된 결과를 사용
+            Place.objects.create(**place_dict)
+            self.assertEqual(mock_geocode.call_count, 1)
+
+            # 4. 이름이 바뀌면 다시 검색
+            place.name = '서울역 2호점'
+            place.save()
+            self.assertEqual(mock_geocode.call_count, 2)
+
+    @print_success_message("검색 결과가 없는 가게의 캐시 유효 기간 테스트")
+    def test_geocode_negative_cache(self):
+        """
+        검색 결과가 없는 키워드도 캐시되어 유효 기간 동안 다시 검색하지 않고, 유효 기간이 지나면 다시 검색하는지 테스트하는 테스트 메소드입니다.
+        """
+
+        keyword = '서울특별시 중구 소공동 없는가게'
+
+        with patch('couponbook.models.get_place_latlng', return_value=None) as mock_geocode:
+            # 1. 검색 결과가 없어도 캐시됨
+            self.assertEqual(GeocodeCache.get_latlng(keyword), None)
+            self.assertEqual(GeocodeCache.get_latlng(f'  {keyword} '), None)
+            self.assertEqual(mock_geocode.call_count, 1)
+
+            # 2. 유효 기간이 지나면 다시 검색
+            expired_at = now() - timedelta(seconds=settings.GEOCODE_NEGATIVE_CACHE_TTL + 1)
+            GeocodeCache.objects.filter(keyword=keyword).update(updated_at=expired_at)
+            GeocodeCache.get_latlng(keyword)
+            self.assertEqual(mock_geocode.call_count, 2)
+
+    @print_success_message("여러 가게의 위도, 경도 동시 검색 테스트")
+    def test_geocode_many(self):
+        """
+        여러 키워드를 한꺼번에 검색할 때 캐시된 키워드는 검색하지 않고, 검색 결과가 캐시에 저장되는지 테스트하는 테스트 메소드입니다.
+        """
+
+        GeocodeCache.objects.create(keyword='서울특별시 중구 소공동 서울역', lat=Decimal('37.5'), lng=Decimal('126.9'))
+        keywords = ['서울특별시 중구 소공동 서울역', '서울특별시 용산구 남영동 가게1', '서울특별시 용산구 남영동 가게2']
+
+        latlng = (Decimal('37.541'), Decimal('126.971'))
+        with patch('couponbook.models.get_place_latlng', return_value=latlng) as mock_geocode:
+            result = GeocodeCache.get_latlng_many(keywords, max_workers=2)
+
+        self.assertEqual(mock_geocode.call_count, 2)
+        self.assertEqual(result['서울특별시 중구 소공동 서울역'], (Decimal('37.5'), Decimal('126.9')))
+        self.assertEqual(result['서울특별시 용산구 남영동 가게1'], latlng)
+        self.assertEqual(len(GeocodeCache.get_cached_latlng_many(keywords)), 3)
+
+    @print_success_message("자정을 넘겨 영업하는 가게의 영업 구간 테스트")
+    def test_place_open_intervals(self):
+        """
+        자정을 넘겨 영업하는 가게의 영업 구간이 일요일 밤 ~ 월요일 새벽까지 제대로 만들어지는지,
+        영업 시간이 바뀌면 영업 구간도 다시 만들어지는지 테스트하는 테스트 메소드입니다.
+        """
+
+        legal_district = LegalDistrict.objects.get(code_in_law='1114011100')
+        place_dict = {
+            'name': '소공동포차',
+            'address_district': legal_district,
+            'address_rest': '12',
+            'image_url': 'aaa.jpg',
+            'opens_at': time(18, 0),
+            'closes_at': time(3, 0),
+            'tags': '술집',
+            'last_order': time(2, 0),
+            'tel': '02-xxxx-xxxx',
+            'owner': None,
+        }
+
+        latlng = (Decimal('37.5636'), Decimal('126.9799'))
+        with patch('couponbook.models.get_place_latlng', return_value=latlng):
+            place = Place.objects.create(**place_dict)
+
+        # 1. 매일 18:00 ~ 다음 날 02:00, 일요일 밤 구간은 [일 18:00, 10080)과 [0, 월 02:00)으로 나뉨
+        self.assertEqual(place.open_intervals.count(), 8)
+        self.assertTrue(place.open_intervals.filter(start_minute=6 * 1440 + 18 * 60, end_minute=7 * 1440).exists())
+        self.assertTrue(place.open_intervals.filter(start_minute=0, end_minute=2 * 60).exists())
+
+        # 2. 화요일 01:00, 월요일 01:00(일요일 밤 영업)에는 영업 중, 화요일 12:00에는 영업 종료
+        tuesday_1am, monday_1am, tuesday_noon = 1440 + 60, 60, 1440 + 12 * 60
+        self.assertTrue(place.is_open_at(tuesday_1am))
+        self.assertTrue(place.is_open_at(monday_1am))
+        self.assertFalse(place.is_open_at(tuesday_noon))
+        self.assertEqual(PlaceOpenInterval.get_open_place_ids([place.id], tuesday_1am), {place.id})
+        self.assertEqual(PlaceOpenInterval.get_open_place_ids([place.id], tuesday_noon), set())
+
+        # 3. 영업 시간이 바뀌면 영업 구간도 다시 만듦
+        place = Place.objects.get(id=place.id)
+        place.opens_at, place.last_order = time(11, 0), time(21, 0)
+        place.save()
+        self.assertEqual(place.open_intervals.count(), 7)
+        self.assertEqual(PlaceOpenInterval.get_open_place_ids([place.id], tuesday_1am), set())
+        self.assertEqual(PlaceOpenInterval.get_open_place_ids([place.id], tuesday_noon), {place.id})
+
+    @print_success_message("대량 등록 후 쿠폰 템플릿 목록, 큐레이션 후보 캐시 버전 번호가 올라가는지 테스트")
+    def test_bulk_load_bumps_cache_versions(self):
+        """
+        load_restaurants.py의 대량 등록 모드는 bulk_create로 시그널 없이 가게를 저장하므로,
+        등록이 끝난 뒤 쿠폰 템플릿 목록과 큐레이션 후보의 캐시 버전 번호를 올리는지 테스트하는 테스트 메소드입니다.
+        """
+
+        from load_restaurants import load_restaurants_bulk
+
+        with TemporaryDirectory() as directory:
+            csv_path = Path(directory) / 'restaurants.csv'
+            csv_path.write_text(
+                'province,city,district,address_rest,name,image_url,opens_at,closes_at,last_order,tel,tags\n'
+                '서울,중구,소공동,1,가게1,,9:00,22:00,21:30,,카페\n'
+                '서울,중구,소공동,2,가게2,,9:00,22:00,21:30,,카페\n',
+                encoding='utf-8',
+            )
+            versions = get_versions([CATALOGUE_VERSION_KEY, CURATION_CANDIDATES_VERSION_KEY])
+
+            # dry-run은 DB에 쓰지 않으므로 버전 번호도 올리지 않음
+            load_restaurants_bulk(csv_path, dry_run=True)
+            self.assertEqual(get_versions([CATALOGUE_VERSION_KEY, CURATION_CANDIDATES_VERSION_KEY]), versions)
+
+            latlng = (Decimal('37.564'), Decimal('126.977'))
+            with patch.object(GeocodeCache, 'get_latlng_many', side_effect=lambda keywords, **kwargs: {
+                keyword: latlng for keyword in keywords
+            }):
+                self.assertEqual(load_restaurants_bulk(csv_path), (2, 0))
+
+        self.assertEqual(Place.objects.filter(name__in=['가게1', '가게2']).count(), 2)
+        self.assertEqual(get_versions([CATALOGUE_VERSION_KEY, CURATION_CANDIDATES_VERSION_KEY]),
+                         [version + 1 for version in versions])
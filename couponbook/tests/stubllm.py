@@ -0,0 +1,123 @@
+# 테스트용 스텁 LLM 서버
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from threading import Lock, Thread
+from time import sleep
+from unittest.mock import patch
+
+from django.test import override_settings
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """
+    OpenAI 채팅 API 흉내를 내는 스텁 서버의 핸들러입니다.
+
+    server.latency초 뒤에 server.tokens를 이어 붙인 답변을 돌려줍니다.
+    요청에 "stream": true가 있으면 토큰을 server.token_delay초 간격으로 하나씩 SSE로 보냅니다.
+    토큰 사용량은 입력 메시지 글자 수와 답변 토큰 수로 흉내 내고, 받은 요청 본문은 server.requests에 남깁니다.
+    """
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            body = loads(self.rfile.read(int(self.headers['Content-Length'])))
+            server.requests.append(body)
+            sleep(server.latency)
+            if body.get('stream'):
+                self.send_stream(body)
+            else:
+                self.send_json(dumps({
+                    'id': 'chatcmpl-stub',
+                    'object': 'chat.completion',
+                    'created': 0,
+                    'model': 'gpt-4o-mini',
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': ''.join(server.tokens)}}],
+                    'usage': self.usage(body),
+                }).encode())
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 먼저 연결을 끊은 경우
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def send_json(self, body: bytes):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def usage(self, body: dict) -> dict:
+        prompt_tokens = sum(len(message['content']) for message in body['messages'])
+        completion_tokens = len(self.server.tokens)
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens}
+
+    def send_stream(self, body: dict):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for i, token in enumerate(self.server.tokens):
+            if i:
+                sleep(self.server.token_delay)
+            chunk = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': 0,
+                'model': 'gpt-4o-mini',
+                'choices': [{'index': 0, 'finish_reason': None, 'delta': {'content': token}}],
+            }
+            self.wfile.write(f'data: {dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+        if (body.get('stream_options') or {}).get('include_usage'):
+            chunk = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': 0,
+                'model': 'gpt-4o-mini',
+                'choices': [],
+                'usage': self.usage(body),
+            }
+            self.wfile.write(f'data: {dumps(chunk)}\n\n'.encode())
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """
+    지연 시간을 조절할 수 있는 스텁 LLM 서버입니다.
+
+    start()하면 OPENAI_API_KEY 환경변수와 settings.OPENAI_BASE_URL을 바꿔서, OpenAI 클라이언트가 이 서버를 호출하게 합니다.
+    """
+
+    def __init__(self, latency: float = 0, tokens: list[str] | None = None, token_delay: float = 0):
+        super().__init__(('127.0.0.1', 0), StubLLMHandler)
+        self.lock = Lock()
+        self.latency = latency
+        self.tokens = tokens or ['안녕! ', '무엇을 ', '도와줄까? ', '😊']
+        self.token_delay = token_delay
+        self.in_flight = 0
+        self.requests = []
+        self.max_in_flight = 0
+        self.env = patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+        self.settings = override_settings(OPENAI_BASE_URL=f'http://127.0.0.1:{self.server_port}/v1')
+
+    def start(self):
+        Thread(target=self.serve_forever, daemon=True).start()
+        self.env.start()
+        self.settings.enable()
+
+    def stop(self):
+        self.settings.disable()
+        self.env.stop()
+        self.shutdown()
+        self.server_close()
@@ -3,7 +3,8 @@ from django.urls import path
 from .views import (ChatAssistantView, CouponBookDetailView,
                     CouponDetailView, CouponListView,
                     CouponTemplateCurationView, CouponTemplateDetailView,
-                    CouponTemplateListView, FavoriteCouponDetailView,
+                    CouponTemplateListView, CouponTemplateNearbyView,
+                    FavoriteCouponDetailView,
                     FavoriteCouponListView, StampListView)
 
 app_name = 'couponbook'
@@ -20,6 +21,7 @@ urlpatterns = [
 
     # 쿠폰 템플릿 관련 엔드포인트입니다.
     path('coupon-templates/', CouponTemplateListView.as_view(), name='coupon-template-list'),
+    path('coupon-templates/nearby/', CouponTemplateNearbyView.as_view(), name='coupon-template-nearby'),
     path('coupon-templates/<int:coupon_template_id>/', CouponTemplateDetailView.as_view(), name='coupon-template-detail'),
     
     # AI 어시스턴트 챗봇
@@ -1,5 +1,11 @@
-from django.db.models import Count, Q
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Q, Subquery, When
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django.utils.timezone import now
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import (OpenApiExample, OpenApiParameter,
@@ -13,15 +19,30 @@ from rest_framework.generics import (CreateAPIView, DestroyAPIView,
                                      RetrieveAPIView, RetrieveDestroyAPIView)
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from .ai_offload import AIBusyError, AITimeoutError
+from .caching import (etag_matches, get_catalogue_cache_key,
+                      get_coupon_template_version_key,
+                      get_couponbook_version_key, get_version, get_versions,
+                      is_versioned_cache_enabled, make_etag,
+                      make_version_etag)
+from .curation.cache import get_curated_ids
 from .curation.utils import AICurator, UserStatistics
 from .chat_assistant import CouponbookAssistant
+from .curation.prompt import estimate_tokens
 from .filters import CouponFilter, CouponTemplateFilter
+from .latlng.utils import (get_bounding_box, get_distance_m,
+                           get_grid_cells_in_box)
 from .models import *
 from .models import CouponTemplate
+from .opening_hours import get_minute_of_week
+from .pagination import (CouponCursorPagination, CouponTemplateCursorPagination,
+                         FavoriteCouponCursorPagination)
 from .permissions import IsMyCoupon, IsMyCouponBook, IsMyCouponForFavoriteAdd
+from .renderers import EventStreamRenderer, format_event
 from .serializers import *
 
 # Create your views here.
@@ -40,6 +61,81 @@ from .serializers import *
 # 공통 속성: serializer_class, authentication_classes, permission_classes
 
 
+class CouponTemplateListMixin:
+    """
+    쿠폰 템플릿 목록을 응답하는 뷰에서 공통으로 사용하는 믹스인입니다.
+
+    응답에 포함될 쿠폰 템플릿들에 대해 보유 여부와 발급된 쿠폰 수, 가게의 영업 중 여부를 한 번에 계산해서
+    시리얼라이저 context로 넘기므로, 쿠폰 템플릿 개수와 관계없이 쿼리 수가 일정합니다.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.annotate(place_is_open=PlaceOpenInterval.open_at('place'))
+        page = self.paginate_queryset(queryset)
+        coupon_templates = list(page if page is not None else queryset)
+
+        context = self.get_serializer_context()
+        context.update(CouponTemplateListSerializer.get_viewer_context(coupon_templates, request.user))
+        context['open_place_ids'] = {template.place_id for template in coupon_templates if template.place_is_open}
+        serializer = self.get_serializer_class()(coupon_templates, many=True, context=context)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+class ConditionalGetMixin:
+    """
+    GET 요청에 대해 응답을 만들기 전에 ETag를 먼저 계산해서, If-None-Match가 일치하면 304로 응답하는 믹스인입니다.
+
+    ETag는 get_etag_parts가 반환하는 버전 번호 등의 값들로 만들므로, 개수 조회 같은 무거운 쿼리는 304일 때 실행되지 않습니다.
+    권한 확인은 get 전에 끝나므로 권한이 없는 요청에는 ETag를 알려주지 않습니다.
+
+    이 믹스인을 쓰는 뷰는 응답 내용을 결정하는 값들(쿠폰북 버전 번호 등)을 반환하는 get_etag_parts(self, request)를 정의해야 합니다.
+    이 값들이 같으면 응답도 같아야 합니다.
+
+    버전 번호를 워커끼리 함께 쓰지 않는 캐시라면(settings.VERSIONED_CACHE가 꺼져 있으면) ETag 없이 평소처럼 응답합니다.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not callable(getattr(cls, 'get_etag_parts', None)):
+            raise TypeError(f"{cls.__name__}에 get_etag_parts(self, request)를 정의해야 합니다.")
+
+    def get(self, request, *args, **kwargs):
+        if not is_versioned_cache_enabled():
+            return super().get(request, *args, **kwargs)
+
+        etag = make_version_etag(type(self).__name__, request.get_full_path(), *self.get_etag_parts(request))
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+def get_coupon_etag_parts(rows) -> list:
+    """
+    조회하는 쿠폰들의 (쿠폰 템플릿 id, 유효 기간, 가게 영업 중 여부) 목록으로 ETag에 넣을 값들을 만듭니다.
+
+    쿠폰 템플릿마다 버전 번호와 함께, 시간에 따라 바뀌는 응답 값(가게 영업 중 여부, 남은 유효 일수, 만료 여부)을 넣습니다.
+    그래서 ETag는 보여주는 쿠폰의 내용이 실제로 바뀔 때만 바뀌고, 시간이 지나는 것만으로는 바뀌지 않습니다.
+    """
+    current = now()
+    rows = sorted(rows, key=lambda row: row[0])
+    versions = get_versions(get_coupon_template_version_key(coupon_template_id) for coupon_template_id, _, _ in rows)
+    return [
+        (coupon_template_id, version, is_open,
+         (valid_until - current).days if valid_until else None, bool(valid_until and valid_until < current))
+        for (coupon_template_id, valid_until, is_open), version in zip(rows, versions)
+    ]
+
+
 # --------------------------------------- 쿠폰북 ---------------------------------------------
 @extend_schema_view(
     get=extend_schema(
@@ -49,9 +145,11 @@ from .serializers import *
         responses=CouponBookDetailResponseSerializer,
     )
 )
-class CouponBookDetailView(RetrieveAPIView):
+class CouponBookDetailView(ConditionalGetMixin, RetrieveAPIView):
     """
     한 쿠폰북을 조회하는 뷰입니다. 로그인된 유저의 유저 id에 해당하는 쿠폰북을 조회합니다.
+
+    쿠폰북 버전 번호로 ETag를 계산하므로, 쿠폰, 스탬프, 즐겨찾기가 바뀌지 않았다면 개수를 다시 세지 않고 304로 응답합니다.
     """
 
     serializer_class = CouponBookDetailResponseSerializer
@@ -60,6 +158,12 @@ class CouponBookDetailView(RetrieveAPIView):
 
     queryset= CouponBook.objects.all()
 
+    def get_queryset(self):
+        """
+        즐겨찾기 쿠폰 수, 쿠폰 수, 스탬프 수를 서브쿼리로 annotate해서 쿠폰북과 함께 쿼리 하나로 가져옵니다.
+        """
+        return CouponBookDetailResponseSerializer.annotate_counts(super().get_queryset(), self.request.user)
+
     def get_object(self):
         """
         로그인된 유저의 유저 id에 해당하는 쿠폰북 인스턴스를 가져옵니다.
@@ -70,6 +174,10 @@ class CouponBookDetailView(RetrieveAPIView):
         obj = get_object_or_404(queryset, user=self.request.user)
         return obj
 
+    def get_etag_parts(self, request) -> list:
+        couponbook_id = CouponBook.objects.filter(user=request.user).values_list('id', flat=True).first()
+        return [couponbook_id, get_version(get_couponbook_version_key(couponbook_id))]
+
 
 # ----------------------------- 쿠폰 ---------------------------------------
 @extend_schema_view(
@@ -90,7 +198,8 @@ class CouponBookDetailView(RetrieveAPIView):
             OpenApiParameter('is_open', bool, OpenApiParameter.QUERY,
                              description='현재 영업중인지 여부입니다. (true / false, 대소문자 구별 없음)'),
             OpenApiParameter('ordering', str, OpenApiParameter.QUERY,
-                             description='정렬 기준입니다. stamp_counts: 스탬프 개수 오름차순 / -stamp_counts: 스탬프 개수 내림차순'),
+                             description='정렬 기준입니다. stamp_counts: 스탬프 개수 오름차순 / -stamp_counts: 스탬프 개수 내림차순 '
+                                         '(스탬프 개수로 정렬하면 cursor 대신 page로 페이지를 나눕니다.)'),
         ]
     ),
     post=extend_schema(
@@ -114,15 +223,24 @@ class CouponListView(ListCreateAPIView):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_class = CouponFilter
     ordering_fields = ['id', 'saved_at', 'stamp_counts']
+    pagination_class = CouponCursorPagination
 
     def get_queryset(self):
         """
         URL의 couponbook_id를 바탕으로 해당 쿠폰북에 속한 쿠폰들을 조회합니다.
+
+        시리얼라이저가 쿠폰마다 쿼리를 날리지 않도록 가게, 법정동, 리워드 정보는 select_related로 한 번에 가져옵니다.
+        스탬프 개수는 쿠폰의 stamp_count 컬럼을 그대로 사용하고, 정렬 파라미터 이름(stamp_counts)만 맞춰 둡니다.
         """
 
         couponbook_id: int = self.kwargs['couponbook_id']
         queryset = Coupon.objects.filter(couponbook_id=couponbook_id)
-        queryset = queryset.annotate(stamp_counts=Count('stamps'))
+        queryset = queryset.select_related(
+            'original_template__place__address_district',
+            'original_template__reward_info',
+        )
+        queryset = queryset.annotate(stamp_counts=F('stamp_count'),
+                                     place_is_open=PlaceOpenInterval.open_at('original_template__place'))
 
         return queryset
     
@@ -130,6 +248,23 @@ class CouponListView(ListCreateAPIView):
         if self.request.method == 'GET':
             return CouponListResponseSerializer
         return CouponCreateRequestSerializer
+
+    def list(self, request, *args, **kwargs):
+        """
+        쿠폰 목록을 조회합니다. 가게의 영업 중 여부는 목록 쿼리에서 함께 계산한 값을 시리얼라이저 context로 넘깁니다.
+        """
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        coupons = list(page if page is not None else queryset)
+
+        context = self.get_serializer_context()
+        context['open_place_ids'] = {coupon.original_template.place_id for coupon in coupons if coupon.place_is_open}
+        serializer = self.get_serializer(coupons, many=True, context=context)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
     
     def create(self, request, *args, **kwargs):
         """
@@ -161,9 +296,12 @@ class CouponListView(ListCreateAPIView):
         responses=CouponDetailResponseSerializer,
     )
 )
-class CouponDetailView(RetrieveDestroyAPIView):
+class CouponDetailView(ConditionalGetMixin, RetrieveDestroyAPIView):
     """
     한 쿠폰에 관련된 뷰입니다. 쿠폰 id에 해당하는 쿠폰을 조회하거나 삭제합니다.
+
+    조회 시 쿠폰이 속한 쿠폰북과 조회하는 유저의 쿠폰북(즐겨찾기 여부)의 버전 번호,
+    쿠폰 템플릿의 버전 번호와 가게 영업 중 여부, 남은 유효 일수로 ETag를 계산합니다. (get_coupon_etag_parts 참고)
     """
 
     serializer_class = CouponDetailResponseSerializer
@@ -179,14 +317,29 @@ class CouponDetailView(RetrieveDestroyAPIView):
     queryset = Coupon.objects.all()
     lookup_url_kwarg = 'coupon_id'
 
+    def get_etag_parts(self, request) -> list:
+        # 쿠폰이 속한 쿠폰북 id, 조회하는 유저의 쿠폰북 id, 쿠폰 템플릿 id와 유효 기간, 가게 영업 중 여부를 쿼리 하나로 가져옵니다.
+        viewer_couponbook_id = Subquery(CouponBook.objects.filter(user=request.user).values('id')[:1])
+        row = Coupon.objects.filter(id=self.kwargs['coupon_id']) \
+            .annotate(place_is_open=PlaceOpenInterval.open_at('original_template__place')) \
+            .values_list('couponbook_id', viewer_couponbook_id,
+                         'original_template_id', 'original_template__valid_until', 'place_is_open').first()
+        if row is None:
+            return []
+        couponbook_id, viewer_couponbook_id, *coupon = row
+        return [
+            *get_versions(get_couponbook_version_key(id) for id in (couponbook_id, viewer_couponbook_id)),
+            *get_coupon_etag_parts([coupon]),
+        ]
+
 @extend_schema_view(
     get=extend_schema(
         tags=["AI_CURATION"],
-        description="현재 유저가 보유한 쿠폰을 바탕으로 쿠폰 큐레이션을 실행하여 추천된 쿠폰들의 목록을 반환합니다.",
+        description="현재 유저가 보유한 쿠폰을 바탕으로 쿠폰 큐레이션을 실행하여 추천된 쿠폰들의 목록을 추천 순위대로 반환합니다.",
         summary="AI 기반 추천 쿠폰 목록 반환",
     )
 )
-class CouponTemplateCurationView(ListAPIView):
+class CouponTemplateCurationView(CouponTemplateListMixin, ListAPIView):
     """
     쿠폰 템플릿 추천과 관련된 뷰입니다.
     """
@@ -194,21 +347,34 @@ class CouponTemplateCurationView(ListAPIView):
     serializer_class = CouponTemplateListSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    # 추천 결과는 몇 개뿐이고 추천 순위대로 보여줘야 하므로, 최근 등록순으로 나누는 페이지네이션을 쓰지 않습니다.
+    pagination_class = None
 
     def get_queryset(self):# -> Any:
         """
-        현재 유저의 쿠폰 컬렉션을 바탕으로 쿠폰 템플릿 큐레이션을 실행하여 추천된 쿠폰 템플릿들의 쿼리셋을 반환합니다.
+        현재 유저의 쿠폰 컬렉션을 바탕으로 쿠폰 템플릿 큐레이션을 실행하여 추천된 쿠폰 템플릿들의 쿼리셋을 추천 순위대로 반환합니다.
+
+        큐레이션 결과는 유저별로 캐시합니다. (couponbook.curation.cache 참고)
+        캐시된 결과도 현재 후보 조건으로 다시 거르므로, 그 사이에 보유했거나 만료된 쿠폰 템플릿은 나오지 않습니다.
         """
 
-        user_statistics = UserStatistics(self.request.user)
+        user = self.request.user
 
         # 유효 기간 지난 것 제거, 현재 게시중인 것만 보이게 하고, 이미 보유한 쿠폰 템플릿 제거
         coupon_templates = CouponTemplate.objects.filter(
-            Q(valid_until=None) | Q(valid_until__gte=now()), is_on=True).exclude(coupons__couponbook__user=self.request.user)
-
-        curator = AICurator()
-        coupon_templates_ids = curator.curate(user_statistics, coupon_templates)
-        return CouponTemplate.objects.filter(id__in=coupon_templates_ids)
+            Q(valid_until=None) | Q(valid_until__gte=now()), is_on=True).exclude(coupons__couponbook__user=user)
+
+        def curate():
+            return AICurator().curate(UserStatistics(user), coupon_templates)
+
+        coupon_templates_ids = get_curated_ids(user, curate)
+        if not coupon_templates_ids:
+            return coupon_templates.none()
+        ranking = Case(*(When(id=coupon_template_id, then=rank)
+                         for rank, coupon_template_id in enumerate(coupon_templates_ids)),
+                       output_field=IntegerField())
+        return coupon_templates.filter(id__in=coupon_templates_ids).order_by(ranking).select_related(
+            "place__address_district", "reward_info")
     
 @extend_schema_view(
     get=extend_schema(
@@ -228,13 +394,16 @@ class CouponTemplateCurationView(ListAPIView):
         ],
     )
 )
-class FavoriteCouponListView(ListCreateAPIView):
+class FavoriteCouponListView(ConditionalGetMixin, ListCreateAPIView):
     """
     현재 쿠폰북에 등록되어 있는 즐겨찾기 쿠폰들을 조회하는 뷰입니다.
+
+    조회 시 쿠폰북의 버전 번호와, 즐겨찾기한 쿠폰들의 쿠폰 템플릿 버전 번호, 가게 영업 중 여부, 남은 유효 일수로 ETag를 계산합니다.
     """
 
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsMyCouponBook, IsMyCouponForFavoriteAdd]
+    pagination_class = FavoriteCouponCursorPagination
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -249,6 +418,13 @@ class FavoriteCouponListView(ListCreateAPIView):
         couponbook_id = self.kwargs['couponbook_id']
         queryset = FavoriteCoupon.objects.filter(couponbook_id=couponbook_id)
         return queryset
+
+    def get_etag_parts(self, request) -> list:
+        couponbook_id = self.kwargs['couponbook_id']
+        rows = FavoriteCoupon.objects.filter(couponbook_id=couponbook_id) \
+            .annotate(place_is_open=PlaceOpenInterval.open_at('coupon__original_template__place')) \
+            .values_list('coupon__original_template_id', 'coupon__original_template__valid_until', 'place_is_open')
+        return [get_version(get_couponbook_version_key(couponbook_id)), *get_coupon_etag_parts(rows)]
     
     def create(self, request, *args, **kwargs):
         """
@@ -311,7 +487,7 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
         responses={201: CouponTemplateCreateSerializer},
     ),
 )
-class CouponTemplateListView(ListCreateAPIView):
+class CouponTemplateListView(CouponTemplateListMixin, ListCreateAPIView):
     """
     쿠폰 템플릿 목록 조회(GET) + 템플릿 생성(POST, 점주 전용)
     """
@@ -320,6 +496,7 @@ class CouponTemplateListView(ListCreateAPIView):
     queryset = CouponTemplate.objects.all()
     filter_backends = [DjangoFilterBackend]
     filterset_class = CouponTemplateFilter
+    pagination_class = CouponTemplateCursorPagination
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -331,6 +508,39 @@ class CouponTemplateListView(ListCreateAPIView):
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        """
+        비로그인 요청의 응답은 URL(쿼리스트링 포함)마다 캐시하고, ETag가 일치하면 304로 응답합니다.
+
+        캐시는 쿠폰 템플릿, 리워드 정보, 가게, 쿠폰이 바뀌면 시그널로 무효화됩니다.
+        가게의 영업 중 여부가 응답에 포함되므로 현재 시각(분 단위)도 캐시 키에 넣습니다.
+        로그인 요청은 보유 여부(already_owned)가 유저마다 다르므로 캐시하지 않습니다.
+        카탈로그 버전 번호를 워커끼리 함께 쓰지 않는 캐시라면(settings.VERSIONED_CACHE가 꺼져 있으면) 캐시하지 않습니다.
+        """
+
+        if (request.user and request.user.is_authenticated) or not is_versioned_cache_enabled():
+            response = super().list(request, *args, **kwargs)
+            patch_vary_headers(response, ['Authorization'])
+            return response
+
+        cache_key = get_catalogue_cache_key(request, get_minute_of_week())
+        cached = cache.get(cache_key)
+        if cached is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = (make_etag(response.data), response.data)
+            cache.set(cache_key, cached, settings.CATALOGUE_CACHE_TTL)
+
+        etag, data = cached
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
     def perform_create(self, serializer):
         user = self.request.user
         # 점주 검증
@@ -344,14 +554,75 @@ class CouponTemplateListView(ListCreateAPIView):
         
     def get_queryset(self):
         """
-        FK(Place -> LegalDistrict)를 직렬화에서 접근하므로
+        FK(Place -> LegalDistrict)와 리워드 정보를 직렬화에서 접근하므로
         select_related로 한 번에 조인해 안전/성능을 확보합니다.
         """
 
         # 부모에 get_queryset이 있으면 사용, 없으면 기본 queryset 사용
         qs = super().get_queryset() if hasattr(super(), "get_queryset") else self.queryset
-        # Place 및 LegalDistrict 조인 + 추가 필터링
-        return qs.select_related("place", "place__address_district").filter(Q(valid_until=None) | Q(valid_until__gte=now()), is_on=True)
+        # Place, LegalDistrict 및 RewardsInfo 조인 + 추가 필터링
+        return qs.select_related("place", "place__address_district", "reward_info").filter(Q(valid_until=None) | Q(valid_until__gte=now()), is_on=True)
+
+@extend_schema_view(
+    get=extend_schema(
+        tags=["Templates"],
+        summary="주변의 게시중인 쿠폰 템플릿 목록 조회",
+        description="위도(lat), 경도(lng)를 중심으로 반경(radius, m) 안에 있는 가게들의 게시중인 쿠폰 템플릿들을 가까운 순으로 가져옵니다. "
+                    "최대 limit개까지 반환하며, 페이지네이션하지 않습니다.",
+        parameters=[CouponTemplateNearbyRequestSerializer],
+        responses=CouponTemplateNearbySerializer(many=True),
+        auth=None,
+    )
+)
+class CouponTemplateNearbyView(ListAPIView):
+    """
+    주변 쿠폰 템플릿 목록을 조회하는 뷰입니다.
+
+    1. 검색 반경을 감싸는 사각형과 겹치는 격자 칸(Place.grid_cell, 인덱스 있음)과 사각형 범위로 후보를 DB에서 좁힙니다.
+    2. 후보들에 대해서만 하버사인 공식으로 정확한 거리를 계산해서, 반경 안에 있는 것을 가까운 순으로 정렬합니다.
+
+    PostGIS 같은 공간 확장 없이 SQLite, PostgreSQL 모두에서 동작합니다.
+    """
+
+    serializer_class = CouponTemplateNearbySerializer
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.AllowAny]
+    # 반경과 limit로 결과 개수가 제한되므로 페이지네이션하지 않습니다.
+    pagination_class = None
+
+    def get_queryset(self):
+        return (CouponTemplate.objects
+                .select_related("place", "place__address_district", "reward_info")
+                .filter(Q(valid_until=None) | Q(valid_until__gte=now()), is_on=True))
+
+    def list(self, request, *args, **kwargs):
+        params = CouponTemplateNearbyRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        lat, lng, radius, limit = (params.validated_data[key] for key in ('lat', 'lng', 'radius', 'limit'))
+
+        # 1. 격자 칸과 사각형 범위로 후보를 좁힙니다.
+        min_lat, max_lat, min_lng, max_lng = get_bounding_box(lat, lng, radius)
+        candidates = self.get_queryset().filter(
+            place__grid_cell__in=get_grid_cells_in_box(min_lat, max_lat, min_lng, max_lng),
+            place__lat__range=(Decimal(str(min_lat)), Decimal(str(max_lat))),
+            place__lng__range=(Decimal(str(min_lng)), Decimal(str(max_lng))),
+        ).annotate(place_is_open=PlaceOpenInterval.open_at('place'))
+
+        # 2. 정확한 거리로 거르고 가까운 순으로 정렬합니다.
+        coupon_templates = []
+        for coupon_template in candidates:
+            place = coupon_template.place
+            coupon_template.distance = get_distance_m(lat, lng, place.lat, place.lng)
+            if coupon_template.distance <= radius:
+                coupon_templates.append(coupon_template)
+        coupon_templates.sort(key=lambda coupon_template: (coupon_template.distance, coupon_template.id))
+        coupon_templates = coupon_templates[:limit]
+
+        context = self.get_serializer_context()
+        context.update(CouponTemplateListSerializer.get_viewer_context(coupon_templates, request.user))
+        context['open_place_ids'] = {template.place_id for template in coupon_templates if template.place_is_open}
+        serializer = self.get_serializer(coupon_templates, many=True, context=context)
+        return Response(serializer.data)
 
 @extend_schema_view(
     get=extend_schema(
@@ -440,8 +711,19 @@ class StampListView(CreateAPIView):
 @extend_schema_view(
     post=extend_schema(
         tags=["AI_Chat"],
-        description="쿠폰북 AI 어시스턴트와 대화합니다. 사용자의 쿠폰 정보, 주변 가게 등을 기반으로 답변을 제공합니다.",
+        description="쿠폰북 AI 어시스턴트와 대화합니다. 사용자의 쿠폰 정보, 주변 가게 등을 기반으로 답변을 제공합니다.\n\n"
+                    "`?stream=1` 또는 `Accept: text/event-stream` 헤더로 요청하면 답변을 SSE로 스트리밍합니다. "
+                    "답변 조각마다 `token` 이벤트(`{\"content\": ...}`)가 오고, "
+                    "마지막에 `done` 이벤트(`{\"context_used\": ..., \"token_usage\": {...}, \"suggestions\": [...]}`)가 옵니다. "
+                    "도중에 오류가 나면 `done` 전에 `error` 이벤트가 옵니다.\n\n"
+                    "대화 기록은 최근 몇 턴만 그대로 쓰고 이전 턴은 요약해서 입력 토큰 예산 안으로 줄이며, "
+                    "`token_usage`로 입력 토큰 어림값과 요약/제외한 메시지 수, 실제 토큰 사용량을 알려줍니다. "
+                    "질문이 너무 길면 400으로 응답합니다.",
         summary="AI 어시스턴트 챗봇",
+        parameters=[
+            OpenApiParameter(name="stream", type=bool, location=OpenApiParameter.QUERY, required=False,
+                             description="1이면 답변을 SSE(text/event-stream)로 스트리밍합니다."),
+        ],
         request={
             "application/json": {
                 "type": "object",
@@ -453,7 +735,7 @@ class StampListView(CreateAPIView):
                     },
                     "conversation_history": {
                         "type": "array",
-                        "description": "이전 대화 기록 (선택)",
+                        "description": "이전 대화 기록 (선택). role이 user/assistant인 메시지만 사용합니다.",
                         "items": {
                             "type": "object",
                             "properties": {
@@ -474,11 +756,30 @@ class StampListView(CreateAPIView):
                         "example": {
                             "response": "현재 3개의 쿠폰을 보유하고 있어! 스타벅스, 맘스터치, 올리브영 쿠폰이야 ☕",
                             "context_used": True,
+                            "token_usage": {
+                                "estimated_input_tokens": 812,
+                                "input_token_budget": 3000,
+                                "history_messages": 6,
+                                "summarized_messages": 4,
+                                "dropped_messages": 0,
+                                "trimmed_context_items": 0,
+                                "prompt_tokens": 790,
+                                "completion_tokens": 41,
+                                "total_tokens": 831
+                            },
+                            "intent": None,
+                            "cached": False,
                             "suggestions": [
                                 "스탬프 많이 모은 쿠폰 알려줘",
                                 "근처 카페 추천해줘"
                             ]
                         }
+                    },
+                    "text/event-stream": {
+                        "example": 'event: token\ndata: {"content": "현재 3개의 "}\n\n'
+                                   'event: token\ndata: {"content": "쿠폰을 보유하고 있어!"}\n\n'
+                                   'event: done\ndata: {"context_used": true, "token_usage": {"estimated_input_tokens": 812, ...}, '
+                                   '"suggestions": ["근처 카페 추천해줘"]}\n\n'
                     }
                 }
             }
@@ -532,10 +833,48 @@ class ChatAssistantView(APIView):
     
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+    def wants_stream(self, request) -> bool:
+        """
+        `?stream=1` 또는 `Accept: text/event-stream`으로 스트리밍을 요청했는지를 반환합니다.
+        """
+        return request.query_params.get('stream') in ('1', 'true') or \
+            'text/event-stream' in request.headers.get('Accept', '')
+
+    def stream(self, assistant: CouponbookAssistant, user_message: str, conversation_history: list):
+        """
+        AI 어시스턴트의 답변을 토큰이 생성되는 대로 SSE로 보내는 응답을 반환합니다.
+
+        AI 호출 자리가 없거나 스트림이 제때 열리지 않으면, 스트리밍을 시작하기 전에 AIBusyError, AITimeoutError가 발생합니다.
+        """
+        contents, context_used = assistant.chat_stream(user_message, conversation_history)
+
+        def events():
+            nonlocal context_used
+            try:
+                for content in contents:
+                    yield format_event('token', {'content': content})
+            except Exception as e:
+                context_used = False
+                yield format_event('error', {'error': str(e)})
+            finally:
+                close = getattr(contents, 'close', None)
+                if close is not None:
+                    close()
+            yield format_event('done', {'context_used': context_used, 'token_usage': assistant.token_usage,
+                                        'intent': assistant.intent, 'cached': assistant.cached,
+                                        'suggestions': assistant.get_quick_suggestions()})
+
+        response = StreamingHttpResponse(events(), content_type='text/event-stream; charset=utf-8')
+        response['Cache-Control'] = 'no-cache'
+        # nginx가 응답을 모아서 보내지 않고 바로 전달하게 합니다.
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
     def post(self, request):
         """
-        사용자의 메시지를 받아 AI 어시스턴트의 응답을 반환합니다.
+        사용자의 메시지를 받아 AI 어시스턴트의 응답을 반환합니다. 스트리밍을 요청하면 SSE로 응답합니다.
         """
         user_message = request.data.get('message', '').strip()
         
@@ -544,13 +883,27 @@ class ChatAssistantView(APIView):
                 {"error": "message 필드가 필요합니다."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if estimate_tokens(user_message) > settings.CHAT_MAX_MESSAGE_TOKENS:
+            return Response(
+                {"error": "message가 너무 깁니다. 질문을 줄여서 다시 보내주세요."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         # 대화 히스토리 (선택)
         conversation_history = request.data.get('conversation_history', [])
 
         # AI 어시스턴트 생성 및 응답
         assistant = CouponbookAssistant(user=request.user)
-        result = assistant.chat(user_message, conversation_history)
+        try:
+            if self.wants_stream(request):
+                return self.stream(assistant, user_message, conversation_history)
+            result = assistant.chat(user_message, conversation_history)
+        except AIBusyError as e:
+            # 진행 중인 AI 호출이 많으면 기다리지 않고 바로 거절해서, 다른 요청을 처리할 스레드를 남겨 둡니다.
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={"Retry-After": str(settings.AI_RETRY_AFTER)})
+        except AITimeoutError as e:
+            return Response({"error": str(e)}, status=status.HTTP_504_GATEWAY_TIMEOUT)
 
         # 추천 질문도 함께 반환
         suggestions = assistant.get_quick_suggestions()
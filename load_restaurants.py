@@ -2,9 +2,13 @@
 CSV 파일에서 가게 데이터를 읽어서 DB에 넣는 스크립트
 Django shell에서 실행: python manage.py shell < load_restaurants.py
 또는 직접 실행: python load_restaurants.py
+
+대량 등록 모드: python load_restaurants.py --bulk [--dry-run] [--workers 8] [--batch-size 500] [--csv 경로]
 """
+import argparse
 import os
 import sys
+import time
 import django
 from pathlib import Path
 
@@ -15,8 +19,11 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'supabase_settings')
 django.setup()
 
 import csv
+from django.db import transaction
 from django.utils.dateparse import parse_time
-from couponbook.models import LegalDistrict, Place
+from couponbook.caching import CATALOGUE_VERSION_KEY, CURATION_CANDIDATES_VERSION_KEY, bump_version_on_commit
+from couponbook.latlng.utils import get_grid_cell
+from couponbook.models import GeocodeCache, LegalDistrict, Place, PlaceOpenInterval
 
 def load_legal_districts():
     """기본 법정동 데이터 생성 (CSV에 있는 주소만)"""
@@ -131,25 +138,182 @@ def load_restaurants():
     
     return created_count, skipped_count
 
+def load_restaurants_bulk(csv_path=None, dry_run=False, max_workers=8, batch_size=500):
+    """
+    CSV에서 가게 데이터를 한꺼번에 로드 (대량 등록용)
+
+    1. 법정동은 쿼리 한 번으로 모두 불러와서 딕셔너리로 매칭
+    2. 이미 존재하는 가게도 쿼리 한 번으로 확인 (CSV 안의 중복도 제거)
+    3. 중복 없는 검색 키워드만 스레드 풀에서 동시에 카카오맵 검색 (GeocodeCache 사용)
+    4. Place는 batch_size개씩 bulk_create로 저장 (위경도를 미리 구했으므로 Place.save를 거치지 않음)
+       영업 구간(PlaceOpenInterval)도 배치마다 함께 bulk_create
+    5. bulk_create는 시그널을 보내지 않으므로, 쿠폰 템플릿 목록과 큐레이션 후보의 캐시 버전 번호를 마지막에 한 번 올림
+
+    dry_run이면 DB에 쓰지 않고 카카오맵 API도 호출하지 않은 채, 등록 대상 가게 수와 검색이 필요한 키워드 수만 보고합니다.
+    """
+    csv_path = Path(csv_path) if csv_path else BASE_DIR / "restaurants - restaurants.csv.csv"
+
+    if not csv_path.exists():
+        print(f"❌ CSV 파일을 찾을 수 없습니다: {csv_path}")
+        return 0, 0
+
+    started = time.perf_counter()
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    print(f"📄 CSV {len(rows)}행 읽음")
+
+    def district_key(row):
+        # province 매핑 (CSV는 "서울", DB는 "서울특별시")
+        province = row['province']
+        province_full = f"{province}특별시" if province == "서울" else province
+        return province_full, row['city'], row['district']
+
+    # 1. 법정동 매칭
+    keys = {district_key(row) for row in rows}
+    districts = {
+        (d.province, d.city, d.district): d
+        for d in LegalDistrict.objects.filter(
+            province__in={key[0] for key in keys},
+            city__in={key[1] for key in keys},
+            district__in={key[2] for key in keys},
+        )
+    }
+
+    # 2. 이미 존재하는 가게 확인
+    existing = set(
+        Place.objects.filter(address_district__in=districts.values())
+        .values_list('name', 'address_district_id', 'address_rest')
+    )
+
+    candidates = []  # (CSV 행, 법정동, 검색 키워드)
+    no_district_count = 0
+    duplicated_count = 0
+    for row in rows:
+        district_obj = districts.get(district_key(row))
+        if not district_obj:
+            print(f"⚠️  법정동 없음: {' '.join(district_key(row))} - {row['name']} 스킵")
+            no_district_count += 1
+            continue
+
+        identity = (row['name'], district_obj.pk, row['address_rest'])
+        if identity in existing:
+            duplicated_count += 1
+            continue
+        existing.add(identity)
+
+        # Place.save와 같은 형식의 검색 키워드
+        keyword = GeocodeCache.normalize_keyword(
+            f"{district_obj.province} {district_obj.city} {district_obj.district} {row['name']}"
+        )
+        candidates.append((row, district_obj, keyword))
+
+    keywords = {keyword for _, _, keyword in candidates}
+    print(f"🗺  등록 대상 {len(candidates)}개 (법정동 없음 {no_district_count}개, 이미 존재 {duplicated_count}개), "
+          f"검색 키워드 {len(keywords)}개")
+
+    if dry_run:
+        cached = GeocodeCache.get_cached_latlng_many(keywords)
+        print(f"🔍 [dry-run] 캐시된 키워드 {len(cached)}개, 카카오맵 검색이 필요한 키워드 {len(keywords) - len(cached)}개")
+        print(f"🔍 [dry-run] DB에 아무것도 저장하지 않았습니다. ({time.perf_counter() - started:.1f}초)")
+        return len(candidates), no_district_count + duplicated_count
+
+    # 3. 카카오맵 검색
+    geocode_started = time.perf_counter()
+
+    def report_progress(done, total):
+        # 전체의 5%마다 한 번씩 출력
+        if done % max(1, total // 20) == 0 or done == total:
+            elapsed = time.perf_counter() - geocode_started
+            print(f"   카카오맵 검색 {done}/{total} ({done / elapsed:.1f}개/초)")
+
+    latlngs = GeocodeCache.get_latlng_many(keywords, max_workers=max_workers, batch_size=batch_size,
+                                           on_progress=report_progress)
+
+    # 4. 가게 저장
+    places = []
+    not_found_count = 0
+    for row, district_obj, keyword in candidates:
+        latlng = latlngs.get(keyword)
+        if not latlng:
+            print(f"✗ 저장 실패: {row['name']} (카카오맵 검색 실패 가능성)")
+            not_found_count += 1
+            continue
+
+        lat, lng = latlng
+        place = Place(
+            name=row['name'],
+            address_district=district_obj,
+            address_rest=row['address_rest'],
+            image_url=row['image_url'] if row['image_url'] else 'https://via.placeholder.com/300',
+            opens_at=parse_time(row['opens_at']),
+            closes_at=parse_time(row['closes_at']),
+            last_order=parse_time(row['last_order']),
+            tel=row['tel'] if row['tel'] else '',
+            tags=row['tags'] if row['tags'] else '',
+            lat=lat,
+            lng=lng,
+            grid_cell=get_grid_cell(lat, lng),
+        )
+        place.search_text = place.build_search_text()
+        places.append(place)
+
+    for start in range(0, len(places), batch_size):
+        batch = places[start:start + batch_size]
+        with transaction.atomic():
+            Place.objects.bulk_create(batch)
+            # bulk_create는 Place.save를 거치지 않으므로 영업 구간도 직접 저장
+            PlaceOpenInterval.objects.bulk_create(
+                [interval for place in batch for interval in PlaceOpenInterval.build_for(place)]
+            )
+        print(f"   저장 {start + len(batch)}/{len(places)}")
+
+    # bulk_create는 post_save 시그널을 보내지 않으므로, 시그널이 올렸을 캐시 버전 번호를 저장이 끝난 뒤 한 번만 올림
+    if places:
+        bump_version_on_commit(CATALOGUE_VERSION_KEY)
+        bump_version_on_commit(CURATION_CANDIDATES_VERSION_KEY)
+
+    elapsed = time.perf_counter() - started
+    print(f"⏱  {len(rows)}행 처리에 {elapsed:.1f}초 ({len(rows) / elapsed:.1f}행/초)")
+
+    return len(places), no_district_count + duplicated_count + not_found_count
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV 파일에서 가게 데이터를 읽어서 DB에 넣습니다.")
+    parser.add_argument('--bulk', action='store_true', help="대량 등록 모드로 실행합니다.")
+    parser.add_argument('--dry-run', action='store_true', help="(대량 등록 모드) DB에 저장하지 않고 결과만 보고합니다.")
+    parser.add_argument('--workers', type=int, default=8, help="(대량 등록 모드) 카카오맵 검색 동시 실행 스레드 수")
+    parser.add_argument('--batch-size', type=int, default=500, help="(대량 등록 모드) bulk_create 한 번에 저장할 가게 수")
+    parser.add_argument('--csv', default=None, help="(대량 등록 모드) CSV 파일 경로")
+    # manage.py shell < load_restaurants.py 로 실행하면 sys.argv에 shell 인자가 들어오므로 모르는 인자는 무시
+    args, _ = parser.parse_known_args()
+    # dry-run은 대량 등록 모드에서만 지원
+    args.bulk = args.bulk or args.dry_run
+
+
     print("=" * 60)
     print("🏪 가게 데이터 로딩 시작")
     print("=" * 60)
     
     # 1. 법정동 데이터 로드
-    print("\n[1단계] 법정동 데이터 생성...")
-    district_count = load_legal_districts()
-    print(f"✅ 법정동 {district_count}개 생성 완료\n")
+    if args.dry_run:
+        print("\n[1단계] 법정동 데이터 생성... (dry-run이므로 생략)\n")
+    else:
+        print("\n[1단계] 법정동 데이터 생성...")
+        district_count = load_legal_districts()
+        print(f"✅ 법정동 {district_count}개 생성 완료\n")
     
     # 2. 가게 데이터 로드
     print("[2단계] 가게 데이터 로딩...")
-    print("⚠️  카카오맵 API로 위경도를 계산하므로 시간이 걸립니다...\n")
-    
-    created, skipped = load_restaurants()
+    if args.bulk:
+        created, skipped = load_restaurants_bulk(args.csv, dry_run=args.dry_run,
+                                                 max_workers=args.workers, batch_size=args.batch_size)
+    else:
+        print("⚠️  카카오맵 API로 위경도를 계산하므로 시간이 걸립니다...\n")
+        created, skipped = load_restaurants()
     
     print("\n" + "=" * 60)
     print(f"✅ 완료!")
-    print(f"   - 생성된 가게: {created}개")
+    print(f"   - {'생성될' if args.dry_run else '생성된'} 가게: {created}개")
     print(f"   - 스킵된 가게: {skipped}개")
     print("=" * 60)
 
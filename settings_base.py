@@ -99,6 +99,9 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Pagination (목록 API는 커서 기반으로 페이지를 나눕니다. ?page_size= 로 최대 100개까지 조절 가능)
+    "DEFAULT_PAGINATION_CLASS": "couponbook.pagination.KeysetCursorPagination",
+    "PAGE_SIZE": 20,
     # Parser
     "DEFAULT_PARSER_CLASSES": [
         "rest_framework.parsers.JSONParser",
@@ -175,3 +178,76 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
 AUTH_USER_MODEL = "accounts.User"
+
+# 카카오맵 API 검색 결과(위도, 경도) 캐시 유효 기간(초)
+# 검색 결과가 없었던 키워드는 가게가 새로 등록되었을 수도 있으므로 더 짧게 캐시합니다.
+GEOCODE_CACHE_TTL = config("GEOCODE_CACHE_TTL", default=60 * 60 * 24 * 30, cast=int)
+GEOCODE_NEGATIVE_CACHE_TTL = config("GEOCODE_NEGATIVE_CACHE_TTL", default=60 * 60 * 24, cast=int)
+
+# 응답 캐시 등에 사용하는 캐시
+# REDIS_URL이 있으면 Redis(redis 패키지 필요)를, 없으면 프로세스별 메모리(locmem)를 사용합니다.
+REDIS_URL = config("REDIS_URL", default="")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    } if REDIS_URL else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# 버전 번호로 무효화하는 캐시(ETag/304 응답 등)를 사용할지 여부 (couponbook.caching 참고)
+# 데이터를 바꾼 워커가 올린 버전 번호를 다른 워커도 알아야 하므로, 모든 워커가 함께 쓰는 캐시(Redis)일 때만 기본으로 켭니다.
+# locmem은 워커(프로세스)마다 따로라서, 워커가 하나뿐일 때(개발 서버, 테스트)만 켜야 합니다.
+VERSIONED_CACHE = config("VERSIONED_CACHE", default=bool(REDIS_URL), cast=bool)
+
+# 비로그인 쿠폰 템플릿 목록 응답 캐시 유효 기간(초)
+# 데이터가 바뀌면 바로 무효화되고, 유효 기간은 유효 기간 만료 같은 시간에 따른 변화만 반영합니다.
+CATALOGUE_CACHE_TTL = config("CATALOGUE_CACHE_TTL", default=60, cast=int)
+
+# 쿠폰 큐레이션: 기본은 로컬 추천 엔진만 사용하고, 켜면 로컬 추천 상위 후보들을 OpenAI로 다시 골라냅니다. (OPENAI_API_KEY 필요)
+CURATION_LLM_RERANK = config("CURATION_LLM_RERANK", default=False, cast=bool)
+# OpenAI에 넘기는 로컬 추천 상위 후보 수
+CURATION_RERANK_CANDIDATES = config("CURATION_RERANK_CANDIDATES", default=10, cast=int)
+# OpenAI에 넘기는 입력(유저 통계와 후보 목록)의 토큰 예산(어림값). 넘으면 순위가 낮은 후보와 오래된 이용 내역부터 뺍니다.
+CURATION_PROMPT_TOKEN_BUDGET = config("CURATION_PROMPT_TOKEN_BUDGET", default=1500, cast=int)
+
+# OpenAI API 주소. 비우면 OpenAI 기본 주소를 사용합니다. (프록시나 호환 서버를 쓸 때 설정)
+OPENAI_BASE_URL = config("OPENAI_BASE_URL", default=None)
+
+# 외부 AI(OpenAI) 호출 제한: 프로세스당 동시 호출 수, 자리가 날 때까지 기다리는 시간(초), 호출 하나의 최대 시간(초)
+# AI 호출이 몰려도 쿠폰, 스탬프 요청을 처리할 스레드가 남도록, 동시 호출 수는 gunicorn 워커당 스레드 수보다 작게 둡니다.
+AI_MAX_CONCURRENCY = config("AI_MAX_CONCURRENCY", default=2, cast=int)
+AI_QUEUE_TIMEOUT = config("AI_QUEUE_TIMEOUT", default=0.5, cast=float)
+AI_CALL_TIMEOUT = config("AI_CALL_TIMEOUT", default=20, cast=float)
+# 요청 과다(503) 응답의 Retry-After 헤더 값(초)
+AI_RETRY_AFTER = config("AI_RETRY_AFTER", default=5, cast=int)
+
+# AI 어시스턴트에 넘기는 사용자 컨텍스트 캐시 유효 기간(초). 사용자의 쿠폰, 스탬프, 자주 가는 지역이 바뀌면 바로 무효화됩니다.
+CHAT_CONTEXT_CACHE_TTL = config("CHAT_CONTEXT_CACHE_TTL", default=1800, cast=int)
+# AI 어시스턴트 입력(시스템 프롬프트, 대화 히스토리, 사용자 정보, 질문)의 토큰 예산(어림값)
+# 최근 CHAT_HISTORY_KEEP_TURNS개의 턴은 그대로 넣고, 그 이전 턴들은 CHAT_SUMMARY_TOKEN_BUDGET 안의 요약 하나로 합칩니다.
+CHAT_INPUT_TOKEN_BUDGET = config("CHAT_INPUT_TOKEN_BUDGET", default=3000, cast=int)
+CHAT_HISTORY_KEEP_TURNS = config("CHAT_HISTORY_KEEP_TURNS", default=3, cast=int)
+CHAT_SUMMARY_TOKEN_BUDGET = config("CHAT_SUMMARY_TOKEN_BUDGET", default=300, cast=int)
+# 사용자 질문 하나의 최대 토큰 수(어림값). 넘으면 400으로 응답합니다.
+CHAT_MAX_MESSAGE_TOKENS = config("CHAT_MAX_MESSAGE_TOKENS", default=500, cast=int)
+# 쿠폰 개수, 스탬프 현황, 지역별 가게, 사용법 같은 자주 하는 질문은 OpenAI 없이 바로 답할지 여부 (chat_intents 참고)
+CHAT_INTENT_ROUTER = config("CHAT_INTENT_ROUTER", default=True, cast=bool)
+# 규칙에 맞지 않는 질문을 예시 질문과 비교할 때, 같은 의도로 볼 최소 유사도(0~1)
+CHAT_INTENT_MIN_SIMILARITY = config("CHAT_INTENT_MIN_SIMILARITY", default=0.7, cast=float)
+# 개인 정보와 상관없는 일반 질문(앱 사용법 등)의 답변을 모든 사용자가 함께 쓰는 캐시 (chat_response_cache 참고)
+CHAT_RESPONSE_CACHE = config("CHAT_RESPONSE_CACHE", default=True, cast=bool)
+# 캐시 유효 기간(초)
+CHAT_RESPONSE_CACHE_TTL = config("CHAT_RESPONSE_CACHE_TTL", default=86400, cast=int)
+
+# 유저별 큐레이션 결과 캐시: 유저의 쿠폰/스탬프가 바뀌면 바로 다시 큐레이션하고,
+# 추천 후보가 바뀌었거나 CURATION_CACHE_TTL(초)이 지났으면 이전 결과를 응답하면서 백그라운드에서 다시 큐레이션합니다.
+CURATION_CACHE_TTL = config("CURATION_CACHE_TTL", default=600, cast=int)
+# 이전 결과를 응답할 수 있는 최대 기간(초)
+CURATION_CACHE_STALE_TTL = config("CURATION_CACHE_STALE_TTL", default=86400, cast=int)
+# 끄면 요청을 처리하는 스레드에서 바로 다시 큐레이션합니다.
+CURATION_REFRESH_IN_BACKGROUND = config("CURATION_REFRESH_IN_BACKGROUND", default=True, cast=bool)
+CURATION_REFRESH_WORKERS = config("CURATION_REFRESH_WORKERS", default=2, cast=int)
+# 한 유저의 큐레이션을 동시에 여러 번 다시 하지 않도록 거는 잠금의 유효 기간(초)
+CURATION_REFRESH_TIMEOUT = config("CURATION_REFRESH_TIMEOUT", default=60, cast=int)